@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Benchmark of the Ensemble Model Output Statistics and Ensemble Copula
+Coupling chain on the UK National Grid.
+
+The wall time and peak memory of each stage of the chain are recorded for
+a range of ensemble sizes:
+
+1. EstimateCoefficientsForEnsembleCalibration, which estimates the
+   coefficients from the training period.
+2. ApplyCoefficientsFromEnsembleCalibration, which applies the coefficients
+   to the current forecast.
+3. GeneratePercentilesFromMeanAndVariance.
+4. EnsembleReordering.
+
+GenerateMembersFromMeanAndVariance, which fuses stages 3 and 4, is timed
+separately for comparison.
+
+Example usage::
+
+    python -m improver.benchmarks.benchmark_ensemble_calibration \\
+        --members 12 24 50 --lead-times 36 --training-days 30 \\
+        --output emos_ecc.csv
+
+"""
+import argparse
+
+import numpy as np
+
+from improver.benchmarks.helper_functions_benchmarks import (
+    measure, set_up_ensemble_forecast, set_up_grid, set_up_training_data,
+    write_csv)
+from improver.ensemble_calibration.ensemble_calibration import (
+    ApplyCoefficientsFromEnsembleCalibration, EnsembleReordering,
+    EstimateCoefficientsForEnsembleCalibration,
+    GenerateMembersFromMeanAndVariance,
+    GeneratePercentilesFromMeanAndVariance)
+
+
+FIELDNAMES = ["stage", "members", "lead_times", "training_days",
+              "grid_points", "time_seconds", "peak_memory_mb"]
+
+
+def benchmark_chain(no_of_members, no_of_lead_times, training_days,
+                    grid_scale=1.0, distribution="gaussian",
+                    predictor_of_mean_flag="mean"):
+    """
+    Run the EMOS and ECC chain once, recording the time and peak memory of
+    each stage.
+
+    Parameters
+    ----------
+    no_of_members : Int
+        Number of ensemble members.
+    no_of_lead_times : Int
+        Number of hourly lead times in the current forecast.
+    training_days : Int
+        Number of days within the training period.
+    grid_scale : Float
+        Factor by which the number of grid points of the UK National Grid
+        is multiplied in each direction.
+    distribution : String
+        Distribution used for calibration.
+    predictor_of_mean_flag : String
+        String to specify the input to calculate the calibrated mean.
+
+    Returns
+    -------
+    List of dictionaries
+        Results for each stage of the chain.
+
+    """
+    random_state = np.random.RandomState(0)
+    grid = set_up_grid(grid_scale=grid_scale)
+    forecast_periods = np.arange(1, no_of_lead_times + 1)
+    current_forecast = set_up_ensemble_forecast(
+        grid, no_of_members, forecast_periods, random_state=random_state)
+    historic_forecast, truth = set_up_training_data(
+        grid, no_of_members, forecast_periods, training_days,
+        random_state=random_state)
+
+    stages = []
+    (optimised_coeffs, coeff_names), elapsed, peak = measure(
+        EstimateCoefficientsForEnsembleCalibration(
+            distribution, "K",
+            predictor_of_mean_flag=predictor_of_mean_flag
+            ).estimate_coefficients_for_ngr,
+        current_forecast, historic_forecast, truth)
+    stages.append(("EstimateCoefficientsForEnsembleCalibration", elapsed,
+                   peak))
+
+    (calibrated_forecast_predictor, calibrated_forecast_variance, _), \
+        elapsed, peak = measure(
+            ApplyCoefficientsFromEnsembleCalibration(
+                current_forecast, optimised_coeffs, coeff_names,
+                predictor_of_mean_flag=predictor_of_mean_flag
+                ).apply_params_entry)
+    stages.append(("ApplyCoefficientsFromEnsembleCalibration", elapsed,
+                   peak))
+    calibrated_forecast_predictor_and_variance = (
+        calibrated_forecast_predictor, calibrated_forecast_variance)
+
+    calibrated_forecast_percentiles, elapsed, peak = measure(
+        GeneratePercentilesFromMeanAndVariance().process,
+        calibrated_forecast_predictor_and_variance, current_forecast)
+    stages.append(("GeneratePercentilesFromMeanAndVariance", elapsed, peak))
+
+    _, elapsed, peak = measure(
+        EnsembleReordering().process, calibrated_forecast_percentiles,
+        current_forecast)
+    stages.append(("EnsembleReordering", elapsed, peak))
+
+    _, elapsed, peak = measure(
+        GenerateMembersFromMeanAndVariance().process,
+        calibrated_forecast_predictor_and_variance, current_forecast)
+    stages.append(("GenerateMembersFromMeanAndVariance", elapsed, peak))
+
+    rows = []
+    for stage, elapsed, peak in stages:
+        rows.append({
+            "stage": stage, "members": no_of_members,
+            "lead_times": no_of_lead_times, "training_days": training_days,
+            "grid_points": grid.data.size,
+            "time_seconds": "{:.3f}".format(elapsed),
+            "peak_memory_mb": "{:.1f}".format(peak)})
+    return rows
+
+
+def main(argv=None):
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the EMOS and ECC chain on the UK grid.")
+    parser.add_argument("--members", type=int, nargs="+",
+                        default=[12, 24, 50],
+                        help="Ensemble sizes to be benchmarked.")
+    parser.add_argument("--lead-times", type=int, default=36,
+                        help="Number of hourly lead times.")
+    parser.add_argument("--training-days", type=int, default=30,
+                        help="Number of days within the training period.")
+    parser.add_argument("--grid-scale", type=float, default=1.0,
+                        help="Factor applied to the number of grid points "
+                             "in each direction of the UK grid.")
+    parser.add_argument("--distribution", default="gaussian",
+                        help="Distribution used for calibration.")
+    parser.add_argument("--predictor-of-mean", default="mean",
+                        help="Predictor of the calibrated mean.")
+    parser.add_argument("--output", default=None,
+                        help="CSV file to be written. By default, the "
+                             "results are written to standard output.")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for no_of_members in args.members:
+        rows.extend(
+            benchmark_chain(
+                no_of_members, args.lead_times, args.training_days,
+                grid_scale=args.grid_scale, distribution=args.distribution,
+                predictor_of_mean_flag=args.predictor_of_mean))
+    write_csv(rows, FIELDNAMES, filename=args.output)
+
+
+if __name__ == "__main__":
+    main()
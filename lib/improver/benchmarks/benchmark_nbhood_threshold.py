@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Benchmark of the neighbourhood processing and threshold plugins on the UK
+National Grid.
+
+The wall time and peak resident set size of BasicThreshold and
+BasicNeighbourhoodProcessing are recorded over a sweep of:
+
+* the neighbourhood radius in grid cells,
+* weighted and unweighted neighbourhood kernels,
+* the engine used to apply the neighbourhood kernel,
+* the data type of the input data,
+* the size of the grid, as a factor of the number of grid points of the
+  UK National Grid in each direction (a grid_scale of 2 gives a grid with
+  4 times as many points as the UK National Grid),
+* the number of time slices.
+
+Each measurement is made in a separate child process, so that the peak
+resident set size reflects that measurement alone. Measurements that fail,
+for example because the radius exceeds MAX_KERNEL_CELL_RADIUS, or exceed
+the timeout are recorded with empty time and memory values and the reason
+in the status column.
+
+Example usage::
+
+    python -m improver.benchmarks.benchmark_nbhood_threshold \\
+        --radii 1 10 100 500 --grid-scales 1 2 --dtypes float32 float64 \\
+        --time-slices 1 4 --output nbhood.csv
+
+"""
+import argparse
+import itertools
+
+from cf_units import Unit
+from iris.coords import DimCoord
+from iris.cube import Cube
+import numpy as np
+
+from improver.benchmarks.helper_functions_benchmarks import (
+    measure_in_subprocess, set_up_grid, write_csv, TIME_UNIT,
+    FORECAST_REFERENCE_TIME)
+from improver.nbhood import BasicNeighbourhoodProcessing
+from improver.threshold import BasicThreshold
+
+
+FIELDNAMES = ["plugin", "radius_in_cells", "unweighted_mode", "engine",
+              "dtype",
+              "grid_scale", "grid_points", "time_slices", "time_seconds",
+              "peak_rss_mb", "status"]
+
+# Rainfall rate threshold in mm/hr used for the thresholded inputs.
+THRESHOLD = 1.0
+FUZZY_FACTOR = 0.8
+
+
+def set_up_rainfall_cube(grid, no_of_time_slices, dtype,
+                         random_state=None):
+    """
+    Create a synthetic rainfall rate cube.
+
+    Parameters
+    ----------
+    grid : Iris cube
+        Two-dimensional cube defining the grid.
+    no_of_time_slices : Int
+        Number of hourly time slices.
+    dtype : String or numpy.dtype
+        Data type of the cube data.
+    random_state : numpy.random.RandomState
+        Random state used to generate the data.
+
+    Returns
+    -------
+    Iris cube
+        Cube with dimensions (time, y, x), containing rainfall rates in
+        mm/hr with a large proportion of dry points.
+
+    """
+    if random_state is None:
+        random_state = np.random.RandomState(0)
+    shape = (no_of_time_slices,) + grid.shape
+    data = random_state.gamma(0.3, 2.0, size=shape).astype(dtype)
+    cube = Cube(data, long_name="rainfall_rate", units=Unit("mm hr-1"))
+    cube.add_dim_coord(
+        DimCoord(FORECAST_REFERENCE_TIME +
+                 np.arange(1, no_of_time_slices + 1, dtype=np.float64),
+                 "time", units=TIME_UNIT), 0)
+    cube.add_dim_coord(grid.coord(axis="y").copy(), 1)
+    cube.add_dim_coord(grid.coord(axis="x").copy(), 2)
+    return cube
+
+
+def _radius_in_cells_to_km(cube, radius_in_cells):
+    """
+    Convert a radius in grid cells into the radius in kilometres that
+    gives the same number of grid cells within
+    BasicNeighbourhoodProcessing.
+    """
+    x_coord = cube.coord("projection_x_coordinate").copy()
+    x_coord.convert_units("km")
+    spacing = abs(x_coord.points[1] - x_coord.points[0])
+    # Add half a cell, as the number of cells is truncated by the plugin.
+    return (radius_in_cells + 0.5) * spacing
+
+
+def benchmark_threshold(cube, timeout=None):
+    """
+    Measure the wall time and peak resident set size of BasicThreshold.
+
+    Parameters
+    ----------
+    cube : Iris cube
+        Cube to be thresholded.
+    timeout : Float
+        Time in seconds after which the measurement is abandoned.
+
+    Returns
+    -------
+    elapsed_time : Float or None
+        Wall time in seconds.
+    peak_rss : Float or None
+        Peak resident set size in megabytes.
+    status : String
+        "ok", "timeout" or the error raised by the plugin.
+
+    """
+    plugin = BasicThreshold(THRESHOLD, FUZZY_FACTOR)
+    return measure_in_subprocess(plugin.process, cube, timeout=timeout)
+
+
+def benchmark_nbhood(cube, radius_in_cells, unweighted_mode, engine="dense",
+                     timeout=None):
+    """
+    Measure the wall time and peak resident set size of
+    BasicNeighbourhoodProcessing.
+
+    Parameters
+    ----------
+    cube : Iris cube
+        Thresholded cube to be neighbourhood processed.
+    radius_in_cells : Int
+        Radius of the neighbourhood in grid cells.
+    unweighted_mode : Logical
+        Whether to use an unweighted circular kernel.
+    engine : String
+        Engine used to apply the kernel.
+    timeout : Float
+        Time in seconds after which the measurement is abandoned.
+
+    Returns
+    -------
+    elapsed_time : Float or None
+        Wall time in seconds.
+    peak_rss : Float or None
+        Peak resident set size in megabytes.
+    status : String
+        "ok", "timeout" or the error raised by the plugin.
+
+    """
+    plugin = BasicNeighbourhoodProcessing(
+        _radius_in_cells_to_km(cube, radius_in_cells),
+        unweighted_mode=unweighted_mode, engine=engine)
+    return measure_in_subprocess(plugin.process, cube, timeout=timeout)
+
+
+def _format(value, fmt):
+    """Format a measurement, leaving failed measurements empty."""
+    if value is None:
+        return ""
+    return fmt.format(value)
+
+
+def run_sweep(radii, unweighted_modes, dtypes, grid_scales, time_slices,
+              engines=("dense",), timeout=None):
+    """
+    Run the benchmark over all combinations of the parameters.
+
+    Parameters
+    ----------
+    radii : List
+        Neighbourhood radii in grid cells.
+    unweighted_modes : List
+        Values of unweighted_mode for BasicNeighbourhoodProcessing.
+    dtypes : List
+        Data types of the input data.
+    grid_scales : List
+        Factors applied to the number of grid points in each direction of
+        the UK National Grid.
+    time_slices : List
+        Numbers of time slices.
+    engines : List
+        Engines used to apply the neighbourhood kernel.
+    timeout : Float
+        Time in seconds after which each measurement is abandoned.
+
+    Returns
+    -------
+    List of dictionaries
+        Results for each measurement.
+
+    """
+    rows = []
+    for grid_scale, dtype, no_of_time_slices in itertools.product(
+            grid_scales, dtypes, time_slices):
+        grid = set_up_grid(grid_scale=grid_scale)
+        cube = set_up_rainfall_cube(grid, no_of_time_slices, dtype)
+        common = {"dtype": np.dtype(dtype).name, "grid_scale": grid_scale,
+                  "grid_points": grid.data.size,
+                  "time_slices": no_of_time_slices}
+
+        elapsed, peak, status = benchmark_threshold(cube, timeout=timeout)
+        row = {"plugin": "BasicThreshold", "radius_in_cells": "",
+               "unweighted_mode": "", "engine": "",
+               "time_seconds": _format(elapsed, "{:.3f}"),
+               "peak_rss_mb": _format(peak, "{:.1f}"),
+               "status": status}
+        row.update(common)
+        rows.append(row)
+
+        thresholded_cube = BasicThreshold(
+            THRESHOLD, FUZZY_FACTOR).process(cube.copy())
+        for radius_in_cells, unweighted_mode, engine in itertools.product(
+                radii, unweighted_modes, engines):
+            elapsed, peak, status = benchmark_nbhood(
+                thresholded_cube, radius_in_cells, unweighted_mode,
+                engine=engine, timeout=timeout)
+            row = {"plugin": "BasicNeighbourhoodProcessing",
+                   "radius_in_cells": radius_in_cells,
+                   "unweighted_mode": unweighted_mode, "engine": engine,
+                   "time_seconds": _format(elapsed, "{:.3f}"),
+                   "peak_rss_mb": _format(peak, "{:.1f}"),
+                   "status": status}
+            row.update(common)
+            rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the neighbourhood processing and threshold "
+                    "plugins on the UK grid.")
+    parser.add_argument("--radii", type=int, nargs="+",
+                        default=[1, 2, 5, 10, 20, 50, 100, 200, 500],
+                        help="Neighbourhood radii in grid cells.")
+    parser.add_argument("--modes", nargs="+", default=["weighted",
+                                                        "unweighted"],
+                        choices=["weighted", "unweighted"],
+                        help="Neighbourhood kernel weightings.")
+    parser.add_argument("--engines", nargs="+", default=["dense"],
+                        choices=BasicNeighbourhoodProcessing.ENGINES,
+                        help="Engines used to apply the neighbourhood "
+                             "kernel.")
+    parser.add_argument("--dtypes", nargs="+",
+                        default=["float32", "float64"],
+                        help="Data types of the input data.")
+    parser.add_argument("--grid-scales", type=float, nargs="+",
+                        default=[0.5, 1.0, 2.0],
+                        help="Factors applied to the number of grid points "
+                             "in each direction of the UK grid. A factor "
+                             "of 2 gives 4 times as many grid points.")
+    parser.add_argument("--time-slices", type=int, nargs="+", default=[1],
+                        help="Numbers of time slices.")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Time in seconds after which each measurement "
+                             "is abandoned.")
+    parser.add_argument("--output", default=None,
+                        help="CSV file to be written. By default, the "
+                             "results are written to standard output.")
+    args = parser.parse_args(argv)
+
+    unweighted_modes = [mode == "unweighted" for mode in args.modes]
+    rows = run_sweep(args.radii, unweighted_modes, args.dtypes,
+                     args.grid_scales, args.time_slices,
+                     engines=args.engines, timeout=args.timeout)
+    write_csv(rows, FIELDNAMES, filename=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Functions for use within the benchmarks, providing synthetic inputs at
+realistic grid sizes and measurement of time and peak memory.
+
+"""
+import csv
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+
+from cf_units import Unit
+from iris.coords import AuxCoord, DimCoord
+from iris.cube import Cube, CubeList
+import numpy as np
+
+from improver.ensemble_calibration.ensemble_calibration_utilities import (
+    concatenate_cubes)
+from improver.grids.osgb import OSGBGRID
+
+
+TIME_UNIT = Unit("hours since 1970-01-01 00:00:00", calendar="gregorian")
+
+# Forecast reference time of the synthetic current forecast,
+# 2015-11-23 03:00.
+FORECAST_REFERENCE_TIME = 402171.0
+
+
+def measure(function, *args, **kwargs):
+    """
+    Call a function, measuring the wall time taken and the peak memory
+    allocated during the call. The memory is traced using tracemalloc,
+    which adds an overhead to the wall time, so timings should only be
+    compared with other timings from this function.
+
+    Parameters
+    ----------
+    function : Function
+        Function to be called.
+    *args, **kwargs
+        Arguments passed to the function.
+
+    Returns
+    -------
+    result
+        The result of the function.
+    elapsed_time : Float
+        Wall time in seconds.
+    peak_memory : Float
+        Peak memory in megabytes allocated during the call, in addition to
+        the memory allocated before the call.
+
+    """
+    tracemalloc.start()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    start_time = time.time()
+    try:
+        result = function(*args, **kwargs)
+        elapsed_time = time.time() - start_time
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed_time, (peak_memory - start_memory) / 1024.**2
+
+
+def _run_and_report_peak_rss(connection, function, args, kwargs):
+    """
+    Call a function within a child process, sending the wall time and the
+    peak resident set size of the process back through the connection,
+    or the error raised by the function.
+    """
+    try:
+        start_time = time.time()
+        function(*args, **kwargs)
+        elapsed_time = time.time() - start_time
+    except Exception as err:
+        connection.send((None, None, "{}: {}".format(
+            type(err).__name__, err)))
+    else:
+        # On Linux, ru_maxrss is in kilobytes.
+        peak_rss = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.)
+        connection.send((elapsed_time, peak_rss, "ok"))
+    connection.close()
+
+
+def measure_in_subprocess(function, *args, **kwargs):
+    """
+    Call a function within a forked child process, measuring the wall time
+    taken and the peak resident set size of the child. Running each
+    measurement in a new process ensures that the peak resident set size
+    is not inherited from previous measurements. The result of the
+    function is discarded.
+
+    Parameters
+    ----------
+    function : Function
+        Function to be called.
+    *args, **kwargs
+        Arguments passed to the function. The keyword argument timeout
+        (Float, in seconds) is not passed to the function, but is used to
+        terminate the child if the call takes too long.
+
+    Returns
+    -------
+    elapsed_time : Float or None
+        Wall time in seconds, or None if the call failed.
+    peak_rss : Float or None
+        Peak resident set size of the child process in megabytes,
+        including the memory inherited from the parent process, or None
+        if the call failed.
+    status : String
+        "ok" if the call succeeded, "timeout" if the call was terminated,
+        otherwise the error raised by the function.
+
+    """
+    timeout = kwargs.pop("timeout", None)
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_and_report_peak_rss,
+        args=(sender, function, args, kwargs))
+    process.start()
+    sender.close()
+    result = (None, None, "timeout")
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = (None, None, "exit code {}".format(process.exitcode))
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    receiver.close()
+    return result
+
+
+def write_csv(rows, fieldnames, filename=None):
+    """
+    Write the benchmark results as CSV.
+
+    Parameters
+    ----------
+    rows : List of dictionaries
+        Benchmark results, with one dictionary for each row.
+    fieldnames : List
+        Names of the columns.
+    filename : String
+        Name of the file to be written. If None, the results are written
+        to standard output.
+
+    """
+    if filename is None:
+        writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        with open(filename, "w") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def set_up_grid(grid_scale=1.0):
+    """
+    Create a two-dimensional cube on the UK National Grid.
+
+    Parameters
+    ----------
+    grid_scale : Float
+        Factor by which the number of grid points is multiplied in each
+        direction. A grid_scale of 1 gives the standard UK grid.
+        Grids larger than the standard UK grid are created by extending
+        the grid with the same grid spacing.
+
+    Returns
+    -------
+    Iris cube
+        Cube on the UK National Grid containing zeros.
+
+    """
+    cubes = []
+    for axis in ["y", "x"]:
+        coord = OSGBGRID.coord(axis=axis)
+        npoints = max(1, int(round(len(coord.points) * grid_scale)))
+        spacing = coord.points[1] - coord.points[0]
+        points = coord.points[0] + spacing * np.arange(npoints)
+        cubes.append(
+            DimCoord(points, coord.standard_name, units=coord.units,
+                     coord_system=coord.coord_system))
+    y_coord, x_coord = cubes
+    cube = Cube(np.zeros((len(y_coord.points), len(x_coord.points)),
+                         dtype=np.float32))
+    cube.add_dim_coord(y_coord, 0)
+    cube.add_dim_coord(x_coord, 1)
+    return cube
+
+
+def _background_field(grid, random_state):
+    """
+    Create a smoothly varying temperature field in Kelvin on the grid.
+    """
+    ylen, xlen = grid.shape
+    y_points = np.linspace(0, 2 * np.pi, ylen)[:, np.newaxis]
+    x_points = np.linspace(0, 2 * np.pi, xlen)[np.newaxis, :]
+    phase = random_state.uniform(0, 2 * np.pi)
+    return (280. + 8. * np.sin(y_points + phase) * np.cos(x_points) +
+            2. * np.cos(3 * x_points - phase)).astype(np.float32)
+
+
+def set_up_ensemble_forecast(
+        grid, no_of_members, forecast_periods,
+        forecast_reference_time=FORECAST_REFERENCE_TIME, random_state=None,
+        background=None):
+    """
+    Create a synthetic air temperature ensemble forecast.
+
+    Parameters
+    ----------
+    grid : Iris cube
+        Two-dimensional cube defining the grid.
+    no_of_members : Int
+        Number of ensemble members.
+    forecast_periods : List
+        Forecast periods in hours.
+    forecast_reference_time : Float
+        Forecast reference time in hours since 1970-01-01 00:00:00.
+    random_state : numpy.random.RandomState
+        Random state used to generate the data.
+    background : numpy.ndarray or None
+        Field on the grid about which the members are spread. If None, a
+        new background field is generated.
+
+    Returns
+    -------
+    Iris cube
+        Cube with dimensions (realization, time, y, x), with the
+        forecast_period as an auxiliary coordinate associated with time and
+        a scalar forecast_reference_time.
+
+    """
+    if random_state is None:
+        random_state = np.random.RandomState(0)
+    forecast_periods = np.array(forecast_periods, dtype=np.float64)
+    shape = (no_of_members, len(forecast_periods)) + grid.shape
+    if background is None:
+        background = _background_field(grid, random_state)
+    # Ensemble spread increases with forecast period.
+    spread = (0.5 + forecast_periods / 48.).astype(np.float32)
+    data = random_state.standard_normal(shape).astype(np.float32)
+    data *= spread[np.newaxis, :, np.newaxis, np.newaxis]
+    data += background
+    cube = Cube(data, standard_name="air_temperature", units="K")
+    cube.add_dim_coord(
+        DimCoord(np.arange(no_of_members, dtype=np.int32), "realization",
+                 units="1"), 0)
+    cube.add_dim_coord(
+        DimCoord(forecast_reference_time + forecast_periods, "time",
+                 units=TIME_UNIT), 1)
+    cube.add_dim_coord(grid.coord(axis="y").copy(), 2)
+    cube.add_dim_coord(grid.coord(axis="x").copy(), 3)
+    cube.add_aux_coord(
+        AuxCoord(forecast_periods, "forecast_period", units="hours"), 1)
+    cube.add_aux_coord(
+        AuxCoord([forecast_reference_time], "forecast_reference_time",
+                 units=TIME_UNIT))
+    return cube
+
+
+def set_up_training_data(
+        grid, no_of_members, forecast_periods, training_days,
+        forecast_reference_time=FORECAST_REFERENCE_TIME, random_state=None):
+    """
+    Create synthetic historic forecasts and truths for the training
+    period preceding the forecast_reference_time, with one forecast
+    per day. Each truth is the background field of the forecast valid at
+    its time plus noise, so that the truths are correlated with the
+    forecasts.
+
+    Parameters
+    ----------
+    grid : Iris cube
+        Two-dimensional cube defining the grid.
+    no_of_members : Int
+        Number of ensemble members.
+    forecast_periods : List
+        Forecast periods in hours.
+    training_days : Int
+        Number of days within the training period.
+    forecast_reference_time : Float
+        Forecast reference time of the current forecast in hours since
+        1970-01-01 00:00:00.
+    random_state : numpy.random.RandomState
+        Random state used to generate the data.
+
+    Returns
+    -------
+    historic_forecast : Iris cube
+        Concatenated historic forecasts.
+    truth : Iris cube
+        Concatenated truth with a forecast_reference_time matching each
+        validity time of the historic forecasts.
+
+    """
+    if random_state is None:
+        random_state = np.random.RandomState(0)
+    historic_forecasts = CubeList([])
+    backgrounds = {}
+    for day in range(1, training_days + 1):
+        background = _background_field(grid, random_state)
+        historic_forecast = set_up_ensemble_forecast(
+            grid, no_of_members, forecast_periods,
+            forecast_reference_time=forecast_reference_time - 24 * day,
+            random_state=random_state, background=background)
+        # Where the validity times of forecasts overlap, the truth follows
+        # the most recent forecast.
+        for time_point in historic_forecast.coord("time").points:
+            backgrounds.setdefault(time_point, background)
+        historic_forecasts.append(historic_forecast)
+    historic_forecast = concatenate_cubes(historic_forecasts)
+
+    truths = CubeList([])
+    for time_point in np.unique(historic_forecast.coord("time").points):
+        data = backgrounds[time_point] + random_state.standard_normal(
+            grid.shape).astype(np.float32)
+        truth = Cube(data[np.newaxis], standard_name="air_temperature",
+                     units="K")
+        truth.add_dim_coord(DimCoord([time_point], "time", units=TIME_UNIT),
+                            0)
+        truth.add_dim_coord(grid.coord(axis="y").copy(), 1)
+        truth.add_dim_coord(grid.coord(axis="x").copy(), 2)
+        truth.add_aux_coord(
+            AuxCoord([time_point], "forecast_reference_time",
+                     units=TIME_UNIT))
+        truth.add_aux_coord(
+            AuxCoord([0.], "forecast_period", units="hours"))
+        truths.append(truth)
+    truth = concatenate_cubes(truths, coords_to_slice_over=["time"])
+    return historic_forecast, truth
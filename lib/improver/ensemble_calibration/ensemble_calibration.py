@@ -32,20 +32,59 @@
 This module defines all the "plugins" specific for ensemble calibration.
 
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import copy
 import numpy as np
-import random
+import os
 from scipy import stats
-from scipy.optimize import minimize
+from scipy.optimize import minimize, OptimizeResult
+from scipy.special import log_ndtr, ndtr, ndtri_exp
 from scipy.stats import norm
+import time
 import warnings
 
 import cf_units as unit
+import dask.array as da
 import iris
 
 from improver.ensemble_calibration.ensemble_calibration_utilities import (
     convert_cube_data_to_2d, concatenate_cubes, rename_coordinate,
-    check_predictor_of_mean_flag)
+    check_predictor_of_mean_flag, select_training_point_indices,
+    sum_members_by_group)
+from improver.utilities.lazy_data import get_data
+
+
+class _TimedObjective(object):
+    """
+    Wrapper for an objective function that records the number of calls
+    and the wall time spent within the objective function.
+    """
+
+    def __init__(self, function):
+        """
+        Initialise the class.
+
+        Parameters
+        ----------
+        function : Function
+            Objective function to be wrapped.
+
+        """
+        self.function = function
+        self.calls = 0
+        self.total_time = 0.
+        self.max_time = 0.
+
+    def __call__(self, *args):
+        """Evaluate the objective function, recording the time taken."""
+        start_time = time.time()
+        result = self.function(*args)
+        call_time = time.time() - start_time
+        self.calls += 1
+        self.total_time += call_time
+        self.max_time = max(self.max_time, call_time)
+        return result
 
 
 class ContinuousRankedProbabilityScoreMinimisers(object):
@@ -77,16 +116,195 @@ class ContinuousRankedProbabilityScoreMinimisers(object):
     # as part of the minimisation.
     BAD_VALUE = np.float64(999999)
 
-    def __init__(self):
+    # Number of iterations retained from the minimisation, in order to
+    # check the percentage change within the final iteration.
+    HISTORY_LENGTH = 2
+
+    def __init__(self, statistics_callback=None):
+        """
+        Initialise the class.
+
+        Parameters
+        ----------
+        statistics_callback : Function
+            Function called after each minimisation with a dictionary of
+            statistics describing the cost of the minimisation. The
+            dictionary contains the number of calls to the objective
+            function ("objective_calls"), the total, mean and maximum wall
+            time in seconds spent within the objective function
+            ("objective_time", "mean_objective_call_time",
+            "max_objective_call_time"), the total wall time of the
+            minimisation ("minimisation_time"), the number of iterations
+            ("iterations"), the final CRPS ("final_crps") and whether the
+            minimisation converged ("converged").
+            The statistics from the most recent minimisation are also
+            available as self.statistics.
+
+        """
+        self.statistics_callback = statistics_callback
+        self.statistics = {}
         # Dictionary containing the minimisation functions, which will
         # be used, depending upon the distribution, which is requested.
         self.minimisation_dict = {
             "gaussian": self.normal_crps_minimiser,
             "truncated gaussian": self.truncated_normal_crps_minimiser}
+        # Dictionary containing the functions to calculate the CRPS at each
+        # point, which are used when minimising separately for each region.
+        self.regional_minimisation_dict = {
+            "gaussian": self.regional_normal_crps_minimiser,
+            "truncated gaussian":
+                self.regional_truncated_normal_crps_minimiser}
+
+    def _get_minimisation_function(self, distribution):
+        """
+        Function to access the minimisation function for the requested
+        distribution.
+
+        Parameters
+        ----------
+        distribution : String
+            String used to access the appropriate minimisation function
+            within self.minimisation_dict.
+
+        Returns
+        -------
+        minimisation_function : Function
+            Function to calculate the CRPS for the requested distribution.
+
+        """
+        try:
+            minimisation_function = self.minimisation_dict[distribution]
+        except KeyError as err:
+            msg = ("Distribution requested {} is not supported in {}"
+                   "Error message is {}".format(
+                       distribution, self.minimisation_dict, err))
+            raise KeyError(msg)
+        return minimisation_function
+
+    def _prepare_data_for_minimisation(
+            self, forecast_predictor, truth, forecast_var,
+            predictor_of_mean_flag, sample_index=None, member_groups=None):
+        """
+        Function to extract the data from the input cubes into the flattened
+        float32 arrays expected by the minimisation functions.
+
+        Parameters
+        ----------
+        forecast_predictor : Iris cube
+            Cube containing the fields to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        truth : Iris cube
+            Cube containing the field, which will be used as truth.
+        forecast_var : Iris cube
+            Cube containg the field containing the ensemble variance.
+        predictor_of_mean_flag : String
+            String to specify the input to calculate the calibrated mean.
+            Currently the ensemble mean ("mean") and the ensemble members
+            ("members") are supported as the predictors.
+        sample_index : Numpy array
+            Indices of the points within the flattened truth and
+            forecast variance that will be used. If None, all points are
+            used.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            if the ensemble members are the predictor, as for
+            sum_members_by_group. If None, each member has its own beta.
+
+        Returns
+        -------
+        forecast_predictor_data : Numpy array
+            Flattened forecast predictor. If the ensemble members are the
+            predictor, the array has a column for each member, or for each
+            group of members if member_groups are given.
+        truth_data : Numpy array
+            Flattened truth.
+        forecast_var_data : Numpy array
+            Flattened ensemble variance.
+
+        """
+        # Ensure predictor_of_mean_flag is valid.
+        check_predictor_of_mean_flag(predictor_of_mean_flag)
+
+        if predictor_of_mean_flag.lower() in ["mean"]:
+            forecast_predictor_data = forecast_predictor.data.flatten()
+            truth_data = truth.data.flatten()
+            forecast_var_data = forecast_var.data.flatten()
+        elif predictor_of_mean_flag.lower() in ["members"]:
+            truth_data = truth.data.flatten()
+            forecast_predictor_data = sum_members_by_group(
+                convert_cube_data_to_2d(forecast_predictor), member_groups)
+            forecast_var_data = forecast_var.data.flatten()
+
+        if sample_index is not None:
+            forecast_predictor_data = forecast_predictor_data[sample_index]
+            truth_data = truth_data[sample_index]
+            forecast_var_data = forecast_var_data[sample_index]
+
+        forecast_predictor_data = forecast_predictor_data.astype(np.float32)
+        forecast_var_data = forecast_var_data.astype(np.float32)
+        truth_data = truth_data.astype(np.float32)
+        return forecast_predictor_data, truth_data, forecast_var_data
+
+    def calculate_mean_crps(
+            self, coefficients, forecast_predictor, truth, forecast_var,
+            predictor_of_mean_flag, distribution, sample_index=None,
+            member_groups=None):
+        """
+        Function to calculate the mean CRPS per point that results from
+        applying the given coefficients.
+
+        Parameters
+        ----------
+        coefficients : List
+            List of coefficients.
+            Order of coefficients is [c, d, a, b].
+        forecast_predictor : Iris cube
+            Cube containing the fields to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        truth : Iris cube
+            Cube containing the field, which will be used as truth.
+        forecast_var : Iris cube
+            Cube containg the field containing the ensemble variance.
+        predictor_of_mean_flag : String
+            String to specify the input to calculate the calibrated mean.
+            Currently the ensemble mean ("mean") and the ensemble members
+            ("members") are supported as the predictors.
+        distribution : String
+            String used to access the appropriate minimisation function
+            within self.minimisation_dict.
+        sample_index : Numpy array
+            Indices of the points within the flattened truth and
+            forecast variance that will be used. If None, all points are
+            used.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            if the ensemble members are the predictor, as for
+            sum_members_by_group. If None, each member has its own beta.
+
+        Returns
+        -------
+        mean_crps : Float
+            CRPS averaged over all points with valid data.
+
+        """
+        minimisation_function = self._get_minimisation_function(distribution)
+        forecast_predictor_data, truth_data, forecast_var_data = (
+            self._prepare_data_for_minimisation(
+                forecast_predictor, truth, forecast_var,
+                predictor_of_mean_flag, sample_index=sample_index,
+                member_groups=member_groups))
+        sqrt_pi = np.sqrt(np.pi).astype(np.float32)
+        crps = minimisation_function(
+            np.array(coefficients, dtype=np.float32),
+            forecast_predictor_data, truth_data, forecast_var_data, sqrt_pi,
+            predictor_of_mean_flag)
+        no_of_valid_points = np.count_nonzero(~np.isnan(truth_data))
+        return crps / max(no_of_valid_points, 1)
 
     def crps_minimiser_wrapper(
             self, initial_guess, forecast_predictor, truth, forecast_var,
-            predictor_of_mean_flag, distribution):
+            predictor_of_mean_flag, distribution, sample_index=None,
+            member_groups=None):
         """
         Function to pass a given minimisation function to the scipy minimize
         function to estimate optimised values for the coefficients.
@@ -110,6 +328,14 @@ class ContinuousRankedProbabilityScoreMinimisers(object):
         distribution : String
             String used to access the appropriate minimisation function
             within self.minimisation_dict.
+        sample_index : Numpy array
+            Indices of the points within the flattened truth and
+            forecast variance that will be used for the minimisation.
+            If None, all points are used.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            if the ensemble members are the predictor, as for
+            sum_members_by_group. If None, each member has its own beta.
 
         Returns
         -------
@@ -127,9 +353,9 @@ class ContinuousRankedProbabilityScoreMinimisers(object):
 
             Parameters
             ----------
-            allvecs : List
-                List of numpy arrays containing the optimised coefficients,
-                after each iteration.
+            allvecs : Iterable
+                Numpy arrays containing the optimised coefficients
+                after at least the last two iterations.
             """
             last_iteration_percentage_change = np.absolute(
                 (allvecs[-1] - allvecs[-2]) / allvecs[-2])*100
@@ -147,47 +373,83 @@ class ContinuousRankedProbabilityScoreMinimisers(object):
                            allvecs[-2], np.absolute(allvecs[-2]-allvecs[-1]))
                 warnings.warn(msg)
 
-        try:
-            minimisation_function = self.minimisation_dict[distribution]
-        except KeyError as err:
-            msg = ("Distribution requested {} is not supported in {}"
-                   "Error message is {}".format(
-                       distribution, self.minimisation_dict, err))
-            raise KeyError(msg)
-
-        # Ensure predictor_of_mean_flag is valid.
-        check_predictor_of_mean_flag(predictor_of_mean_flag)
+        minimisation_function = self._get_minimisation_function(distribution)
 
-        if predictor_of_mean_flag.lower() in ["mean"]:
-            forecast_predictor_data = forecast_predictor.data.flatten()
-            truth_data = truth.data.flatten()
-            forecast_var_data = forecast_var.data.flatten()
-        elif predictor_of_mean_flag.lower() in ["members"]:
-            truth_data = truth.data.flatten()
-            forecast_predictor_data = convert_cube_data_to_2d(
-                forecast_predictor)
-            forecast_var_data = forecast_var.data.flatten()
+        forecast_predictor_data, truth_data, forecast_var_data = (
+            self._prepare_data_for_minimisation(
+                forecast_predictor, truth, forecast_var,
+                predictor_of_mean_flag, sample_index=sample_index,
+                member_groups=member_groups))
 
         initial_guess = np.array(initial_guess, dtype=np.float32)
-        forecast_predictor_data = forecast_predictor_data.astype(np.float32)
-        forecast_var_data = forecast_var_data.astype(np.float32)
-        truth_data = truth_data.astype(np.float32)
         sqrt_pi = np.sqrt(np.pi).astype(np.float32)
 
+        # Only the most recent iterations are retained to check the
+        # percentage change within the final iteration.
+        history = deque([initial_guess], maxlen=self.HISTORY_LENGTH)
+
+        def record_iteration(coeffs):
+            """Retain the coefficients from each iteration."""
+            history.append(np.copy(coeffs))
+
+        timed_function = _TimedObjective(minimisation_function)
+
+        start_time = time.time()
         optimised_coeffs = minimize(
-            minimisation_function, initial_guess,
+            timed_function, initial_guess,
             args=(forecast_predictor_data, truth_data,
                   forecast_var_data, sqrt_pi, predictor_of_mean_flag),
-            method="Nelder-Mead",
-            options={"maxiter": self.MAX_ITERATIONS, "return_all": True})
+            method="Nelder-Mead", callback=record_iteration,
+            options={"maxiter": self.MAX_ITERATIONS})
+        minimisation_time = time.time() - start_time
+
+        self._record_statistics(
+            timed_function, minimisation_time, optimised_coeffs.nit,
+            optimised_coeffs.fun, optimised_coeffs.success)
         if not optimised_coeffs.success:
             msg = ("Minimisation did not result in convergence after "
                    "{} iterations. \n{}".format(
                        self.MAX_ITERATIONS, optimised_coeffs.message))
             warnings.warn(msg)
-        calculate_percentage_change_in_last_iteration(optimised_coeffs.allvecs)
+        calculate_percentage_change_in_last_iteration(history)
         return optimised_coeffs.x
 
+    def _record_statistics(
+            self, timed_function, minimisation_time, iterations, final_crps,
+            converged):
+        """
+        Function to store the statistics describing the cost of the most
+        recent minimisation within self.statistics, and to pass these
+        statistics to the statistics_callback, if provided.
+
+        Parameters
+        ----------
+        timed_function : _TimedObjective
+            Wrapped objective function that has recorded the number of calls
+            and the time spent within the objective function.
+        minimisation_time : Float
+            Total wall time in seconds spent within the minimisation.
+        iterations : Int
+            Number of iterations of the minimisation.
+        final_crps : Float
+            Value of the CRPS for the optimised coefficients.
+        converged : Logical
+            Whether the minimisation converged.
+
+        """
+        self.statistics = {
+            "objective_calls": timed_function.calls,
+            "objective_time": timed_function.total_time,
+            "mean_objective_call_time": (
+                timed_function.total_time / max(timed_function.calls, 1)),
+            "max_objective_call_time": timed_function.max_time,
+            "minimisation_time": minimisation_time,
+            "iterations": iterations,
+            "final_crps": final_crps,
+            "converged": converged}
+        if self.statistics_callback is not None:
+            self.statistics_callback(self.statistics)
+
     def normal_crps_minimiser(
             self, initial_guess, forecast_predictor, truth, forecast_var,
             sqrt_pi, predictor_of_mean_flag):
@@ -309,6 +571,556 @@ class ContinuousRankedProbabilityScoreMinimisers(object):
             result = self.BAD_VALUE
         return result
 
+    def _calculate_regional_mu_and_sigma(
+            self, coeffs_at_points, forecast_predictor, forecast_var,
+            predictor_of_mean_flag):
+        """
+        Function to calculate the calibrated mean and standard deviation at
+        each point, when each point has its own set of coefficients.
+
+        Parameters
+        ----------
+        coeffs_at_points : Numpy array
+            Coefficients at each point with shape (points, coefficients).
+            Order of coefficients is [c, d, a, b].
+        forecast_predictor : Numpy array
+            Data to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        forecast_var : Numpy array
+            Ensemble variance data.
+        predictor_of_mean_flag : String
+            String to specify the input to calculate the calibrated mean.
+            Currently the ensemble mean ("mean") and the ensemble members
+            ("members") are supported as the predictors.
+
+        Returns
+        -------
+        mu : Numpy array
+            Calibrated mean at each point.
+        sigma : Numpy array
+            Calibrated standard deviation at each point.
+
+        """
+        if predictor_of_mean_flag.lower() in ["mean"]:
+            mu = coeffs_at_points[:, 2] + coeffs_at_points[:, 3] * (
+                forecast_predictor)
+        elif predictor_of_mean_flag.lower() in ["members"]:
+            mu = coeffs_at_points[:, 2] + np.sum(
+                coeffs_at_points[:, 3:]**2 * forecast_predictor, axis=1)
+        sigma = np.sqrt(
+            coeffs_at_points[:, 0]**2 +
+            coeffs_at_points[:, 1]**2 * forecast_var)
+        return mu, sigma
+
+    def regional_normal_crps_minimiser(
+            self, coeffs_at_points, forecast_predictor, truth, forecast_var,
+            sqrt_pi, predictor_of_mean_flag):
+        """
+        Function to calculate the CRPS at each point for a normal
+        distribution, when each point has its own set of coefficients.
+        See normal_crps_minimiser for the scientific reference.
+
+        Parameters
+        ----------
+        coeffs_at_points : Numpy array
+            Coefficients at each point with shape (points, coefficients).
+            Order of coefficients is [c, d, a, b].
+        forecast_predictor : Numpy array
+            Data to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        truth : Numpy array
+            Data to be used as truth.
+        forecast_var : Numpy array
+            Ensemble variance data.
+        sqrt_pi : Numpy array
+            Square root of Pi
+        predictor_of_mean_flag : String
+            String to specify the input to calculate the calibrated mean.
+            Currently the ensemble mean ("mean") and the ensemble members
+            ("members") are supported as the predictors.
+
+        Returns
+        -------
+        crps : Numpy array
+            CRPS at each point.
+        bad_value_check : Numpy array
+            Values of mu/sigma at each point. A region is assigned the
+            BAD_VALUE if the minimum of these values within the region is
+            not finite.
+
+        """
+        mu, sigma = self._calculate_regional_mu_and_sigma(
+            coeffs_at_points, forecast_predictor, forecast_var,
+            predictor_of_mean_flag)
+        xz = (truth - mu) / sigma
+        normal_cdf = norm.cdf(xz)
+        normal_pdf = norm.pdf(xz)
+        crps = sigma * (xz * (2 * normal_cdf - 1) + 2 * normal_pdf -
+                        1 / sqrt_pi)
+        return crps, mu / sigma
+
+    def regional_truncated_normal_crps_minimiser(
+            self, coeffs_at_points, forecast_predictor, truth, forecast_var,
+            sqrt_pi, predictor_of_mean_flag):
+        """
+        Function to calculate the CRPS at each point for a truncated normal
+        distribution, when each point has its own set of coefficients.
+        See truncated_normal_crps_minimiser for the scientific reference.
+
+        Parameters
+        ----------
+        coeffs_at_points : Numpy array
+            Coefficients at each point with shape (points, coefficients).
+            Order of coefficients is [c, d, a, b].
+        forecast_predictor : Numpy array
+            Data to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        truth : Numpy array
+            Data to be used as truth.
+        forecast_var : Numpy array
+            Ensemble variance data.
+        sqrt_pi : Numpy array
+            Square root of Pi
+        predictor_of_mean_flag : String
+            String to specify the input to calculate the calibrated mean.
+            Currently the ensemble mean ("mean") and the ensemble members
+            ("members") are supported as the predictors.
+
+        Returns
+        -------
+        crps : Numpy array
+            CRPS at each point.
+        bad_value_check : Numpy array
+            Values of mu/sigma at each point, or NaN where mu/sigma is
+            less than -3. A region is assigned the BAD_VALUE if the minimum
+            of these values within the region is not finite.
+
+        """
+        mu, sigma = self._calculate_regional_mu_and_sigma(
+            coeffs_at_points, forecast_predictor, forecast_var,
+            predictor_of_mean_flag)
+        xz = (truth - mu) / sigma
+        normal_cdf = norm.cdf(xz)
+        normal_pdf = norm.pdf(xz)
+        x0 = mu / sigma
+        normal_cdf_0 = norm.cdf(x0)
+        normal_cdf_root_two = norm.cdf(np.sqrt(2) * x0)
+        crps = ((sigma / normal_cdf_0**2) *
+                (xz * normal_cdf_0 * (2 * normal_cdf + normal_cdf_0 - 2) +
+                 2 * normal_pdf * normal_cdf_0 -
+                 normal_cdf_root_two / sqrt_pi))
+        return crps, np.where(x0 < -3, np.nan, x0)
+
+    def _batched_nelder_mead(self, objective, initial_guess):
+        """
+        Minimise many independent problems of the same size simultaneously
+        using the Nelder-Mead algorithm. Each step of the algorithm is
+        applied to all problems at once, so that the objective function is
+        evaluated for all problems within a single vectorised call.
+        The initial simplex, the coefficients for the reflection, expansion,
+        contraction and shrinkage and the convergence tolerances match the
+        scipy implementation.
+
+        Parameters
+        ----------
+        objective : Function
+            Function that takes an array of shape (problems, coefficients)
+            and returns an array of shape (problems,) containing the value
+            of the objective for each problem.
+        initial_guess : Numpy array
+            Initial guess with shape (problems, coefficients).
+
+        Returns
+        -------
+        result : scipy.optimize.OptimizeResult
+            Result of the minimisation with attributes: x, the optimised
+            coefficients with shape (problems, coefficients); fun, the
+            value of the objective for each problem; success, a boolean
+            array indicating whether each problem converged within the
+            maximum number of iterations; and nit, the number of
+            iterations.
+
+        """
+        rho, chi, psi, sigma = 1., 2., 0.5, 0.5
+        xatol, fatol = 1e-4, 1e-4
+        no_of_problems, no_of_coeffs = initial_guess.shape
+
+        # Set up the initial simplex by perturbing each coefficient in turn.
+        simplex = np.repeat(
+            initial_guess[:, np.newaxis, :], no_of_coeffs + 1, axis=1)
+        for index in range(no_of_coeffs):
+            vertex = simplex[:, index + 1, index]
+            simplex[:, index + 1, index] = np.where(
+                vertex != 0, 1.05 * vertex, 0.00025)
+        fsimplex = np.stack(
+            [objective(simplex[:, index]) for index in
+             range(no_of_coeffs + 1)], axis=1)
+
+        problems = np.arange(no_of_problems)
+        active = np.ones(no_of_problems, dtype=bool)
+        iterations = 0
+        for iterations in range(1, self.MAX_ITERATIONS + 1):
+            order = np.argsort(fsimplex, axis=1, kind="mergesort")
+            simplex = simplex[problems[:, np.newaxis], order]
+            fsimplex = fsimplex[problems[:, np.newaxis], order]
+
+            active = ~(
+                (np.max(np.abs(simplex[:, 1:] - simplex[:, :1]),
+                        axis=(1, 2)) <= xatol) &
+                (np.max(np.abs(fsimplex[:, 1:] - fsimplex[:, :1]),
+                        axis=1) <= fatol))
+            if not active.any():
+                iterations -= 1
+                break
+
+            best, worst = fsimplex[:, 0], fsimplex[:, -1]
+            second_worst = fsimplex[:, -2]
+            xbar = np.mean(simplex[:, :-1], axis=1)
+            xworst = simplex[:, -1]
+
+            xr = (1 + rho) * xbar - rho * xworst
+            fxr = objective(xr)
+            xnew, fxnew = xr, fxr
+
+            expand = active & (fxr < best)
+            if expand.any():
+                xe = (1 + rho * chi) * xbar - rho * chi * xworst
+                fxe = objective(xe)
+                use_xe = expand & (fxe < fxr)
+                xnew = np.where(use_xe[:, np.newaxis], xe, xnew)
+                fxnew = np.where(use_xe, fxe, fxnew)
+
+            contract = active & (fxr >= second_worst)
+            shrink = np.zeros(no_of_problems, dtype=bool)
+            if contract.any():
+                outside = fxr < worst
+                xc = np.where(
+                    outside[:, np.newaxis],
+                    (1 + psi * rho) * xbar - psi * rho * xworst,
+                    (1 - psi) * xbar + psi * xworst)
+                fxc = objective(xc)
+                accept = np.where(outside, fxc <= fxr, fxc < worst)
+                xnew = np.where(
+                    (contract & accept)[:, np.newaxis], xc, xnew)
+                fxnew = np.where(contract & accept, fxc, fxnew)
+                shrink = contract & ~accept
+
+            replace = active & ~shrink
+            simplex[replace, -1] = xnew[replace]
+            fsimplex[replace, -1] = fxnew[replace]
+
+            if shrink.any():
+                for index in range(1, no_of_coeffs + 1):
+                    shrunk = (
+                        simplex[:, 0] +
+                        sigma * (simplex[:, index] - simplex[:, 0]))
+                    simplex[shrink, index] = shrunk[shrink]
+                    fshrunk = objective(shrunk)
+                    fsimplex[shrink, index] = fshrunk[shrink]
+
+        order = np.argmin(fsimplex, axis=1)
+        return OptimizeResult(
+            x=simplex[problems, order], fun=fsimplex[problems, order],
+            success=~active, nit=iterations)
+
+    def crps_minimiser_wrapper_for_regions(
+            self, initial_guess, forecast_predictor, truth, forecast_var,
+            predictor_of_mean_flag, distribution, region_labels,
+            member_groups=None):
+        """
+        Function to estimate optimised values for the coefficients
+        separately for each region, by minimising the CRPS summed over the
+        points within each region. All regions are minimised together using
+        a vectorised implementation of the Nelder-Mead algorithm.
+
+        Parameters
+        ----------
+        initial_guess : List or Numpy array
+            Initial guess for the coefficients, either a single guess
+            used for all regions, or an array with shape
+            (regions, coefficients).
+            Order of coefficients is [c, d, a, b].
+        forecast_predictor : Iris cube
+            Cube containing the fields to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        truth : Iris cube
+            Cube containing the field, which will be used as truth.
+        forecast_var : Iris cube
+            Cube containg the field containing the ensemble variance.
+            The y and x coordinates are expected to be the trailing
+            dimensions.
+        predictor_of_mean_flag : String
+            String to specify the input to calculate the calibrated mean.
+            Currently the ensemble mean ("mean") and the ensemble members
+            ("members") are supported as the predictors.
+        distribution : String
+            String used to access the appropriate minimisation function
+            within self.regional_minimisation_dict.
+        region_labels : Numpy array
+            2d integer array (y, x) labelling the region that each grid
+            point belongs to. Regions are numbered from zero. Points with
+            a negative label are not used.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            if the ensemble members are the predictor, as for
+            sum_members_by_group. If None, each member has its own beta.
+
+        Returns
+        -------
+        optimised_coeffs : Numpy array
+            Optimised coefficients with shape (regions, coefficients).
+
+        """
+        try:
+            minimisation_function = (
+                self.regional_minimisation_dict[distribution])
+        except KeyError as err:
+            msg = ("Distribution requested {} is not supported in {}"
+                   "Error message is {}".format(
+                       distribution, self.regional_minimisation_dict, err))
+            raise KeyError(msg)
+
+        grid_shape = (len(forecast_var.coord(axis="y").points),
+                      len(forecast_var.coord(axis="x").points))
+        if region_labels.shape != grid_shape:
+            msg = ("The shape of the region_labels {} does not match the "
+                   "shape of the grid {}".format(
+                       region_labels.shape, grid_shape))
+            raise ValueError(msg)
+
+        forecast_predictor_data, truth_data, forecast_var_data = (
+            self._prepare_data_for_minimisation(
+                forecast_predictor, truth, forecast_var,
+                predictor_of_mean_flag, member_groups=member_groups))
+
+        # Order the points by region, so that the CRPS can be summed over
+        # each region using contiguous slices.
+        no_of_times = truth_data.size // region_labels.size
+        point_labels = np.tile(region_labels.flatten(), no_of_times)
+        no_of_regions = np.max(region_labels) + 1
+        order = np.argsort(point_labels, kind="mergesort")
+        order = order[point_labels[order] >= 0]
+        point_labels = point_labels[order]
+        forecast_predictor_data = forecast_predictor_data[order]
+        truth_data = truth_data[order]
+        forecast_var_data = forecast_var_data[order]
+        region_starts = np.searchsorted(
+            point_labels, np.arange(no_of_regions))
+        populated = np.bincount(point_labels, minlength=no_of_regions) > 0
+        sqrt_pi = np.sqrt(np.pi).astype(np.float32)
+
+        def objective(coeffs):
+            """Calculate the CRPS summed over each region."""
+            crps, bad_value_check = minimisation_function(
+                coeffs[point_labels], forecast_predictor_data, truth_data,
+                forecast_var_data, sqrt_pi, predictor_of_mean_flag)
+            result = np.zeros(no_of_regions)
+            bad_value = np.ones(no_of_regions, dtype=bool)
+            if point_labels.size:
+                result[populated] = np.add.reduceat(
+                    np.where(np.isnan(crps), 0, crps),
+                    region_starts[populated])
+                bad_value[populated] = ~np.isfinite(
+                    np.minimum.reduceat(
+                        bad_value_check, region_starts[populated]))
+            result[bad_value] = self.BAD_VALUE
+            return result
+
+        initial_guess = np.array(initial_guess, dtype=np.float64)
+        if initial_guess.ndim == 1:
+            initial_guess = np.tile(initial_guess, (no_of_regions, 1))
+        timed_function = _TimedObjective(objective)
+        start_time = time.time()
+        result = self._batched_nelder_mead(timed_function, initial_guess)
+        minimisation_time = time.time() - start_time
+        optimised_coeffs, converged = result.x, result.success
+        optimised_coeffs[~populated] = np.nan
+        self._record_statistics(
+            timed_function, minimisation_time, result.nit,
+            np.sum(result.fun[populated]), np.all(converged[populated]))
+        if not np.all(converged[populated]):
+            msg = ("Minimisation did not result in convergence after "
+                   "{} iterations for {} of {} regions.".format(
+                       self.MAX_ITERATIONS,
+                       np.count_nonzero(~converged[populated]),
+                       np.count_nonzero(populated)))
+            warnings.warn(msg)
+        return optimised_coeffs
+
+
+class CoefficientTable(object):
+    """
+    Table of the optimised coefficients for each date, indexed by the
+    numeric time and forecast period, held in sorted arrays so that the
+    coefficients for a time are found by a binary search.
+
+    The table provides read access like a dictionary keyed by time, i.e.
+    keys() and indexing by a time point, for the times held.
+
+    """
+    def __init__(self, time_units=None, forecast_period_units=None):
+        """
+        Create an empty table.
+
+        Parameters
+        ----------
+        time_units : cf_units.Unit or String or None
+            Units of the times within the table.
+        forecast_period_units : cf_units.Unit or String or None
+            Units of the forecast periods within the table.
+
+        """
+        self.time_units = (
+            None if time_units is None else unit.as_unit(time_units))
+        self.forecast_period_units = (
+            None if forecast_period_units is None else
+            unit.as_unit(forecast_period_units))
+        self.times = np.array([], dtype=np.float64)
+        self.forecast_periods = np.array([], dtype=np.float64)
+        self.coefficients = []
+
+    def __str__(self):
+        result = ('<CoefficientTable: times: {}; forecast_periods: {}; ' +
+                  'time_units: {}>')
+        return result.format(self.times, self.forecast_periods,
+                             self.time_units)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __contains__(self, time):
+        return self.lookup(time) is not None
+
+    def __getitem__(self, time):
+        coeffs = self.lookup(time)
+        if coeffs is None:
+            raise KeyError(time)
+        return coeffs
+
+    def keys(self):
+        """Return the times within the table, in ascending order."""
+        return self.times.tolist()
+
+    @classmethod
+    def from_dict(cls, optimised_coeffs, time_units):
+        """
+        Create a table from a dictionary of coefficients keyed by datetime.
+
+        Parameters
+        ----------
+        optimised_coeffs : Dictionary
+            Dictionary containing the optimised coefficients for each
+            date.
+        time_units : cf_units.Unit or String
+            Units of the times within the table.
+
+        Returns
+        -------
+        table : CoefficientTable
+            Table containing the coefficients for each date, without a
+            forecast period.
+
+        """
+        table = cls(time_units=time_units)
+        for date, coeffs in optimised_coeffs.items():
+            table.add(table.time_units.date2num(date), coeffs)
+        return table
+
+    def add(self, time, coefficients, forecast_period=None):
+        """
+        Add the coefficients for a time and forecast period, replacing any
+        coefficients already held for them.
+
+        Parameters
+        ----------
+        time : float
+            Time point, in the time_units of the table.
+        coefficients : List or Numpy array
+            Optimised coefficients.
+        forecast_period : float or None
+            Forecast period, in the forecast_period_units of the table. If
+            None, the coefficients are used for any forecast period at the
+            time.
+
+        """
+        time = float(time)
+        forecast_period = (
+            np.nan if forecast_period is None else float(forecast_period))
+        start = np.searchsorted(self.times, time, side="left")
+        end = np.searchsorted(self.times, time, side="right")
+        for index in range(start, end):
+            if (self.forecast_periods[index] == forecast_period or
+                    (np.isnan(self.forecast_periods[index]) and
+                     np.isnan(forecast_period))):
+                self.coefficients[index] = coefficients
+                return
+        self.times = np.insert(self.times, end, time)
+        self.forecast_periods = np.insert(
+            self.forecast_periods, end, forecast_period)
+        self.coefficients.insert(end, coefficients)
+
+    def lookup(self, time, forecast_period=None):
+        """
+        Find the coefficients for a time and forecast period.
+
+        Parameters
+        ----------
+        time : float
+            Time point, in the time_units of the table.
+        forecast_period : float or None
+            Forecast period, in the forecast_period_units of the table. If
+            None, or if the coefficients held have no forecast period, only
+            the time is matched.
+
+        Returns
+        -------
+        coefficients : List or Numpy array or None
+            Optimised coefficients, or None if the table has no
+            coefficients for the time and forecast period.
+
+        """
+        start = np.searchsorted(self.times, time, side="left")
+        end = np.searchsorted(self.times, time, side="right")
+        for index in range(start, end):
+            if (forecast_period is None or
+                    np.isnan(self.forecast_periods[index]) or
+                    self.forecast_periods[index] == forecast_period):
+                return self.coefficients[index]
+        return None
+
+    def lookup_cube(self, cube):
+        """
+        Find the coefficients for the time and forecast period of a cube
+        with a single time.
+
+        Parameters
+        ----------
+        cube : Iris cube
+            Cube with a single time point, and optionally a forecast_period
+            coordinate.
+
+        Returns
+        -------
+        coefficients : List or Numpy array or None
+            Optimised coefficients, or None if the table has no
+            coefficients for the time and forecast period.
+
+        """
+        time_coord = cube.coord("time")
+        time = time_coord.points[0]
+        if (self.time_units is not None and
+                time_coord.units != self.time_units):
+            time = time_coord.units.convert(time, self.time_units)
+        forecast_period = None
+        if cube.coords("forecast_period"):
+            fp_coord = cube.coord("forecast_period")
+            forecast_period = fp_coord.points[0]
+            if (self.forecast_period_units is not None and
+                    fp_coord.units != self.forecast_period_units):
+                forecast_period = fp_coord.units.convert(
+                    forecast_period, self.forecast_period_units)
+        return self.lookup(time, forecast_period=forecast_period)
+
 
 class EstimateCoefficientsForEnsembleCalibration(object):
     """
@@ -322,8 +1134,13 @@ class EstimateCoefficientsForEnsembleCalibration(object):
     # ESTIMATE_COEFFICIENTS_FROM_LINEAR_MODEL_FLAG = False.
     ESTIMATE_COEFFICIENTS_FROM_LINEAR_MODEL_FLAG = True
 
+    # Methods available for subsampling the training points.
+    SUBSAMPLE_METHODS = ["stride", "random", "stratified"]
+
     def __init__(self, distribution, desired_units,
-                 predictor_of_mean_flag="mean"):
+                 predictor_of_mean_flag="mean", subsample_method=None,
+                 subsample_size=None, random_seed=None, region_labels=None,
+                 member_groups=None):
         """
         Create an ensemble calibration plugin that, for Nonhomogeneous Gaussian
         Regression, calculates coefficients based on historical forecasts and
@@ -342,6 +1159,38 @@ class EstimateCoefficientsForEnsembleCalibration(object):
             String to specify the input to calculate the calibrated mean.
             Currently the ensemble mean ("mean") and the ensemble members
             ("members") are supported as the predictors.
+        subsample_method : String
+            Method used to select a subsample of the grid points within
+            the training data for estimating the coefficients, so that the
+            cost of the minimisation does not depend upon the size of the
+            grid. Accepted values are "stride", "random" or "stratified".
+            If None, all grid points are used.
+        subsample_size : Int
+            Approximate number of grid points within the subsample.
+            Required if a subsample_method is specified.
+        random_seed : Int
+            Seed used when the subsample_method is "random", so that
+            the subsample is reproducible.
+        region_labels : Numpy array
+            2d integer array (y, x) labelling the region that each grid
+            point belongs to, for example, as created by
+            create_region_labels_from_masks or
+            create_region_labels_from_blocks. If provided, a separate set of
+            coefficients is estimated for each region, and the coefficients
+            for each date are returned as fields with shape
+            (coefficients, y, x). Points with a negative label are not
+            calibrated. If None, one set of coefficients is estimated for
+            the whole domain.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            when the ensemble members are the predictor of the mean, so
+            that one beta is estimated for each group, rather than for
+            each member. Either "exchangeable", so that all members share
+            one beta, or a group label for each member in the order of the
+            realization coordinate, for example [0, 1, 1, 1] for a control
+            member followed by three perturbed members. The betas are
+            ordered by the group labels. If None, one beta is estimated for
+            each member.
 
         """
         self.distribution = distribution
@@ -349,6 +1198,39 @@ class EstimateCoefficientsForEnsembleCalibration(object):
         self.predictor_of_mean_flag = predictor_of_mean_flag
         self.minimiser = ContinuousRankedProbabilityScoreMinimisers()
 
+        if subsample_method is not None:
+            if subsample_method not in self.SUBSAMPLE_METHODS:
+                msg = ("The requested subsample_method {} is not an "
+                       "accepted value. Accepted values are {}").format(
+                           subsample_method, self.SUBSAMPLE_METHODS)
+                raise ValueError(msg)
+            if subsample_size is None or subsample_size < 1:
+                msg = ("A positive subsample_size is required when "
+                       "subsampling using the {} method. "
+                       "subsample_size: {}").format(
+                           subsample_method, subsample_size)
+                raise ValueError(msg)
+        if subsample_method is not None and region_labels is not None:
+            msg = ("Subsampling the training points is not supported when "
+                   "estimating coefficients for each region.")
+            raise ValueError(msg)
+        self.subsample_method = subsample_method
+        self.subsample_size = subsample_size
+        self.random_seed = random_seed
+        # Dictionary containing the mean CRPS for the subsample and for all
+        # points within the training data for each time point, which is
+        # populated when the coefficients are estimated from a subsample.
+        self.subsample_crps = {}
+        if region_labels is not None:
+            region_labels = np.asarray(region_labels, dtype=np.int64)
+        self.region_labels = region_labels
+        self.member_groups = member_groups
+        # Dictionary containing the statistics describing the cost of the
+        # minimisation for each time point. See
+        # ContinuousRankedProbabilityScoreMinimisers for the statistics
+        # recorded.
+        self.minimisation_statistics = {}
+
         import imp
         try:
             statsmodels_found = imp.find_module('statsmodels')
@@ -372,14 +1254,82 @@ class EstimateCoefficientsForEnsembleCalibration(object):
                   'distribution: {};' +
                   'desired_units: {}>' +
                   'predictor_of_mean_flag: {}>' +
-                  'minimiser: {}')
+                  'minimiser: {}' +
+                  'subsample_method: {}; subsample_size: {}>' +
+                  'member_groups: {}>')
         return result.format(
             self.distribution, self.desired_units,
-            self.predictor_of_mean_flag, self.minimiser)
+            self.predictor_of_mean_flag, self.minimiser,
+            self.subsample_method, self.subsample_size, self.member_groups)
+
+    def _get_subsample_index(self, forecast_predictor, forecast_var):
+        """
+        Function to find the indices of the training points to be used
+        within the minimisation. The same grid points are selected for
+        every time within the training period.
+
+        Parameters
+        ----------
+        forecast_predictor : Iris cube
+            Cube containing the fields to be used as the predictor,
+            either the ensemble mean or the ensemble members.
+        forecast_var : Iris cube
+            Cube containg the field containing the ensemble variance.
+            The y and x coordinates are expected to be the trailing
+            dimensions.
+
+        Returns
+        -------
+        sample_index : Numpy array
+            Indices of the selected points within the flattened truth and
+            forecast variance.
+
+        """
+        ylen = len(forecast_var.coord(axis="y").points)
+        xlen = len(forecast_var.coord(axis="x").points)
+        no_of_grid_points = ylen * xlen
+        # Characterise each grid point using the forecast predictor
+        # averaged over the training period, and over the ensemble members,
+        # if the members are the predictor.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            field = np.nanmean(
+                forecast_predictor.data.reshape(-1, no_of_grid_points),
+                axis=0).reshape(ylen, xlen)
+        spatial_index = select_training_point_indices(
+            field, self.subsample_method, self.subsample_size,
+            random_seed=self.random_seed)
+        no_of_times = forecast_var.data.size // no_of_grid_points
+        sample_index = (
+            np.arange(no_of_times)[:, np.newaxis] * no_of_grid_points +
+            spatial_index[np.newaxis, :])
+        return sample_index.flatten()
+
+    def _expand_region_coefficients(self, region_coeffs):
+        """
+        Function to convert the coefficients for each region into fields
+        of coefficients on the grid.
+
+        Parameters
+        ----------
+        region_coeffs : Numpy array
+            Coefficients with shape (regions, coefficients).
+
+        Returns
+        -------
+        coeff_fields : Numpy array
+            Coefficients with shape (coefficients, y, x). Points that are
+            not within a region are set to NaN.
+
+        """
+        coeff_fields = np.moveaxis(region_coeffs[self.region_labels], -1, 0)
+        coeff_fields[:, self.region_labels < 0] = np.nan
+        return coeff_fields
 
     def compute_initial_guess(
             self, truth, forecast_predictor, predictor_of_mean_flag,
-            estimate_coefficients_from_linear_model_flag, no_of_members=None):
+            estimate_coefficients_from_linear_model_flag, no_of_members=None,
+            member_groups=None):
         """
         Function to compute initial guess of the a and beta components of the
         EMOS coefficients by linear regression of the forecast predictor
@@ -409,6 +1359,11 @@ class EstimateCoefficientsForEnsembleCalibration(object):
         no_of_members : Int
             Number of members, if ensemble members are to be used as
             predictors. Default is None.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            as for sum_members_by_group. If given, the initial guess has
+            one beta for each group, estimated from the sum of the members
+            within each group.
 
         Returns
         -------
@@ -417,6 +1372,11 @@ class EstimateCoefficientsForEnsembleCalibration(object):
             Order of coefficients is [c, d, a, b].
 
         """
+        if (predictor_of_mean_flag.lower() in ["members"] and
+                member_groups is not None and no_of_members is not None):
+            # One beta is required for each group of members.
+            no_of_members = sum_members_by_group(
+                np.ones((1, no_of_members)), member_groups).shape[1]
 
         if (predictor_of_mean_flag.lower() in ["mean"] and
                 not estimate_coefficients_from_linear_model_flag):
@@ -445,9 +1405,9 @@ class EstimateCoefficientsForEnsembleCalibration(object):
             elif predictor_of_mean_flag.lower() in ["members"]:
                 if self.statsmodels_found:
                     truth_data = truth.data.flatten()
-                    forecast_data = np.array(
-                        convert_cube_data_to_2d(
-                            forecast_predictor, transpose=False))
+                    forecast_data = sum_members_by_group(
+                        convert_cube_data_to_2d(forecast_predictor),
+                        member_groups).T
                     # Find all values that are not NaN.
                     truth_not_nan = ~np.isnan(truth_data)
                     forecast_not_nan = ~np.isnan(forecast_data)
@@ -487,7 +1447,12 @@ class EstimateCoefficientsForEnsembleCalibration(object):
            d. Calculate initial guess at coefficient values by performing a
               linear regression, if requested, otherwise default values are
               used.
-           e. Perform minimisation.
+           e. Select a subsample of the training points, if requested.
+           f. Perform minimisation. If a subsample has been used, the mean
+              CRPS for the subsample and for all training points is
+              recorded within self.subsample_crps. Statistics describing
+              the cost of the minimisation are recorded within
+              self.minimisation_statistics.
 
         Parameters
         ----------
@@ -501,9 +1466,11 @@ class EstimateCoefficientsForEnsembleCalibration(object):
 
         Returns
         -------
-        optimised_coeffs : Dictionary
-            Dictionary containing a list of the optimised coefficients
-            for each date.
+        optimised_coeffs : CoefficientTable
+            Table containing a list of the optimised coefficients
+            for each time and forecast period of the current forecast. If
+            region_labels have been provided, the coefficients for each
+            date are an array of shape (coefficients, y, x).
         coeff_names : List
             The name of each coefficient.
 
@@ -534,7 +1501,7 @@ class EstimateCoefficientsForEnsembleCalibration(object):
         check_predictor_of_mean_flag(self.predictor_of_mean_flag)
 
         # Setting default values for optimised_coeffs and coeff_names.
-        optimised_coeffs = {}
+        optimised_coeffs = CoefficientTable()
         coeff_names = ["gamma", "delta", "a", "beta"]
 
         # Set default values for whether there are NaN values within the
@@ -587,12 +1554,16 @@ class EstimateCoefficientsForEnsembleCalibration(object):
             historic_forecast_cubes)
         truth_cubes = concatenate_cubes(truth_cubes)
 
+        optimised_coeffs = CoefficientTable(
+            time_units=current_forecast_cubes.coord("time").units,
+            forecast_period_units=current_forecast_cubes.coord(
+                "forecast_period").units)
+
         for current_forecast_cube in current_forecast_cubes.slices_over(
                 "time"):
-            date = unit.num2date(
-                current_forecast_cube.coord("time").points,
-                current_forecast_cube.coord("time").units.name,
-                current_forecast_cube.coord("time").units.calendar)[0]
+            time = current_forecast_cube.coord("time").points[0]
+            forecast_period = current_forecast_cube.coord(
+                "forecast_period").points[0]
             # Extract desired forecast_period from historic_forecast_cubes.
             forecast_period_constr = iris.Constraint(
                 forecast_period=current_forecast_cube.coord(
@@ -639,23 +1610,73 @@ class EstimateCoefficientsForEnsembleCalibration(object):
                     truth_cube, forecast_predictor,
                     self.predictor_of_mean_flag,
                     self.ESTIMATE_COEFFICIENTS_FROM_LINEAR_MODEL_FLAG,
-                    no_of_members=no_of_members)
+                    no_of_members=no_of_members,
+                    member_groups=self.member_groups)
 
             if np.any(np.isnan(initial_guess)):
                 nan_in_initial_guess = True
 
-            if not nan_in_initial_guess:
-                # Need to access the x attribute returned by the
-                # minimisation function.
-                optimised_coeffs[date] = (
-                    self.minimiser.crps_minimiser_wrapper(
+            if not nan_in_initial_guess and self.region_labels is not None:
+                region_coeffs = (
+                    self.minimiser.crps_minimiser_wrapper_for_regions(
                         initial_guess, forecast_predictor,
                         truth_cube, forecast_var,
                         self.predictor_of_mean_flag,
-                        self.distribution.lower()))
-                initial_guess = optimised_coeffs[date]
+                        self.distribution.lower(), self.region_labels,
+                        member_groups=self.member_groups))
+                coeffs = self._expand_region_coefficients(region_coeffs)
+                self.minimisation_statistics[time] = (
+                    self.minimiser.statistics)
+                # Regions without any valid data keep the previous initial
+                # guess for the next date.
+                initial_guess = np.where(
+                    np.isnan(region_coeffs),
+                    np.broadcast_to(initial_guess, region_coeffs.shape),
+                    region_coeffs)
+            elif not nan_in_initial_guess:
+                sample_index = None
+                if self.subsample_method is not None:
+                    sample_index = self._get_subsample_index(
+                        forecast_predictor, forecast_var)
+                # Need to access the x attribute returned by the
+                # minimisation function.
+                coeffs = self.minimiser.crps_minimiser_wrapper(
+                    initial_guess, forecast_predictor,
+                    truth_cube, forecast_var,
+                    self.predictor_of_mean_flag,
+                    self.distribution.lower(),
+                    sample_index=sample_index,
+                    member_groups=self.member_groups)
+                self.minimisation_statistics[time] = (
+                    self.minimiser.statistics)
+                initial_guess = coeffs
+                if sample_index is not None:
+                    self.subsample_crps[time] = {
+                        "subsample": self.minimiser.calculate_mean_crps(
+                            coeffs, forecast_predictor,
+                            truth_cube, forecast_var,
+                            self.predictor_of_mean_flag,
+                            self.distribution.lower(),
+                            sample_index=sample_index,
+                            member_groups=self.member_groups),
+                        "full": self.minimiser.calculate_mean_crps(
+                            coeffs, forecast_predictor,
+                            truth_cube, forecast_var,
+                            self.predictor_of_mean_flag,
+                            self.distribution.lower(),
+                            member_groups=self.member_groups)}
+            elif self.region_labels is not None:
+                # Every date has fields of coefficients, even if they could
+                # not be estimated.
+                no_of_regions = np.max(self.region_labels) + 1
+                coeffs = self._expand_region_coefficients(
+                    np.broadcast_to(
+                        initial_guess,
+                        (no_of_regions, np.shape(initial_guess)[-1])))
             else:
-                optimised_coeffs[date] = initial_guess
+                coeffs = initial_guess
+            optimised_coeffs.add(
+                time, coeffs, forecast_period=forecast_period)
 
         return optimised_coeffs, coeff_names
 
@@ -665,9 +1686,13 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
     Class to apply the optimised EMOS coefficients to future dates.
 
     """
+    # Formats in which the coefficients used can be returned.
+    COEFFICIENTS_FORMATS = ["cubelist", "compact", None]
+
     def __init__(
             self, current_forecast, optimised_coeffs, coeff_names,
-            predictor_of_mean_flag="mean"):
+            predictor_of_mean_flag="mean", coefficients_format="cubelist",
+            member_groups=None):
         """
         Create an ensemble calibration plugin that, for Nonhomogeneous Gaussian
         Regression, applies coefficients created using on historical forecasts
@@ -677,21 +1702,44 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
         ----------
         current_forecast : Iris Cube or CubeList
             The Cube or CubeList containing the current forecast.
-        optimised_coeffs : Dictionary
-            Dictionary containing a list of the optimised coefficients
-            for each date.
+        optimised_coeffs : CoefficientTable or Dictionary
+            Table containing a list of the optimised coefficients
+            for each date, as returned by
+            EstimateCoefficientsForEnsembleCalibration, or a dictionary of
+            the coefficients keyed by datetime. The coefficients for a
+            date may also be an array of coefficient fields with shape
+            (coefficients, y, x), as estimated for each region.
         coeff_names : List
             The name of each coefficient.
         predictor_of_mean_flag : String
             String to specify the input to calculate the calibrated mean.
             Currently the ensemble mean ("mean") and the ensemble members
             ("members") are supported as the predictors.
+        coefficients_format : String or None
+            Format of the coefficients returned with the calibrated
+            forecast. "cubelist" gives a cube for each coefficient for each
+            date, "compact" gives a single cube with dimensions of time and
+            coefficient, built once from all of the coefficients, and None
+            gives an empty CubeList, without creating any coefficient
+            cubes.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient, as
+            used when estimating the coefficients with
+            EstimateCoefficientsForEnsembleCalibration. If None, each
+            member has its own beta.
 
         """
         self.current_forecast = current_forecast
         self.optimised_coeffs = optimised_coeffs
         self.coeff_names = coeff_names
         self.predictor_of_mean_flag = predictor_of_mean_flag
+        if coefficients_format not in self.COEFFICIENTS_FORMATS:
+            msg = ("Invalid coefficients_format: {}. Must be one of "
+                   "{}".format(coefficients_format,
+                               self.COEFFICIENTS_FORMATS))
+            raise ValueError(msg)
+        self.coefficients_format = coefficients_format
+        self.member_groups = member_groups
 
     def _find_coords_of_length_one(self, cube, add_dimension=True):
         """
@@ -782,6 +1830,18 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
             self._separate_length_one_coords_into_aux_and_dim(
                 length_one_coords))
 
+        # Coefficient fields are stored with the y and x coordinates of
+        # the template cube as additional dimensions.
+        if np.ndim(optimised_coeffs_at_date) == 3:
+            y_coord = cube.coord(axis="y")
+            x_coord = cube.coord(axis="x")
+            length_one_coords_for_aux_coords = [
+                coord for coord in length_one_coords_for_aux_coords
+                if coord[0] not in [y_coord, x_coord]]
+            length_one_coords_for_dim_coords = (
+                length_one_coords_for_dim_coords +
+                [(y_coord, 1), (x_coord, 2)])
+
         coeff_cubes = iris.cube.CubeList([])
         for coeff, coeff_name in zip(optimised_coeffs_at_date, coeff_names):
             cube = iris.cube.Cube(
@@ -791,6 +1851,73 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
             coeff_cubes.append(cube)
         return coeff_cubes
 
+    def _create_compact_coefficient_cube(
+            self, cube, coefficient_table, coeff_names):
+        """
+        Function to create a single cube to store the coefficients used in
+        the ensemble calibration for all dates, with dimensions of time and
+        coefficient, followed by the y and x dimensions for coefficient
+        fields.
+
+        Parameters
+        ----------
+        cube : Iris cube
+            Cube with the time coordinate of the dates calibrated, from
+            which the coordinates of the coefficient cube are taken.
+        coefficient_table : List
+            Optimised coefficients for each date, in the order of the time
+            coordinate. The coefficients are None for dates without
+            coefficients, which are filled with NaN.
+        coeff_names : List
+            List of coefficient names. Any coefficients beyond the number
+            of names are additional beta coefficients.
+
+        Returns
+        -------
+        coeff_cube : Iris cube
+            Cube containing the coefficient values as the data array.
+
+        """
+        shape = (len(coeff_names),)
+        for coeffs in coefficient_table:
+            if coeffs is not None:
+                shape = np.shape(coeffs)
+                break
+        data = np.full((len(coefficient_table),) + shape, np.nan)
+        for index, coeffs in enumerate(coefficient_table):
+            if coeffs is not None:
+                data[index] = coeffs
+
+        names = list(coeff_names[:shape[0]]) + (
+            ["beta"] * (shape[0] - len(coeff_names)))
+        coefficient_coord = iris.coords.DimCoord(
+            np.arange(shape[0], dtype=np.int32),
+            long_name="coefficient_index", units="1")
+        coefficient_name_coord = iris.coords.AuxCoord(
+            names, long_name="coefficient_name", units="no_unit")
+
+        time_dims = cube.coord_dims("time")
+        dim_coords_and_dims = [
+            (iris.coords.DimCoord.from_coord(cube.coord("time")), 0),
+            (coefficient_coord, 1)]
+        if len(shape) == 3:
+            dim_coords_and_dims += [
+                (cube.coord(axis="y"), 2), (cube.coord(axis="x"), 3)]
+        aux_coords_and_dims = [(coefficient_name_coord, 1)]
+        for coord in cube.aux_coords:
+            coord_dims = cube.coord_dims(coord)
+            if not coord_dims:
+                aux_coords_and_dims.append((coord, ()))
+            elif time_dims and coord_dims == time_dims:
+                aux_coords_and_dims.append((coord, 0))
+
+        coeff_cube = iris.cube.Cube(
+            data, long_name="ensemble_calibration_coefficients",
+            units="1", attributes=cube.attributes,
+            dim_coords_and_dims=dim_coords_and_dims,
+            aux_coords_and_dims=aux_coords_and_dims)
+        return coeff_cube
+
     def apply_params_entry(self):
         """
         Wrapping function to calculate the forecast predictor and forecast
@@ -806,7 +1933,7 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
             variance, either the ensemble mean/members.
         calibrated_forecast_coefficients : CubeList
             CubeList containing both the coefficients for calibrating
-            the ensemble.
+            the ensemble, in the format given by coefficients_format.
 
         """
         # Ensure predictor_of_mean_flag is valid.
@@ -848,8 +1975,10 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
             or ensemble members.
         forecast_vars : Iris cube.
             Cube containing the forecast variance e.g. ensemble variance.
-        optimised_coeffs : List
-            Coefficients for all dates.
+        optimised_coeffs : CoefficientTable or Dictionary
+            Coefficients for all dates, as a CoefficientTable or a
+            dictionary keyed by datetime. The optimised_coeffs are not
+            modified.
         coeff_names : List
             Coefficient names.
         predictor_of_mean_flag : String
@@ -864,30 +1993,30 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
         calibrated_forecast_var_all_dates : CubeList
             List of cubes containing the calibrated forecast variance.
         calibrated_forecast_coefficients_all_dates : CubeList
-            List of cubes containing the coefficients used for calibration.
+            List of cubes containing the coefficients used for calibration,
+            in the format given by coefficients_format.
 
         """
         calibrated_forecast_predictor_all_dates = iris.cube.CubeList()
         calibrated_forecast_var_all_dates = iris.cube.CubeList()
         calibrated_forecast_coefficients_all_dates = iris.cube.CubeList()
+        coefficient_table = []
 
-        for forecast_predictor, forecast_var in zip(
+        if not isinstance(optimised_coeffs, CoefficientTable):
+            optimised_coeffs = CoefficientTable.from_dict(
+                optimised_coeffs, forecast_predictors.coord("time").units)
+
+        for forecast_predictor_at_date, forecast_var_at_date in zip(
                 forecast_predictors.slices_over("time"),
                 forecast_vars.slices_over("time")):
 
-            date = unit.num2date(
-                forecast_predictor.coord("time").points,
-                forecast_predictor.coord("time").units.name,
-                forecast_predictor.coord("time").units.calendar)[0]
-
-            with iris.FUTURE.context(cell_datetime_objects=True):
-                constr = iris.Constraint(time=date)
-                forecast_predictor_at_date = forecast_predictor.extract(constr)
-                forecast_var_at_date = forecast_var.extract(constr)
+            coeffs = optimised_coeffs.lookup_cube(forecast_predictor_at_date)
 
             # If the coefficients are not available for the date, use the
             # raw ensemble forecast as the calibrated ensemble forecast.
-            if date not in optimised_coeffs.keys():
+            if coeffs is None:
+                time_coord = forecast_predictor_at_date.coord("time")
+                date = time_coord.units.num2date(time_coord.points[0])
                 msg = ("Ensemble calibration not available "
                        "for forecasts with start time of {}. "
                        "Coefficients not available".format(
@@ -896,12 +2025,11 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
                 calibrated_forecast_predictor_at_date = (
                     forecast_predictor_at_date.copy())
                 calibrated_forecast_var_at_date = forecast_var_at_date.copy()
-                optimised_coeffs[date] = np.full(len(coeff_names), np.nan)
-                coeff_cubes = self._create_coefficient_cube(
-                    forecast_predictor_at_date, optimised_coeffs, coeff_names)
+                coeffs = np.full(len(coeff_names), np.nan)
+                coefficient_template = forecast_predictor_at_date
+                coefficient_table.append(None)
             else:
-                optimised_coeffs_at_date = (
-                    optimised_coeffs[date])
+                optimised_coeffs_at_date = coeffs
 
                 # Assigning coefficients to coefficient names.
                 if len(optimised_coeffs_at_date) == len(coeff_names):
@@ -928,34 +2056,56 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
                                optimised_coeffs_at_date))
                     raise ValueError(msg)
 
+                coefficient_fields = np.ndim(coeffs) == 3
+
                 if predictor_of_mean_flag.lower() in ["mean"]:
                     # Calculate predicted mean = a + b*X, where X is the
                     # raw ensemble mean. In this case, b = beta.
-                    beta = [optimised_coeffs_at_date["a"],
-                            optimised_coeffs_at_date["beta"]]
                     forecast_predictor_flat = (
                         forecast_predictor_at_date.data.flatten())
-                    new_col = np.ones(forecast_predictor_flat.shape)
-                    all_data = np.column_stack(
-                        (new_col, forecast_predictor_flat))
-                    predicted_mean = np.dot(all_data, beta)
+                    if coefficient_fields:
+                        predicted_mean = (
+                            optimised_coeffs_at_date["a"].flatten() +
+                            optimised_coeffs_at_date["beta"].flatten() *
+                            forecast_predictor_flat)
+                    else:
+                        beta = [optimised_coeffs_at_date["a"],
+                                optimised_coeffs_at_date["beta"]]
+                        new_col = np.ones(forecast_predictor_flat.shape)
+                        all_data = np.column_stack(
+                            (new_col, forecast_predictor_flat))
+                        predicted_mean = np.dot(all_data, beta)
                     calibrated_forecast_predictor_at_date = (
                         forecast_predictor_at_date)
                 elif predictor_of_mean_flag.lower() in ["members"]:
                     # Calculate predicted mean = a + b*X, where X is the
-                    # raw ensemble mean. In this case, b = beta^2.
-                    beta = np.concatenate(
-                        [[optimised_coeffs_at_date["a"]],
-                         optimised_coeffs_at_date["beta"]**2])
-                    forecast_predictor_flat = (
-                        convert_cube_data_to_2d(
-                            forecast_predictor_at_date))
-                    forecast_var_flat = forecast_var_at_date.data.flatten()
-
-                    new_col = np.ones(forecast_var_flat.shape)
-                    all_data = (
-                        np.column_stack((new_col, forecast_predictor_flat)))
-                    predicted_mean = np.dot(all_data, beta)
+                    # raw ensemble mean. In this case, b = beta^2. If the
+                    # betas are tied within groups of members, X is the
+                    # sum of the members within each group.
+                    forecast_predictor_flat = sum_members_by_group(
+                        convert_cube_data_to_2d(forecast_predictor_at_date),
+                        self.member_groups)
+                    if coefficient_fields:
+                        beta_fields = np.reshape(
+                            optimised_coeffs_at_date["beta"],
+                            (forecast_predictor_flat.shape[1], -1)).T
+                        predicted_mean = (
+                            optimised_coeffs_at_date["a"].flatten() +
+                            np.sum(beta_fields**2 * forecast_predictor_flat,
+                                   axis=1))
+                    else:
+                        beta = np.concatenate(
+                            [[optimised_coeffs_at_date["a"]],
+                             np.atleast_1d(
+                                 optimised_coeffs_at_date["beta"])**2])
+                        forecast_var_flat = (
+                            forecast_var_at_date.data.flatten())
+
+                        new_col = np.ones(forecast_var_flat.shape)
+                        all_data = (
+                            np.column_stack(
+                                (new_col, forecast_predictor_flat)))
+                        predicted_mean = np.dot(all_data, beta)
                     # Calculate mean of ensemble members, as only the
                     # calibrated ensemble mean will be returned.
                     calibrated_forecast_predictor_at_date = (
@@ -977,16 +2127,22 @@ class ApplyCoefficientsFromEnsembleCalibration(object):
                 calibrated_forecast_var_at_date = forecast_var_at_date
                 calibrated_forecast_var_at_date.data = predicted_var
 
-                coeff_cubes = self._create_coefficient_cube(
-                    calibrated_forecast_predictor_at_date,
-                    optimised_coeffs[date], coeff_names)
+                coefficient_template = calibrated_forecast_predictor_at_date
+                coefficient_table.append(coeffs)
 
+            if self.coefficients_format == "cubelist":
+                calibrated_forecast_coefficients_all_dates.extend(
+                    self._create_coefficient_cube(
+                        coefficient_template, coeffs, coeff_names))
             calibrated_forecast_predictor_all_dates.append(
                 calibrated_forecast_predictor_at_date)
             calibrated_forecast_var_all_dates.append(
                 calibrated_forecast_var_at_date)
-            calibrated_forecast_coefficients_all_dates.extend(coeff_cubes)
 
+        if self.coefficients_format == "compact":
+            calibrated_forecast_coefficients_all_dates.append(
+                self._create_compact_coefficient_cube(
+                    forecast_vars, coefficient_table, coeff_names))
         return (calibrated_forecast_predictor_all_dates,
                 calibrated_forecast_var_all_dates,
                 calibrated_forecast_coefficients_all_dates)
@@ -1000,7 +2156,7 @@ class EnsembleCalibration(object):
 
     """
     def __init__(self, calibration_method, distribution, desired_units,
-                 predictor_of_mean_flag="mean"):
+                 predictor_of_mean_flag="mean", member_groups=None):
         """
         Create an ensemble calibration plugin that, for Nonhomogeneous Gaussian
         Regression, calculates coefficients based on historical forecasts and
@@ -1029,21 +2185,26 @@ class EnsembleCalibration(object):
             String to specify the input to calculate the calibrated mean.
             Currently the ensemble mean ("mean") and the ensemble members
             ("members") are supported as the predictors.
+        member_groups : String or List or None
+            Groups of ensemble members sharing a tied beta coefficient,
+            as for EstimateCoefficientsForEnsembleCalibration.
         """
         self.calibration_method = calibration_method
         self.distribution = distribution
         self.desired_units = desired_units
         self.predictor_of_mean_flag = predictor_of_mean_flag
+        self.member_groups = member_groups
 
     def __str__(self):
         result = ('<EnsembleCalibration: ' +
                   'calibration_method: {}' +
                   'distribution: {};' +
                   'desired_units: {};' +
-                  'predictor_of_mean_flag: {};')
+                  'predictor_of_mean_flag: {};' +
+                  'member_groups: {}>')
         return result.format(
             self.calibration_method, self.distribution, self.desired_units,
-            self.predictor_of_mean_flag)
+            self.predictor_of_mean_flag, self.member_groups)
 
     def process(self, current_forecast, historic_forecast, truth):
         """
@@ -1084,7 +2245,8 @@ class EnsembleCalibration(object):
                     ["gaussian", "truncated gaussian"]):
                 ec = EstimateCoefficientsForEnsembleCalibration(
                     self.distribution, self.desired_units,
-                    predictor_of_mean_flag=self.predictor_of_mean_flag)
+                    predictor_of_mean_flag=self.predictor_of_mean_flag,
+                    member_groups=self.member_groups)
                 optimised_coeffs, coeff_names = (
                     ec.estimate_coefficients_for_ngr(
                         current_forecast, historic_forecast, truth))
@@ -1093,9 +2255,12 @@ class EnsembleCalibration(object):
                    "{} is not available".format(
                        format_calibration_method(self.calibration_method)))
             raise ValueError(msg)
+        # The coefficients used are not returned, so no coefficient cubes
+        # are created.
         ac = ApplyCoefficientsFromEnsembleCalibration(
             current_forecast, optimised_coeffs, coeff_names,
-            predictor_of_mean_flag=self.predictor_of_mean_flag)
+            predictor_of_mean_flag=self.predictor_of_mean_flag,
+            coefficients_format=None, member_groups=self.member_groups)
         (calibrated_forecast_predictor, calibrated_forecast_variance,
          calibrated_forecast_coefficients) = ac.apply_params_entry()
         calibrated_forecast_predictor_and_variance = iris.cube.CubeList([
@@ -1110,9 +2275,58 @@ class GeneratePercentilesFromMeanAndVariance(object):
     Copula Coupling.
     """
 
-    def __init__(self):
-        """Initialise the class."""
-        pass
+    # Percentiles and standard normal quantiles for each
+    # (no_of_percentiles, sampling, random_seed).
+    _STANDARD_QUANTILES_CACHE = {}
+
+    # Distributions for which percentiles can be generated.
+    DISTRIBUTIONS = ["gaussian", "truncated gaussian"]
+
+    def __init__(self, random_seed=None, block_shape=None,
+                 distribution="gaussian"):
+        """
+        Initialise the class.
+
+        Parameters
+        ----------
+        random_seed : int or None
+            Seed for the numpy.random.Generator used for random sampling of
+            the percentiles. If None, the random percentiles differ between
+            calls.
+        block_shape : tuple of int or None
+            If given, the number of times and y points within each block
+            of realised mean and variance data. The percentiles for each
+            block are written directly into a preallocated float32 array,
+            so that the memory required beyond the result is limited to
+            that of one block. If None, the percentiles are calculated for
+            the whole array at once, as float64.
+        distribution : String
+            Distribution of the calibrated forecast, as fitted by
+            EstimateCoefficientsForEnsembleCalibration. Either "gaussian",
+            or "truncated gaussian" for a normal distribution truncated
+            below at zero.
+
+        """
+        self.random_seed = random_seed
+        distribution = distribution.lower().replace("_", " ")
+        if distribution not in self.DISTRIBUTIONS:
+            msg = "The {} distribution is not yet implemented.".format(
+                distribution)
+            raise ValueError(msg)
+        self.distribution = distribution
+        if block_shape is not None:
+            if len(block_shape) != 2 or min(block_shape) < 1:
+                raise ValueError(
+                    "Invalid block_shape: two positive sizes required: "
+                    "{}".format(block_shape))
+            block_shape = tuple(int(x) for x in block_shape)
+        self.block_shape = block_shape
+
+    def __str__(self):
+        result = ('<GeneratePercentilesFromMeanAndVariance: ' +
+                  'random_seed: {}; block_shape: {}; distribution: {}>')
+        return result.format(self.random_seed, self.block_shape,
+                             self.distribution)
 
     def _create_cube_with_percentiles(
             self, percentiles, template_cube, cube_data):
@@ -1162,9 +2376,111 @@ class GeneratePercentilesFromMeanAndVariance(object):
         cube.cell_methods = template_cube.cell_methods
         return cube
 
+    @staticmethod
+    def _truncated_gaussian_ppf(
+            probabilities, forecast_predictor_data, forecast_variance_data):
+        """
+        Calculate the values at the given probabilities of a normal
+        distribution truncated below at zero, with the location and
+        variance of the untruncated distribution.
+
+        For location mu and standard deviation sigma, the probability of
+        the untruncated distribution exceeding zero is
+        ndtr(mu / sigma), so the value at probability p is
+        mu - sigma * ndtri((1 - p) * ndtr(mu / sigma)). This is evaluated
+        in log space, as
+        mu - sigma * ndtri_exp(log1p(-p) + log_ndtr(mu / sigma)), as
+        ndtr(mu / sigma) underflows to zero where mu / sigma is below
+        about -38. Where the variance is zero, the value is the location,
+        or zero if the location is negative.
+
+        Parameters
+        ----------
+        probabilities : Numpy array
+            Probabilities between 0 and 1, broadcastable against the
+            forecast_predictor_data.
+        forecast_predictor_data : Numpy array
+            Location of the distribution at each point.
+        forecast_variance_data : Numpy array
+            Variance of the untruncated distribution at each point.
+
+        Returns
+        -------
+        Numpy array
+            Values at the probabilities.
+
+        """
+        sigma = np.sqrt(forecast_variance_data)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_upper_tail = log_ndtr(forecast_predictor_data / sigma)
+            result = forecast_predictor_data - sigma * ndtri_exp(
+                np.log1p(-probabilities) + log_upper_tail)
+        return np.where(sigma > 0, result,
+                        np.maximum(forecast_predictor_data, 0.))
+
+    @staticmethod
+    def _calculate_percentiles_from_mean_and_variance(
+            forecast_predictor_data, forecast_variance_data, percentiles,
+            standard_quantiles=None, distribution="gaussian"):
+        """
+        Calculate the values at the percentiles of a normal distribution
+        with the supplied mean and variance.
+
+        The value at each percentile is the mean plus the standard
+        deviation multiplied by the value of the standard normal
+        distribution at the percentile. Where the variance is zero, the
+        mean is used for all percentiles. For the truncated gaussian
+        distribution, the values are calculated by
+        _truncated_gaussian_ppf.
+
+        Parameters
+        ----------
+        forecast_predictor_data : Numpy array
+            Mean of the distribution at each point.
+        forecast_variance_data : Numpy array
+            Variance of the distribution at each point, with the same shape
+            as the forecast_predictor_data.
+        percentiles : List
+            Percentiles at which to calculate the value of the phenomenon at.
+        standard_quantiles : Numpy array or None
+            Values of the standard normal distribution at the percentiles.
+            If None, these are calculated from the percentiles. Not used
+            for the truncated gaussian distribution.
+        distribution : String
+            "gaussian" or "truncated gaussian".
+
+        Returns
+        -------
+        result : Numpy array
+            Values at each percentile, with the percentiles as the leading
+            dimension followed by the dimensions of the
+            forecast_predictor_data.
+
+        """
+        shape = (-1,) + (1,) * forecast_predictor_data.ndim
+        if distribution == "truncated gaussian":
+            result = (
+                GeneratePercentilesFromMeanAndVariance._truncated_gaussian_ppf(
+                    np.asarray(percentiles, dtype=np.float64).reshape(shape),
+                    forecast_predictor_data, forecast_variance_data))
+        else:
+            if standard_quantiles is None:
+                standard_quantiles = norm.ppf(percentiles)
+            standard_quantiles = np.asarray(standard_quantiles).reshape(shape)
+            result = (standard_quantiles * np.sqrt(forecast_variance_data) +
+                      forecast_predictor_data)
+        if not np.all(np.isfinite(result)):
+            index = np.nonzero(~np.isfinite(result).reshape(
+                len(percentiles), -1).any(axis=1))[0][0]
+            msg = ("NaNs are present within the result for the {} "
+                   "percentile. Unable to calculate the percent point "
+                   "function.".format(percentiles[index]))
+            raise ValueError(msg)
+        return result
+
     def _mean_and_variance_to_percentiles(
             self, calibrated_forecast_predictor, calibrated_forecast_variance,
-            percentiles):
+            percentiles, standard_quantiles=None):
         """
         Function returning percentiles based on the supplied
         mean and variance. The percentiles are created by assuming a
@@ -1179,6 +2495,9 @@ class GeneratePercentilesFromMeanAndVariance(object):
             Variance for the calibrated forecast.
         percentiles : List
             Percentiles at which to calculate the value of the phenomenon at.
+        standard_quantiles : Numpy array or None
+            Values of the standard normal distribution at the percentiles.
+            If None, these are calculated from the percentiles.
 
         Returns
         -------
@@ -1194,45 +2513,57 @@ class GeneratePercentilesFromMeanAndVariance(object):
             calibrated_forecast_variance = iris.util.new_axis(
                 calibrated_forecast_variance, "time")
 
-        calibrated_forecast_predictor_data = (
-            calibrated_forecast_predictor.data.flatten())
-        calibrated_forecast_variance_data = (
-            calibrated_forecast_variance.data.flatten())
-
-        result = np.zeros((calibrated_forecast_predictor_data.shape[0],
-                           len(percentiles)))
-
-        # Loop over percentiles, and use a normal distribution with the mean
-        # and variance to calculate the values at each percentile.
-        for index, percentile in enumerate(percentiles):
-            percentile_list = np.repeat(
-                percentile, len(calibrated_forecast_predictor_data))
-            result[:, index] = norm.ppf(
-                percentile_list, loc=calibrated_forecast_predictor_data,
-                scale=np.sqrt(calibrated_forecast_variance_data))
-            # If percent point function (PPF) returns NaNs, fill in
-            # mean instead of NaN values. NaN will only be generated if the
-            # variance is zero. Therefore, if the variance is zero, the mean
-            # value is used for all gridpoints with a NaN.
-            if np.any(calibrated_forecast_variance_data == 0):
-                nan_index = np.argwhere(np.isnan(result[:, index]))
-                result[nan_index, index] = (
-                    calibrated_forecast_predictor_data[nan_index])
-            if np.any(np.isnan(result)):
-                msg = ("NaNs are present within the result for the {} "
-                       "percentile. Unable to calculate the percent point "
-                       "function.")
-                raise ValueError(msg)
-
-        result = result.T
-
         t_coord = calibrated_forecast_predictor.coord("time")
         y_coord = calibrated_forecast_predictor.coord(axis="y")
         x_coord = calibrated_forecast_predictor.coord(axis="x")
+        shape = (len(t_coord.points), len(y_coord.points),
+                 len(x_coord.points))
+
+        calibrated_forecast_predictor_data = get_data(
+            calibrated_forecast_predictor).reshape(shape)
+        calibrated_forecast_variance_data = get_data(
+            calibrated_forecast_variance).reshape(shape)
+
+        if (isinstance(calibrated_forecast_predictor_data, da.Array) or
+                isinstance(calibrated_forecast_variance_data, da.Array)):
+            # Each chunk is processed independently, with the percentiles
+            # added as a new leading dimension.
+            calibrated_forecast_predictor_data = da.asarray(
+                calibrated_forecast_predictor_data)
+            calibrated_forecast_variance_data = da.asarray(
+                calibrated_forecast_variance_data).rechunk(
+                    calibrated_forecast_predictor_data.chunks)
+            result = da.map_blocks(
+                self._calculate_percentiles_from_mean_and_variance,
+                calibrated_forecast_predictor_data,
+                calibrated_forecast_variance_data,
+                percentiles=percentiles,
+                standard_quantiles=standard_quantiles,
+                distribution=self.distribution, new_axis=0,
+                chunks=((len(percentiles),) +
+                        calibrated_forecast_predictor_data.chunks),
+                dtype=np.float64)
+        elif self.block_shape is not None:
+            result = np.empty((len(percentiles),) + shape, dtype=np.float32)
+            block_t, block_y = self.block_shape
+            for t_start in range(0, shape[0], block_t):
+                for y_start in range(0, shape[1], block_y):
+                    block = (slice(t_start, t_start + block_t),
+                             slice(y_start, y_start + block_y))
+                    result[(slice(None),) + block] = (
+                        self._calculate_percentiles_from_mean_and_variance(
+                            calibrated_forecast_predictor_data[block],
+                            calibrated_forecast_variance_data[block],
+                            percentiles,
+                            standard_quantiles=standard_quantiles,
+                            distribution=self.distribution))
+        else:
+            result = self._calculate_percentiles_from_mean_and_variance(
+                calibrated_forecast_predictor_data,
+                calibrated_forecast_variance_data, percentiles,
+                standard_quantiles=standard_quantiles,
+                distribution=self.distribution)
 
-        result = result.reshape(
-            len(percentiles), len(t_coord.points), len(y_coord.points),
-            len(x_coord.points))
         percentile_cube = self._create_cube_with_percentiles(
             percentiles, calibrated_forecast_predictor, result)
 
@@ -1255,7 +2586,8 @@ class GeneratePercentilesFromMeanAndVariance(object):
             Quantile: A regular set of equally-spaced percentiles aimed
                       at dividing a Cumulative Distribution Function into
                       blocks of equal probability.
-            Random: A random set of ordered percentiles.
+            Random: A random set of ordered percentiles, drawn using the
+                    random_seed of the plugin.
 
         For further details, Flowerdew, J., 2014.
         Calibrating ensemble reliability whilst preserving spatial structure.
@@ -1277,19 +2609,58 @@ class GeneratePercentilesFromMeanAndVariance(object):
                 no_of_percentiles/float(1+no_of_percentiles),
                 no_of_percentiles).tolist()
         elif sampling in ["random"]:
-            percentiles = []
-            for _ in range(no_of_percentiles):
-                percentiles.append(
-                    random.uniform(
-                        1/float(1+no_of_percentiles),
-                        no_of_percentiles/float(1+no_of_percentiles)))
-            percentiles = sorted(percentiles)
+            random_state = np.random.default_rng(self.random_seed)
+            percentiles = np.sort(random_state.uniform(
+                1/float(1+no_of_percentiles),
+                no_of_percentiles/float(1+no_of_percentiles),
+                no_of_percentiles)).tolist()
         else:
             msg = "The {} sampling option is not yet implemented.".format(
                 sampling)
             raise ValueError(msg)
         return percentiles
 
+    def _get_percentiles_and_standard_quantiles(
+            self, no_of_percentiles, sampling="quantile"):
+        """
+        Return the percentiles and the values of the standard normal
+        distribution at the percentiles.
+
+        These are cached for each number of percentiles and sampling
+        option, unless the sampling is random without a random_seed.
+
+        Parameters
+        ----------
+        no_of_percentiles : Int
+            Number of percentiles.
+        sampling : String
+            Type of sampling of the distribution, as for
+            _create_percentiles.
+
+        Returns
+        -------
+        percentiles : List
+            Percentiles calculated using the sampling technique specified.
+        standard_quantiles : Numpy array
+            Values of the standard normal distribution at the percentiles.
+            The array must not be modified.
+
+        """
+        key = (no_of_percentiles, sampling, self.random_seed)
+        cacheable = sampling != "random" or self.random_seed is not None
+        if cacheable and key in self._STANDARD_QUANTILES_CACHE:
+            percentiles, standard_quantiles = (
+                self._STANDARD_QUANTILES_CACHE[key])
+            return list(percentiles), standard_quantiles
+        percentiles = self._create_percentiles(
+            no_of_percentiles, sampling=sampling)
+        standard_quantiles = norm.ppf(percentiles)
+        standard_quantiles.flags.writeable = False
+        if cacheable:
+            self._STANDARD_QUANTILES_CACHE[key] = (
+                tuple(percentiles), standard_quantiles)
+        return percentiles, standard_quantiles
+
     def process(self, calibrated_forecast_predictor_and_variance,
                 raw_forecast):
         """
@@ -1323,12 +2694,13 @@ class GeneratePercentilesFromMeanAndVariance(object):
         no_of_percentiles = len(
             raw_forecast_members.coord("realization").points)
 
-        percentiles = self._create_percentiles(no_of_percentiles)
+        percentiles, standard_quantiles = (
+            self._get_percentiles_and_standard_quantiles(no_of_percentiles))
         calibrated_forecast_percentiles = (
             self._mean_and_variance_to_percentiles(
                 calibrated_forecast_predictor,
                 calibrated_forecast_variance,
-                percentiles))
+                percentiles, standard_quantiles=standard_quantiles))
 
         return calibrated_forecast_percentiles
 
@@ -1346,9 +2718,36 @@ class EnsembleReordering(object):
     Statistical Science, 28(4), pp.616-640.
 
     """
-    def __init__(self):
-        """Initialise the class."""
-        pass
+    def __init__(self, random_seed=None, workers=None):
+        """
+        Initialise the class.
+
+        Parameters
+        ----------
+        random_seed : int or None
+            If None, tied raw forecast values are split using random
+            numbers from the global NumPy random number generator, drawn
+            for every point. Otherwise, tied values are split using a
+            numpy.random.Generator seeded from the random_seed, the time
+            index and the location of the chunk of lazy data, with random
+            numbers only drawn for the points at which ties occur, so that
+            the result is reproducible.
+        workers : int or None
+            Number of threads used by rank_ecc_array to reorder the time
+            slices in parallel. If None, the number of processors.
+
+        """
+        self.random_seed = random_seed
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(
+                "Invalid workers: must be at least 1: {}".format(workers))
+        self.workers = int(workers)
+
+    def __str__(self):
+        result = '<EnsembleReordering: random_seed: {}; workers: {}>'
+        return result.format(self.random_seed, self.workers)
 
     def rank_ecc(self, calibrated_forecast_percentiles, raw_forecast_members):
         """
@@ -1373,22 +2772,189 @@ class EnsembleReordering(object):
 
         """
         results = iris.cube.CubeList([])
-        for rawfc, calfc in zip(
+        for time_index, (rawfc, calfc) in enumerate(zip(
                 raw_forecast_members.slices_over("time"),
-                calibrated_forecast_percentiles.slices_over("time")):
-            random_data = np.random.random(rawfc.data.shape)
-            # Lexsort returns the indices sorted firstly by the primary key,
-            # the raw forecast data, and secondly by the secondary key, an
-            # array of random data, in order to split tied values randomly.
-            sorting_index = np.lexsort((random_data, rawfc.data), axis=0)
-            # Returns the indices that would sort the array.
-            ranking = np.argsort(sorting_index, axis=0)
-            # Index the calibrated forecast data using the ranking array.
-            # np.choose allows indexing of a 3d array using a 3d array,
-            calfc.data = np.choose(ranking, calfc.data)
+                calibrated_forecast_percentiles.slices_over("time"))):
+            raw_data = get_data(rawfc)
+            cal_data = get_data(calfc)
+
+            # The time_index is bound as a default argument, as lazy blocks
+            # are only ranked after the loop over the times has completed.
+            def rank_data(raw_block, cal_block, block_info=None,
+                          time_index=time_index):
+                """Rank a block, seeded by the time and block location."""
+                if self.random_seed is None:
+                    return self._rank_data(raw_block, cal_block)
+                location = [0] * raw_block.ndim
+                if block_info is not None:
+                    location = block_info[0]["chunk-location"]
+                random_state = np.random.default_rng(
+                    [self.random_seed, time_index] + list(location))
+                return self._rank_data_with_ties(
+                    raw_block, cal_block, random_state)
+
+            if (isinstance(raw_data, da.Array) or
+                    isinstance(cal_data, da.Array)):
+                # The ranking is independent at each grid point, so chunks
+                # may span any part of the grid, provided that they contain
+                # all of the members.
+                raw_data = da.asarray(raw_data).rechunk({0: -1})
+                cal_data = da.asarray(cal_data).rechunk(raw_data.chunks)
+                calfc.data = da.map_blocks(
+                    rank_data, raw_data, cal_data, dtype=cal_data.dtype)
+            else:
+                calfc.data = rank_data(raw_data, cal_data)
             results.append(calfc)
         return concatenate_cubes(results)
 
+    def rank_ecc_array(
+            self, calibrated_forecast_percentiles, raw_forecast_members):
+        """
+        Function to apply Ensemble Copula Coupling to the whole data arrays
+        of the cubes. This ranks the calibrated forecast members based on a
+        ranking determined from the raw forecast members, as rank_ecc, but
+        without slicing and concatenating the cubes. The time slices are
+        reordered in parallel on the threads of the plugin, and written
+        into a single preallocated array.
+
+        Parameters
+        ----------
+        calibrated_forecast_percentiles : cube
+            Cube for calibrated percentiles, with the percentiles as the
+            leading dimension. The percentiles are assumed to be in
+            ascending order.
+        raw_forecast_members : cube
+            Cube containing the raw (uncalibrated) forecasts, with the
+            members as the leading dimension and the same shape as the
+            calibrated percentiles.
+
+        Returns
+        -------
+        Iris cube
+            Cube for calibrated members with the dimensions and
+            coordinates of the calibrated percentiles, where at a
+            particular grid point, the ranking of the values within the
+            ensemble matches the ranking from the raw ensemble. With a
+            random_seed, the result matches that of rank_ecc for realised
+            data.
+
+        """
+        raw_data = get_data(raw_forecast_members)
+        cal_data = get_data(calibrated_forecast_percentiles)
+        if raw_data.shape != cal_data.shape:
+            raise ValueError(
+                "The raw forecast members and calibrated forecast "
+                "percentiles must have the same shape: {} and {}".format(
+                    raw_data.shape, cal_data.shape))
+        time_dims = calibrated_forecast_percentiles.coord_dims("time")
+        time_axis = time_dims[0] if time_dims else None
+        if time_axis == 0:
+            raise ValueError(
+                "The leading dimension must be the percentiles, not time")
+        result = np.empty(cal_data.shape, dtype=cal_data.dtype)
+
+        def rank_time_slice(time_index):
+            """Reorder one time slice into the result."""
+            index = [slice(None)] * cal_data.ndim
+            if time_axis is not None:
+                index[time_axis] = time_index
+            index = tuple(index)
+            raw_slice = np.asarray(raw_data[index])
+            cal_slice = np.asarray(cal_data[index])
+            if self.random_seed is None:
+                result[index] = self._rank_data(raw_slice, cal_slice)
+            else:
+                random_state = np.random.default_rng(
+                    [self.random_seed, time_index] + [0] * raw_slice.ndim)
+                result[index] = self._rank_data_with_ties(
+                    raw_slice, cal_slice, random_state)
+
+        time_indices = [0]
+        if time_axis is not None:
+            time_indices = range(cal_data.shape[time_axis])
+        if self.workers == 1 or len(time_indices) == 1:
+            for time_index in time_indices:
+                rank_time_slice(time_index)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # Consume the results, so that any exception is raised.
+                list(executor.map(rank_time_slice, time_indices))
+        return calibrated_forecast_percentiles.copy(data=result)
+
+    @staticmethod
+    def _rank_data(raw_data, calibrated_data):
+        """
+        Reorder the calibrated data along the leading dimension to match
+        the ranking of the raw data, splitting tied values randomly.
+
+        Parameters
+        ----------
+        raw_data : Numpy array
+            Raw forecast data with the members as the leading dimension.
+        calibrated_data : Numpy array
+            Calibrated forecast data with the same shape as the raw data,
+            in ascending order along the leading dimension.
+
+        Returns
+        -------
+        Numpy array
+            The calibrated data reordered to match the ranking of the raw
+            data.
+
+        """
+        random_data = np.random.random(raw_data.shape)
+        # Lexsort returns the indices sorted firstly by the primary key,
+        # the raw forecast data, and secondly by the secondary key, an
+        # array of random data, in order to split tied values randomly.
+        sorting_index = np.lexsort((random_data, raw_data), axis=0)
+        # Returns the indices that would sort the array.
+        ranking = np.argsort(sorting_index, axis=0)
+        # Index the calibrated forecast data using the ranking array.
+        # np.choose allows indexing of a 3d array using a 3d array,
+        return np.choose(ranking, calibrated_data)
+
+    @staticmethod
+    def _rank_data_with_ties(raw_data, calibrated_data, random_state):
+        """
+        Reorder the calibrated data along the leading dimension to match
+        the ranking of the raw data, splitting tied values randomly.
+
+        The raw data are ranked with a single stable sort. Random numbers
+        are then drawn only for the points at which the sorted raw data
+        contain ties, and the members at those points are sorted again
+        with the random numbers as the secondary key.
+
+        Parameters
+        ----------
+        raw_data : Numpy array
+            Raw forecast data with the members as the leading dimension.
+        calibrated_data : Numpy array
+            Calibrated forecast data with the same shape as the raw data,
+            in ascending order along the leading dimension.
+        random_state : numpy.random.Generator
+            Source of the random numbers used to split tied values.
+
+        Returns
+        -------
+        Numpy array
+            The calibrated data reordered to match the ranking of the raw
+            data.
+
+        """
+        sorting_index = np.argsort(raw_data, axis=0, kind="stable")
+        sorted_raw_data = np.take_along_axis(raw_data, sorting_index, axis=0)
+        tied = np.any(sorted_raw_data[1:] == sorted_raw_data[:-1], axis=0)
+        if np.any(tied):
+            tied_raw_data = raw_data[:, tied]
+            random_data = random_state.random(tied_raw_data.shape)
+            sorting_index[:, tied] = np.lexsort(
+                (random_data, tied_raw_data), axis=0)
+        # The member with rank i at each point takes the ith calibrated
+        # value.
+        result = np.empty_like(calibrated_data)
+        np.put_along_axis(result, sorting_index, calibrated_data, axis=0)
+        return result
+
     def process(self, calibrated_forecast, raw_forecast):
         """
         Parameters
@@ -1416,3 +2982,440 @@ class EnsembleReordering(object):
         rename_coordinate(
             calibrated_forecast_members, "percentile", "realization")
         return calibrated_forecast_members
+
+
+class GenerateMembersFromMeanAndVariance(object):
+    """
+    Plugin for generating calibrated ensemble members directly from the
+    calibrated mean and variance, using the ranking of the raw ensemble
+    members. This is equivalent to GeneratePercentilesFromMeanAndVariance
+    followed by EnsembleReordering, i.e. Ensemble Copula Coupling, but the
+    rank of each raw member is found once at each grid point and the
+    value of the normal distribution at the percentile of that rank is
+    calculated directly in member order, without creating the cube of
+    sorted percentiles.
+
+    """
+
+    def __init__(self, sampling="quantile", random_seed=None,
+                 distribution="gaussian"):
+        """
+        Initialise the class.
+
+        Parameters
+        ----------
+        sampling : String
+            Type of sampling of the distribution to produce a set of
+            percentiles, as for
+            GeneratePercentilesFromMeanAndVariance._create_percentiles.
+        random_seed : int or None
+            Seed for splitting tied raw forecast values, as for
+            EnsembleReordering, and for random sampling of the
+            percentiles.
+        distribution : String
+            Distribution of the calibrated forecast, as for
+            GeneratePercentilesFromMeanAndVariance.
+
+        """
+        self.sampling = sampling
+        self.random_seed = random_seed
+        self.percentile_plugin = GeneratePercentilesFromMeanAndVariance(
+            random_seed=random_seed, distribution=distribution)
+        self.distribution = self.percentile_plugin.distribution
+
+    def __str__(self):
+        result = ('<GenerateMembersFromMeanAndVariance: sampling: {}; ' +
+                  'random_seed: {}; distribution: {}>')
+        return result.format(self.sampling, self.random_seed,
+                             self.distribution)
+
+    def _calculate_members(self, raw_data, forecast_predictor_data,
+                           forecast_variance_data, levels, time_index=0,
+                           location=None):
+        """
+        Calculate the calibrated members at each point.
+
+        Parameters
+        ----------
+        raw_data : Numpy array
+            Raw forecast data with the members as the leading dimension.
+        forecast_predictor_data : Numpy array
+            Mean of the calibrated distribution at each point, with the
+            shape of the raw data without the leading dimension.
+        forecast_variance_data : Numpy array
+            Variance of the calibrated distribution at each point.
+        levels : Numpy array
+            For the gaussian distribution, values of the standard normal
+            distribution at the percentiles, and otherwise the
+            percentiles, in ascending order.
+        time_index : int
+            Index of the time of the data, used with the random_seed to
+            split tied values, as for EnsembleReordering.rank_ecc.
+        location : list of int
+            Location of the block of lazy data, excluding the time
+            dimension, used with the random_seed to split tied values.
+
+        Returns
+        -------
+        Numpy array
+            Calibrated members, where the member with rank i in the raw
+            data takes the value at the ith percentile.
+
+        """
+        levels = np.broadcast_to(
+            levels.reshape((-1,) + (1,) * (raw_data.ndim - 1)),
+            raw_data.shape)
+        if self.random_seed is None:
+            member_levels = EnsembleReordering._rank_data(raw_data, levels)
+        else:
+            if location is None:
+                location = [0] * raw_data.ndim
+            random_state = np.random.default_rng(
+                [self.random_seed, time_index] + list(location))
+            member_levels = EnsembleReordering._rank_data_with_ties(
+                raw_data, levels, random_state)
+        if self.distribution == "truncated gaussian":
+            return self.percentile_plugin._truncated_gaussian_ppf(
+                member_levels, forecast_predictor_data,
+                forecast_variance_data).astype(levels.dtype)
+        # Where the variance is zero, every member takes the mean.
+        member_levels *= np.sqrt(forecast_variance_data)
+        member_levels += forecast_predictor_data
+        return member_levels
+
+    def process(self, calibrated_forecast_predictor_and_variance,
+                raw_forecast):
+        """
+        Generate calibrated ensemble members from the mean and variance.
+
+        Parameters
+        ----------
+        calibrated_forecast_predictor_and_variance : Iris CubeList
+            CubeList containing the calibrated forecast predictor and
+            calibrated forecast variance.
+        raw_forecast : Iris Cube or CubeList
+            Cube or CubeList that is expected to be the raw
+            (uncalibrated) forecast.
+
+        Returns
+        -------
+        calibrated_forecast_members : Iris cube
+            Cube for calibrated members, with the dimensions and
+            coordinates of the concatenated raw forecast members. If any
+            of the data are lazy, the result is lazy.
+
+        """
+        (calibrated_forecast_predictor, calibrated_forecast_variance) = (
+             calibrated_forecast_predictor_and_variance)
+        calibrated_forecast_predictor = concatenate_cubes(
+            calibrated_forecast_predictor)
+        calibrated_forecast_variance = concatenate_cubes(
+            calibrated_forecast_variance)
+        rename_coordinate(
+            raw_forecast, "ensemble_member_id", "realization")
+        raw_forecast_members = concatenate_cubes(raw_forecast)
+        realization_axis, = raw_forecast_members.coord_dims("realization")
+
+        no_of_percentiles = len(
+            raw_forecast_members.coord("realization").points)
+        percentiles, levels = (
+            self.percentile_plugin._get_percentiles_and_standard_quantiles(
+                no_of_percentiles, sampling=self.sampling))
+        if self.distribution == "truncated gaussian":
+            levels = np.array(percentiles)
+
+        # The members are moved to the leading dimension for the ranking.
+        raw_data = get_data(raw_forecast_members)
+        moveaxis = da.moveaxis if isinstance(raw_data, da.Array) else (
+            np.moveaxis)
+        raw_data = moveaxis(raw_data, realization_axis, 0)
+        shape = raw_data.shape[1:]
+        # Tied values are split using a random state seeded by the index of
+        # each time, as in EnsembleReordering.rank_ecc, so the times are
+        # ranked separately.
+        time_axis = None
+        if (self.random_seed is not None and
+                raw_forecast_members.coords("time")):
+            time_dims = raw_forecast_members.coord_dims("time")
+            if time_dims:
+                time_axis = time_dims[0] + int(
+                    time_dims[0] < realization_axis)
+        forecast_predictor_data = get_data(
+            calibrated_forecast_predictor).reshape(shape)
+        forecast_variance_data = get_data(
+            calibrated_forecast_variance).reshape(shape)
+        dtype = np.promote_types(np.result_type(
+            forecast_predictor_data, forecast_variance_data), np.float32)
+
+        def calculate_members(raw_block, predictor_block, variance_block,
+                              block_info=None):
+            """Calculate the members within a block, ranking each time
+            separately if tied values are split randomly."""
+            location = [0] * raw_block.ndim
+            if block_info is not None:
+                location = list(block_info[0]["chunk-location"])
+            if time_axis is None:
+                return self._calculate_members(
+                    raw_block, predictor_block, variance_block,
+                    levels.astype(dtype), location=location)
+            # Lazy data are chunked with one time per block, so the
+            # location of the block along the time axis is its time index.
+            first_time = location.pop(time_axis)
+            result = np.empty(raw_block.shape, dtype=dtype)
+            for index in range(raw_block.shape[time_axis]):
+                member_index = [slice(None)] * raw_block.ndim
+                member_index[time_axis] = index
+                member_index = tuple(member_index)
+                result[member_index] = self._calculate_members(
+                    raw_block[member_index],
+                    predictor_block[member_index[1:]],
+                    variance_block[member_index[1:]],
+                    levels.astype(dtype), time_index=first_time + index,
+                    location=location)
+            return result
+
+        if any(isinstance(data, da.Array) for data in
+               [raw_data, forecast_predictor_data, forecast_variance_data]):
+            # The members at each point are ranked together, so each chunk
+            # must contain all of the members.
+            chunks = {0: -1}
+            if time_axis is not None:
+                chunks[time_axis] = 1
+            raw_data = da.asarray(raw_data).rechunk(chunks)
+            forecast_predictor_data = da.asarray(
+                forecast_predictor_data).rechunk(raw_data.chunks[1:])
+            forecast_variance_data = da.asarray(
+                forecast_variance_data).rechunk(raw_data.chunks[1:])
+            result = da.map_blocks(
+                calculate_members, raw_data, forecast_predictor_data,
+                forecast_variance_data, dtype=dtype)
+            result = da.moveaxis(result, 0, realization_axis)
+        else:
+            result = np.moveaxis(calculate_members(
+                raw_data, forecast_predictor_data, forecast_variance_data),
+                0, realization_axis)
+        return raw_forecast_members.copy(data=result)
+
+
+class GenerateProbabilitiesFromMeanAndVariance(object):
+    """
+    Plugin for generating the probabilities of exceeding, or falling below,
+    a set of thresholds directly from the calibrated mean and variance.
+    The probabilities for all of the thresholds are calculated together
+    from the distribution, without generating percentiles or members and
+    thresholding each of them.
+
+    """
+
+    def __init__(self, thresholds, below_thresh_ok=False,
+                 distribution="gaussian"):
+        """
+        Initialise the class.
+
+        Parameters
+        ----------
+        thresholds : list of float
+            The thresholds at which to calculate the probabilities. The
+            thresholds are sorted into ascending order.
+        below_thresh_ok : boolean
+            True to calculate the probability of falling below each
+            threshold, False to calculate the probability of exceeding
+            each threshold.
+        distribution : String
+            Distribution of the calibrated forecast, as for
+            GeneratePercentilesFromMeanAndVariance.
+
+        """
+        self.thresholds = sorted(float(x) for x in thresholds)
+        if not self.thresholds:
+            raise ValueError("At least one threshold is required")
+        self.below_thresh_ok = below_thresh_ok
+        distribution = distribution.lower().replace("_", " ")
+        if (distribution not in
+                GeneratePercentilesFromMeanAndVariance.DISTRIBUTIONS):
+            msg = "The {} distribution is not yet implemented.".format(
+                distribution)
+            raise ValueError(msg)
+        self.distribution = distribution
+
+    def __str__(self):
+        result = ('<GenerateProbabilitiesFromMeanAndVariance: ' +
+                  'thresholds: {}; below_thresh_ok: {}; distribution: {}>')
+        return result.format(self.thresholds, self.below_thresh_ok,
+                             self.distribution)
+
+    @staticmethod
+    def _calculate_probabilities(
+            forecast_predictor_data, forecast_variance_data, thresholds,
+            below_thresh_ok=False, distribution="gaussian"):
+        """
+        Calculate the probabilities of exceeding each threshold for a
+        normal distribution with the supplied mean and variance.
+
+        For mean mu and standard deviation sigma, the probability of
+        exceeding the threshold t is ndtr((mu - t) / sigma), which is
+        1 - ndtr((t - mu) / sigma) without the loss of precision in the
+        upper tail. For the truncated gaussian distribution, this is
+        divided by the probability of the untruncated distribution
+        exceeding zero, using the logarithms of the probabilities so that
+        the ratio remains finite where both are very small, and the
+        probability of exceeding a negative threshold is one. Where the
+        variance is zero, the probability is one where the mean, limited
+        below at zero for the truncated gaussian distribution, exceeds the
+        threshold, and zero otherwise.
+
+        Parameters
+        ----------
+        forecast_predictor_data : Numpy array
+            Mean of the distribution at each point.
+        forecast_variance_data : Numpy array
+            Variance of the distribution at each point, with the same shape
+            as the forecast_predictor_data.
+        thresholds : List
+            Thresholds at which to calculate the probabilities.
+        below_thresh_ok : boolean
+            True to return the probabilities of falling below each
+            threshold.
+        distribution : String
+            "gaussian" or "truncated gaussian".
+
+        Returns
+        -------
+        probabilities : Numpy array
+            Probabilities as float32, with the thresholds as the leading
+            dimension followed by the dimensions of the
+            forecast_predictor_data.
+
+        """
+        thresholds = np.asarray(thresholds, dtype=np.float64).reshape(
+            (-1,) + (1,) * forecast_predictor_data.ndim)
+        sigma = np.sqrt(forecast_variance_data)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if distribution == "truncated gaussian":
+                probabilities = np.exp(
+                    log_ndtr((forecast_predictor_data - thresholds) /
+                             sigma) -
+                    log_ndtr(forecast_predictor_data / sigma))
+                probabilities = np.where(thresholds < 0, 1., probabilities)
+                forecast_predictor_data = np.maximum(
+                    forecast_predictor_data, 0.)
+            else:
+                probabilities = ndtr(
+                    (forecast_predictor_data - thresholds) / sigma)
+        probabilities = np.where(
+            sigma > 0, probabilities,
+            forecast_predictor_data > thresholds)
+        probabilities = np.clip(probabilities, 0., 1.)
+        if below_thresh_ok:
+            probabilities = 1. - probabilities
+        return probabilities.astype(np.float32)
+
+    def _create_cube_with_thresholds(self, template_cube, cube_data):
+        """
+        Create a cube of probabilities with a threshold coordinate based on
+        a template cube.
+
+        Parameters
+        ----------
+        template_cube : Iris cube
+            Cube to copy majority of coordinate definitions from.
+        cube_data : Numpy array
+            Data to insert into the template cube.
+            The data is expected to have the shape of
+            thresholds (0th dimension), time (1st dimension),
+            y_coord (2nd dimension), x_coord (3rd dimension).
+
+        Returns
+        -------
+        cube : Iris cube
+            Cube of probabilities.
+
+        """
+        threshold_coord = iris.coords.DimCoord(
+            np.array(self.thresholds, dtype=np.float32),
+            long_name="threshold", units=template_cube.units)
+
+        time_coord = template_cube.coord("time")
+        y_coord = template_cube.coord(axis="y")
+        x_coord = template_cube.coord(axis="x")
+
+        dim_coords_and_dims = [
+            (threshold_coord, 0), (time_coord, 1),
+            (y_coord, 2), (x_coord, 3)]
+
+        frt_coord = template_cube.coord("forecast_reference_time")
+        fp_coord = template_cube.coord("forecast_period")
+        aux_coords_and_dims = [(frt_coord, 1), (fp_coord, 1)]
+
+        cube = iris.cube.Cube(
+            cube_data,
+            long_name="probability_of_{}".format(template_cube.name()),
+            units="1", attributes=template_cube.attributes,
+            dim_coords_and_dims=dim_coords_and_dims,
+            aux_coords_and_dims=aux_coords_and_dims)
+        return cube
+
+    def process(self, calibrated_forecast_predictor_and_variance):
+        """
+        Generate the probabilities of exceeding, or falling below, each
+        threshold from the mean and variance.
+
+        Parameters
+        ----------
+        calibrated_forecast_predictor_and_variance : Iris CubeList
+            CubeList containing the calibrated forecast predictor and
+            calibrated forecast variance.
+
+        Returns
+        -------
+        probability_cube : Iris cube
+            Cube of probabilities with dimensions of threshold, time, y
+            and x. If either the mean or the variance is lazy, the result
+            is lazy.
+
+        """
+        (calibrated_forecast_predictor, calibrated_forecast_variance) = (
+             calibrated_forecast_predictor_and_variance)
+        calibrated_forecast_predictor = concatenate_cubes(
+            calibrated_forecast_predictor)
+        calibrated_forecast_variance = concatenate_cubes(
+            calibrated_forecast_variance)
+        if not calibrated_forecast_predictor.coord_dims("time"):
+            calibrated_forecast_predictor = iris.util.new_axis(
+                calibrated_forecast_predictor, "time")
+        if not calibrated_forecast_variance.coord_dims("time"):
+            calibrated_forecast_variance = iris.util.new_axis(
+                calibrated_forecast_variance, "time")
+
+        shape = (
+            len(calibrated_forecast_predictor.coord("time").points),
+            len(calibrated_forecast_predictor.coord(axis="y").points),
+            len(calibrated_forecast_predictor.coord(axis="x").points))
+        forecast_predictor_data = get_data(
+            calibrated_forecast_predictor).reshape(shape)
+        forecast_variance_data = get_data(
+            calibrated_forecast_variance).reshape(shape)
+
+        if (isinstance(forecast_predictor_data, da.Array) or
+                isinstance(forecast_variance_data, da.Array)):
+            # Each chunk is processed independently, with the thresholds
+            # added as a new leading dimension.
+            forecast_predictor_data = da.asarray(forecast_predictor_data)
+            forecast_variance_data = da.asarray(
+                forecast_variance_data).rechunk(
+                    forecast_predictor_data.chunks)
+            result = da.map_blocks(
+                self._calculate_probabilities, forecast_predictor_data,
+                forecast_variance_data, thresholds=self.thresholds,
+                below_thresh_ok=self.below_thresh_ok,
+                distribution=self.distribution, new_axis=0,
+                chunks=((len(self.thresholds),) +
+                        forecast_predictor_data.chunks),
+                dtype=np.float32)
+        else:
+            result = self._calculate_probabilities(
+                forecast_predictor_data, forecast_variance_data,
+                self.thresholds, below_thresh_ok=self.below_thresh_ok,
+                distribution=self.distribution)
+        return self._create_cube_with_thresholds(
+            calibrated_forecast_predictor, result)
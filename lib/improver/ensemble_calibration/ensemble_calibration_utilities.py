@@ -304,3 +304,183 @@ def check_predictor_of_mean_flag(predictor_of_mean_flag):
                "Accepted values are 'mean' or 'members'").format(
                    predictor_of_mean_flag.lower())
         raise ValueError(msg)
+
+
+def sum_members_by_group(forecast_predictor_data, member_groups):
+    """
+    Sum the ensemble members within each group of members that share a
+    tied beta coefficient, when the ensemble members are used as the
+    predictor of the mean. The calibrated mean is then a + sum over the
+    groups of beta^2 times the sum of the members within the group, so that
+    the coefficients for the grouped members have one beta per group.
+
+    Parameters
+    ----------
+    forecast_predictor_data : Numpy array
+        2d array with a column for each ensemble member, as created by
+        convert_cube_data_to_2d.
+    member_groups : String or List or None
+        Groups of members sharing a beta coefficient. Either
+        "exchangeable", so that all members share one beta, or a group
+        label for each member, in the order of the columns. The groups
+        are ordered by their labels. If None, each member has its own
+        beta, and the data are returned unchanged.
+
+    Returns
+    -------
+    forecast_predictor_data : Numpy array
+        2d array with a column for each group of members.
+
+    """
+    if member_groups is None:
+        return forecast_predictor_data
+    no_of_members = forecast_predictor_data.shape[1]
+    if isinstance(member_groups, str):
+        if member_groups.lower() != "exchangeable":
+            msg = ("The requested member_groups {} is not an accepted "
+                   "value. Accepted values are 'exchangeable' or a group "
+                   "label for each member.".format(member_groups))
+            raise ValueError(msg)
+        group_indices = np.zeros(no_of_members, dtype=np.int64)
+    else:
+        member_groups = np.asarray(member_groups)
+        if member_groups.shape != (no_of_members,):
+            msg = ("The member_groups must contain a group label for each "
+                   "of the {} members. member_groups: {}".format(
+                       no_of_members, member_groups))
+            raise ValueError(msg)
+        _, group_indices = np.unique(member_groups, return_inverse=True)
+    indicator = np.zeros(
+        (no_of_members, np.max(group_indices) + 1),
+        dtype=forecast_predictor_data.dtype)
+    indicator[np.arange(no_of_members), group_indices] = 1
+    return np.dot(forecast_predictor_data, indicator)
+
+
+def select_training_point_indices(
+        field, subsample_method, subsample_size, random_seed=None):
+    """
+    Select a deterministic subsample of the points within a 2d training field,
+    so that the cost of estimating coefficients does not depend upon the
+    size of the grid.
+
+    Parameters
+    ----------
+    field : Numpy array
+        2d array (y, x) of values used to characterise each point, for
+        example, the ensemble mean averaged over the training period.
+        The values are only used by the "stratified" method.
+    subsample_method : String
+        Method used to select the points. Accepted values are:
+        stride: A regular spacing of points in both the x and y direction.
+        random: A random set of points, drawn without replacement using
+                the random_seed.
+        stratified: Points spaced regularly through the sorted values of
+                    the field, so that the full range of values is
+                    represented. Points with NaN values are only
+                    selected if there are too few finite points.
+    subsample_size : Int
+        Approximate number of points to be selected. If the field contains
+        fewer points, all points are selected.
+    random_seed : Int
+        Seed for the random number generator used by the "random" method.
+
+    Returns
+    -------
+    indices : Numpy array
+        Sorted indices of the selected points within the flattened field.
+
+    """
+    no_of_points = field.size
+    if subsample_size >= no_of_points:
+        return np.arange(no_of_points)
+
+    if subsample_method == "stride":
+        step = max(1, int(np.sqrt(no_of_points / float(subsample_size))))
+        indices = np.arange(no_of_points).reshape(field.shape)
+        indices = indices[::step, ::step].flatten()
+    elif subsample_method == "random":
+        random_state = np.random.RandomState(random_seed)
+        indices = np.sort(
+            random_state.choice(no_of_points, subsample_size, replace=False))
+    elif subsample_method == "stratified":
+        # Only the finite points are stratified. Points with NaN values are
+        # only selected if there are too few finite points.
+        values = field.flatten()
+        finite = np.isfinite(values)
+        finite_index = np.flatnonzero(finite)
+        if finite_index.size <= subsample_size:
+            nan_index = np.flatnonzero(~finite)
+            indices = np.sort(np.concatenate(
+                [finite_index,
+                 nan_index[:subsample_size - finite_index.size]]))
+        else:
+            sorted_index = finite_index[
+                np.argsort(values[finite_index], kind="mergesort")]
+            positions = np.linspace(
+                0, finite_index.size - 1, subsample_size)
+            indices = np.unique(
+                sorted_index[np.round(positions).astype(int)])
+    else:
+        msg = ("The requested subsample_method {} is not an accepted value. "
+               "Accepted values are 'stride', 'random' or "
+               "'stratified'").format(subsample_method)
+        raise ValueError(msg)
+    return indices
+
+
+def create_region_labels_from_masks(masks):
+    """
+    Create an array labelling the region that each grid point belongs to
+    from a set of region masks.
+
+    Parameters
+    ----------
+    masks : List of Numpy arrays
+        2d boolean arrays (y, x), which are True for the grid points within
+        each region. If a grid point is within more than one region, it is
+        assigned to the last of these regions.
+
+    Returns
+    -------
+    region_labels : Numpy array
+        2d integer array (y, x) containing the index of the region for each
+        grid point, or -1 for grid points not within any region.
+
+    """
+    region_labels = np.full(np.shape(masks[0]), -1, dtype=np.int64)
+    for index, mask in enumerate(masks):
+        region_labels[np.asarray(mask, dtype=bool)] = index
+    return region_labels
+
+
+def create_region_labels_from_blocks(ylen, xlen, block_size):
+    """
+    Create an array labelling the region that each grid point belongs to,
+    where each region is a square block of neighbouring grid points.
+
+    Parameters
+    ----------
+    ylen : Int
+        Number of grid points in the y direction.
+    xlen : Int
+        Number of grid points in the x direction.
+    block_size : Int
+        Number of grid points along each side of a block. A block_size of
+        1 gives a separate region for each grid point.
+
+    Returns
+    -------
+    region_labels : Numpy array
+        2d integer array (y, x) containing the index of the region for each
+        grid point.
+
+    """
+    if block_size < 1:
+        msg = "The block_size must be at least 1. block_size: {}".format(
+            block_size)
+        raise ValueError(msg)
+    no_of_x_blocks = -(-xlen // block_size)
+    y_block = np.arange(ylen) // block_size
+    x_block = np.arange(xlen) // block_size
+    return y_block[:, np.newaxis] * no_of_x_blocks + x_block[np.newaxis, :]
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Module providing the grid spacing of cubes for neighbourhood processing."""
+
+import warnings
+
+import iris
+import iris.analysis.cartography
+import iris.coord_systems
+import numpy as np
+
+
+# Radius of the Earth used by iris for coordinate systems without one.
+EARTH_RADIUS = iris.analysis.cartography.DEFAULT_SPHERICAL_EARTH_RADIUS
+
+# Relative tolerance for the grid spacing to be considered uniform.
+UNIFORM_TOLERANCE = 1.0e-5
+
+# Maximum number of grids held in the cache of grid geometries.
+MAX_CACHED_GEOMETRIES = 32
+
+_GEOMETRY_CACHE = {}
+
+
+class GridGeometry(object):
+    """
+    The spacing in metres of a grid with projection x and y coordinates,
+    or latitude and longitude coordinates.
+
+    For latitude and longitude grids, the spacing of the longitudes in
+    metres decreases with latitude, so the x spacing is also given for
+    each row of the grid.
+
+    """
+
+    def __init__(self, x_coord, y_coord):
+        """
+        Calculate the grid spacing from the coordinates.
+
+        Parameters
+        ----------
+        x_coord : iris.coords.Coord
+            The projection_x_coordinate or longitude coordinate.
+        y_coord : iris.coords.Coord
+            The projection_y_coordinate or latitude coordinate.
+
+        """
+        self.x_name = x_coord.name()
+        self.y_name = y_coord.name()
+        self.is_latlon = self.y_name in ["latitude", "grid_latitude"]
+        if self.is_latlon:
+            coord_system = y_coord.coord_system
+            if isinstance(coord_system, iris.coord_systems.RotatedGeogCS):
+                coord_system = coord_system.ellipsoid
+            radius = EARTH_RADIUS
+            if coord_system is not None:
+                radius = coord_system.semi_major_axis
+            x_points = np.radians(
+                x_coord.units.convert(x_coord.points, "degrees"))
+            y_points = np.radians(
+                y_coord.units.convert(y_coord.points, "degrees"))
+            y_spacing = radius * np.diff(y_points)
+            x_spacing = radius * np.diff(x_points)
+            self.row_x_spacing = np.abs(
+                x_spacing[0] * np.cos(y_points))
+        else:
+            x_points = x_coord.units.convert(x_coord.points, "metres")
+            y_points = y_coord.units.convert(y_coord.points, "metres")
+            x_spacing = np.diff(x_points)
+            y_spacing = np.diff(y_points)
+            self.row_x_spacing = None
+        self.x_spacing = abs(x_spacing[0])
+        self.y_spacing = abs(y_spacing[0])
+        self.x_uniform = np.allclose(x_spacing, x_spacing[0],
+                                     rtol=UNIFORM_TOLERANCE, atol=0.)
+        self.y_uniform = np.allclose(y_spacing, y_spacing[0],
+                                     rtol=UNIFORM_TOLERANCE, atol=0.)
+        if not (self.x_uniform and self.y_uniform):
+            warnings.warn(
+                "Grid spacing is not uniform: using the spacing between "
+                "the first two points of {} and {}".format(
+                    self.x_name, self.y_name))
+
+    def __str__(self):
+        result = ('<GridGeometry: x_spacing: {}; y_spacing: {}; ' +
+                  'x_uniform: {}; y_uniform: {}; is_latlon: {}>')
+        return result.format(self.x_spacing, self.y_spacing,
+                             self.x_uniform, self.y_uniform, self.is_latlon)
+
+
+def _coord_key(coord):
+    """Return a hashable key describing the points of a coordinate."""
+    return (coord.name(), str(coord.units), coord.points.dtype.str,
+            coord.points.tobytes())
+
+
+def get_grid_geometry(cube):
+    """
+    Return the grid geometry of the cube.
+
+    The geometry is cached by the coordinate system and points of the
+    x and y coordinates, so that it is only calculated once for each grid.
+
+    Parameters
+    ----------
+    cube : iris.cube.Cube
+        Cube with projection_x_coordinate and projection_y_coordinate, or
+        latitude and longitude, coordinates.
+
+    Returns
+    -------
+    GridGeometry
+        The grid geometry of the cube.
+
+    """
+    for x_name, y_name in [
+            ("projection_x_coordinate", "projection_y_coordinate"),
+            ("longitude", "latitude"),
+            ("grid_longitude", "grid_latitude")]:
+        try:
+            x_coord = cube.coord(x_name)
+            y_coord = cube.coord(y_name)
+        except iris.exceptions.CoordinateNotFoundError:
+            continue
+        break
+    else:
+        raise ValueError("Invalid grid: projection_x/y or "
+                         "latitude/longitude coords required")
+    key = (repr(y_coord.coord_system), _coord_key(x_coord),
+           _coord_key(y_coord))
+    try:
+        return _GEOMETRY_CACHE[key]
+    except KeyError:
+        pass
+    if len(_GEOMETRY_CACHE) >= MAX_CACHED_GEOMETRIES:
+        _GEOMETRY_CACHE.clear()
+    geometry = GridGeometry(x_coord, y_coord)
+    _GEOMETRY_CACHE[key] = geometry
+    return geometry
@@ -31,10 +31,17 @@
 """Module containing neighbourhood processing utilities."""
 
 
+import math
+
+import dask.array as da
 import iris
 import numpy as np
 import scipy.ndimage.filters
 
+from improver.grids.geometry import get_grid_geometry
+from improver.threshold import BasicThreshold
+from improver.utilities.lazy_data import check_for_nan, get_data
+
 
 class BasicNeighbourhoodProcessing(object):
     """
@@ -55,7 +62,15 @@ class BasicNeighbourhoodProcessing(object):
     # Max extent of kernel in grid cells.
     MAX_KERNEL_CELL_RADIUS = 500
 
-    def __init__(self, radius_in_km, unweighted_mode=False):
+    # Methods of applying the kernel.
+    ENGINES = ["dense", "chord"]
+
+    # Orders in which the mean over realizations may be taken.
+    COLLAPSE_ORDERS = [None, "before", "after"]
+
+    def __init__(self, radius_in_km, unweighted_mode=False, engine="dense",
+                 masked_mode=False, lead_times=None,
+                 collapse_realizations=None, scheduler=None):
         """
         Create a neighbourhood processing plugin that applies a smoothing
         kernel to points in a cube.
@@ -63,66 +78,832 @@ class BasicNeighbourhoodProcessing(object):
         Parameters
         ----------
 
-        radius_in_km : float
+        radius_in_km : float or list of float
             The radius in kilometres of the neighbourhood kernel to
             apply. Rounded up to convert into integer number of grid
             points east and north, based on the characteristic spacing
             at the zero indices of the cube projection-x/y coords.
+            If lead_times are given, a list of radii, one for each lead
+            time.
 
         unweighted_mode : boolean
             If True, use a circle with constant weighting.
             If False, use a circle for neighbourhood kernel with
             weighting decreasing with radius.
 
+        engine : string
+            Method of applying the kernel. "dense" correlates the data with
+            the full two-dimensional kernel, at a cost proportional to the
+            square of the radius at each grid point. "chord" decomposes the
+            circular kernel into one chord for each row of the kernel and
+            sums each chord using cumulative sums along the rows, at a cost
+            proportional to the radius at each grid point. Both give the
+            same result, apart from rounding.
+
+        masked_mode : boolean
+            If True, NaN and masked points are treated as missing rather
+            than raising an error. Each point is then the kernel-weighted
+            mean of the valid points within its neighbourhood, calculated
+            as correlate(data * valid, kernel) / correlate(valid, kernel),
+            and points without any valid points within their neighbourhood
+            are masked.
+
+        lead_times : list of float
+            Forecast periods in hours, in ascending order, at which the
+            radii are defined. The radius for each forecast_period of the
+            cube is linearly interpolated between the lead times, and
+            held constant beyond the first and last lead times.
+
+        collapse_realizations : string or None
+            If None, cubes with more than one realization are rejected.
+            Otherwise, the result is the mean over the realizations of the
+            neighbourhood processed data. "before" takes the mean over the
+            realizations and then applies the kernel once, and "after"
+            applies the kernel to each realization and then takes the mean.
+            As the kernel is linear, both give the same result, but
+            "before" applies the kernel once rather than once for each
+            realization. In masked_mode, the kernel is normalised by the
+            valid points, so the results differ where the missing points
+            differ between realizations: "before" weights each point by
+            the number of valid realizations, and "after" weights each
+            realization equally.
+
+        scheduler : improver.utilities.tiling.TileScheduler
+            If given, the kernel is applied to realised data tile by tile
+            using the threads of the scheduler, with a halo of the kernel
+            radius around each tile.
+
         """
-        self.radius_in_km = float(radius_in_km)
+        if lead_times is None:
+            self.radius_in_km = float(radius_in_km)
+            self.lead_times = None
+        else:
+            self.radius_in_km = [float(x) for x in radius_in_km]
+            self.lead_times = [float(x) for x in lead_times]
+            if len(self.radius_in_km) != len(self.lead_times):
+                raise ValueError(
+                    "Invalid radius_in_km: {} radii given for {} "
+                    "lead_times".format(len(self.radius_in_km),
+                                        len(self.lead_times)))
+            if np.any(np.diff(self.lead_times) <= 0):
+                raise ValueError(
+                    "Invalid lead_times: must be in ascending order: "
+                    "{}".format(self.lead_times))
         self.unweighted_mode = bool(unweighted_mode)
+        if engine not in self.ENGINES:
+            raise ValueError(
+                "Invalid engine: {} not in {}".format(engine, self.ENGINES))
+        self.engine = engine
+        self.masked_mode = bool(masked_mode)
+        if collapse_realizations not in self.COLLAPSE_ORDERS:
+            raise ValueError(
+                "Invalid collapse_realizations: {} not in {}".format(
+                    collapse_realizations, self.COLLAPSE_ORDERS))
+        self.collapse_realizations = collapse_realizations
+        self.scheduler = scheduler
 
     def __str__(self):
         result = ('<NeighbourhoodProcessing: radius_in_km: {};' +
-                  'unweighted_mode: {}>')
+                  'unweighted_mode: {}; engine: {}; masked_mode: {}; ' +
+                  'lead_times: {}; collapse_realizations: {}>')
         return result.format(
-            self.radius_in_km, self.unweighted_mode)
+            self.radius_in_km, self.unweighted_mode, self.engine,
+            self.masked_mode, self.lead_times, self.collapse_realizations)
 
-    def get_grid_x_y_kernel_ranges(self, cube):
-        """Return grid cell numbers east and north for the kernel."""
-        try:
-            x_coord = cube.coord("projection_x_coordinate").copy()
-            y_coord = cube.coord("projection_y_coordinate").copy()
-        except iris.exceptions.CoordinateNotFoundError:
+    def get_grid_x_y_kernel_ranges(self, cube, radius_in_km=None,
+                                   allow_row_ranges=False):
+        """Return grid cell numbers east and north for the kernel.
+
+        The radius_in_km of the plugin is used unless a radius_in_km is
+        given. The grid spacing is taken from the cached geometry of the
+        grid, as returned by improver.grids.geometry.get_grid_geometry.
+
+        For latitude and longitude grids, on which the spacing east
+        decreases with latitude, the number of grid cells east is
+        calculated for each row of the grid, and returned as a tuple
+        in place of a single number. These ranges are only returned if
+        allow_row_ranges is True.
+        """
+        if radius_in_km is None:
+            radius_in_km = self.radius_in_km
+        geometry = get_grid_geometry(cube)
+        if geometry.is_latlon and not allow_row_ranges:
             raise ValueError("Invalid grid: projection_x/y coords required")
-        x_coord.convert_units("metres")
-        y_coord.convert_units("metres")
-        d_north_metres = y_coord.points[1] - y_coord.points[0]
-        d_east_metres = x_coord.points[1] - x_coord.points[0]
-        grid_cells_y = int(self.radius_in_km * 1000 / abs(d_north_metres))
-        grid_cells_x = int(self.radius_in_km * 1000 / abs(d_east_metres))
-        if grid_cells_x == 0 or grid_cells_y == 0:
+        grid_cells_y = int(radius_in_km * 1000 / geometry.y_spacing)
+        if geometry.is_latlon:
+            grid_cells_x = tuple(
+                int(x) for x in radius_in_km * 1000 / geometry.row_x_spacing)
+            max_grid_cells_x = max(grid_cells_x)
+        else:
+            grid_cells_x = int(radius_in_km * 1000 / geometry.x_spacing)
+            max_grid_cells_x = grid_cells_x
+        if max_grid_cells_x == 0 or grid_cells_y == 0:
             raise ValueError(
                 ("Neighbourhood processing radius of " +
-                 "{0} km ".format(self.radius_in_km) +
+                 "{0} km ".format(radius_in_km) +
                  "gives zero cell extent")
             )
-        if (grid_cells_x > self.MAX_KERNEL_CELL_RADIUS or
+        if (max_grid_cells_x > self.MAX_KERNEL_CELL_RADIUS or
                 grid_cells_y > self.MAX_KERNEL_CELL_RADIUS):
             raise ValueError(
                 ("Neighbourhood processing radius of " +
-                 "{0} km ".format(self.radius_in_km) +
+                 "{0} km ".format(radius_in_km) +
                  "exceeds maximum grid cell extent")
             )
         return grid_cells_x, grid_cells_y
 
+    def get_halo(self, cube):
+        """
+        Return the number of grid points in y and x around each point
+        that are needed to apply the kernel to it.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Cube to be neighbourhood processed.
+
+        Returns
+        -------
+        tuple of int
+            The halo in y and x, which is the largest kernel radius in grid
+            cells over the rows of the grid and the lead times.
+
+        """
+        if self.lead_times is None:
+            radii_in_km = [self.radius_in_km]
+        else:
+            radii_in_km = self.radius_in_km
+        halo_x = halo_y = 0
+        for radius_in_km in radii_in_km:
+            grid_cells_x, grid_cells_y = self.get_grid_x_y_kernel_ranges(
+                cube, radius_in_km=radius_in_km, allow_row_ranges=True)
+            halo_x = max(halo_x, np.max(grid_cells_x))
+            halo_y = max(halo_y, grid_cells_y)
+        return int(halo_y), int(halo_x)
+
+    def get_kernel(self, ranges):
+        """
+        Create the two-dimensional circular neighbourhood kernel.
+
+        Parameters
+        ----------
+        ranges : tuple
+            Kernel radius in grid cells east and north, as returned by
+            get_grid_x_y_kernel_ranges.
+
+        Returns
+        -------
+        numpy.ndarray
+            Kernel with dimensions (y, x) and shape
+            (2 * grid_cells_y + 1, 2 * grid_cells_x + 1).
+
+        """
+        grid_cells_x, grid_cells_y = ranges
+        kernel = np.ones([1 + grid_cells_y * 2, 1 + grid_cells_x * 2])
+        n = np.ogrid[-grid_cells_y:grid_cells_y + 1,
+                     -grid_cells_x:grid_cells_x + 1]
+        distance_squared = sum([x ** 2. for x in n])
+        radius_squared = grid_cells_x * grid_cells_y
+        if self.unweighted_mode:
+            mask = distance_squared > radius_squared
+        else:
+            kernel[:] = (radius_squared - distance_squared) / radius_squared
+            mask = kernel < 0.
+        kernel[mask] = 0.
+        return kernel
+
+    @staticmethod
+    def _correlate(data, kernel):
+        """Apply the normalised kernel to the data."""
+        return scipy.ndimage.filters.correlate(
+            data, kernel, mode='nearest') / np.sum(kernel)
+
+    def _correlate_chords(self, data, ranges):
+        """
+        Apply the normalised circular kernel to the data by summing along
+        the chord of the circle within each row of the kernel.
+
+        The half-width of the chord at row offset dy is
+        floor(sqrt(r**2 - dy**2)), where r**2 is the product of the kernel
+        ranges. The sum of the data along each chord is the difference of
+        two cumulative sums along the rows of the data. For the weighted
+        kernel, the weight at column offset dx is (r**2 - dy**2 - dx**2) /
+        r**2, so the weighted sum along a chord also needs the cumulative
+        sums of the data multiplied by the column index and by its square.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data with y and x as the last two dimensions.
+        ranges : tuple
+            Kernel radius in grid cells east and north, as returned by
+            get_grid_x_y_kernel_ranges.
+
+        Returns
+        -------
+        numpy.ndarray
+            The data correlated with the normalised kernel, treating
+            points beyond the edges of the grid as equal to the nearest
+            edge point.
+
+        """
+        grid_cells_x, grid_cells_y = ranges
+        radius_squared = grid_cells_x * grid_cells_y
+        ylen, xlen = data.shape[-2:]
+        padding = ([(0, 0)] * (data.ndim - 2) +
+                   [(grid_cells_y, grid_cells_y),
+                    (grid_cells_x, grid_cells_x)])
+        padded = np.pad(data.astype(np.float64), padding, mode='edge')
+
+        def cumulative_sum(values):
+            """Cumulative sum along the rows with a leading zero."""
+            result = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+            np.cumsum(values, axis=-1, out=result[..., 1:])
+            return result
+
+        # Index the columns from the middle of the row, to limit the size
+        # of the cumulative sums that are differenced below.
+        column_index = np.arange(padded.shape[-1], dtype=np.float64)
+        column_index -= padded.shape[-1] // 2
+        sums = [cumulative_sum(padded)]
+        if not self.unweighted_mode:
+            sums.append(cumulative_sum(padded * column_index))
+            sums.append(cumulative_sum(padded * column_index ** 2))
+        centre = column_index[grid_cells_x:grid_cells_x + xlen]
+
+        result = np.zeros(data.shape)
+        kernel_sum = 0.
+        for dy in range(-grid_cells_y, grid_cells_y + 1):
+            remainder = radius_squared - dy * dy
+            if remainder < 0:
+                continue
+            half_width = min(math.isqrt(remainder), grid_cells_x)
+            rows = slice(grid_cells_y + dy, grid_cells_y + dy + ylen)
+            start = np.arange(xlen) + grid_cells_x - half_width
+            stop = start + 2 * half_width + 1
+            chord_sums = [cumsum[..., rows, stop] - cumsum[..., rows, start]
+                          for cumsum in sums]
+            offsets = np.arange(-half_width, half_width + 1)
+            if self.unweighted_mode:
+                result += chord_sums[0]
+                kernel_sum += len(offsets)
+            else:
+                # Sum of (j - x)**2 * f(j) over the chord centred on x.
+                sum_of_squared_offsets = (
+                    chord_sums[2] - 2. * centre * chord_sums[1] +
+                    centre ** 2 * chord_sums[0])
+                result += remainder * chord_sums[0] - sum_of_squared_offsets
+                kernel_sum += np.sum(remainder - offsets ** 2)
+        if not self.unweighted_mode:
+            kernel_sum /= radius_squared
+            result /= radius_squared
+        return (result / kernel_sum).astype(
+            np.promote_types(data.dtype, np.float32), copy=False)
+
+    def _correlate_row_chords(self, data, ranges):
+        """
+        Apply the normalised circular kernel to the data, where the number
+        of grid cells east within the radius varies between the rows of the
+        grid, by summing along the chord of the circle within each row of
+        the kernel.
+
+        With grid_cells_x for the row of each chord, and grid_cells_y, the
+        half-width of the chord at row offset dy is
+        floor(grid_cells_x * sqrt(1 - (dy / grid_cells_y)**2)). For the
+        weighted kernel, the weight at column offset dx is
+        1 - (dy / grid_cells_y)**2 - (dx / grid_cells_x)**2. The sums along
+        the chords are calculated from cumulative sums along the rows, as
+        in _correlate_chords.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data with y and x as the last two dimensions, covering all of
+            the rows of the grid.
+        ranges : tuple
+            Kernel radius in grid cells east for each row of the grid, and
+            in grid cells north, as returned by get_grid_x_y_kernel_ranges
+            for a latitude and longitude grid.
+
+        Returns
+        -------
+        numpy.ndarray
+            The data correlated with the normalised kernel, treating
+            points beyond the edges of the grid as equal to the nearest
+            edge point.
+
+        """
+        row_cells_x, grid_cells_y = ranges
+        max_cells_x = max(row_cells_x)
+        ylen, xlen = data.shape[-2:]
+        padding = ([(0, 0)] * (data.ndim - 2) +
+                   [(grid_cells_y, grid_cells_y),
+                    (max_cells_x, max_cells_x)])
+        padded = np.pad(data.astype(np.float64), padding, mode='edge')
+        padded_cells_x = np.pad(np.array(row_cells_x, dtype=np.float64),
+                                grid_cells_y, mode='edge')
+
+        def cumulative_sum(values):
+            """Cumulative sum along the rows with a leading zero."""
+            result = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+            np.cumsum(values, axis=-1, out=result[..., 1:])
+            return result
+
+        column_index = np.arange(padded.shape[-1], dtype=np.float64)
+        column_index -= padded.shape[-1] // 2
+        sums = [cumulative_sum(padded)]
+        if not self.unweighted_mode:
+            sums.append(cumulative_sum(padded * column_index))
+            sums.append(cumulative_sum(padded * column_index ** 2))
+        centre = column_index[max_cells_x:max_cells_x + xlen]
+        index_shape = (1,) * (data.ndim - 2) + (ylen, xlen)
+
+        result = np.zeros(data.shape)
+        kernel_sum = np.zeros((ylen, 1))
+        for dy in range(-grid_cells_y, grid_cells_y + 1):
+            remainder = 1. - (float(dy) / grid_cells_y) ** 2
+            rows = slice(grid_cells_y + dy, grid_cells_y + dy + ylen)
+            cells_x = padded_cells_x[rows][:, np.newaxis]
+            half_width = np.floor(cells_x * np.sqrt(remainder)).astype(int)
+            width = 2 * half_width + 1
+            start = (np.arange(xlen) + max_cells_x - half_width).reshape(
+                index_shape)
+            stop = start + width
+            chord_sums = [
+                np.take_along_axis(cumsum[..., rows, :], stop, axis=-1) -
+                np.take_along_axis(cumsum[..., rows, :], start, axis=-1)
+                for cumsum in sums]
+            if self.unweighted_mode:
+                result += chord_sums[0]
+                kernel_sum += width
+            else:
+                inverse_square = np.zeros_like(cells_x)
+                np.divide(1., cells_x ** 2, out=inverse_square,
+                          where=cells_x > 0)
+                sum_of_squared_offsets = (
+                    chord_sums[2] - 2. * centre * chord_sums[1] +
+                    centre ** 2 * chord_sums[0])
+                result += (remainder * chord_sums[0] -
+                           inverse_square * sum_of_squared_offsets)
+                kernel_sum += (
+                    remainder * width - inverse_square *
+                    half_width * (half_width + 1) * width / 3.)
+        return (result / kernel_sum).astype(
+            np.promote_types(data.dtype, np.float32), copy=False)
+
+    def apply_kernel(self, data, ranges, kernel=None):
+        """
+        Apply the normalised neighbourhood kernel to the data, using the
+        engine of the plugin.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data with y and x as the last two dimensions.
+        ranges : tuple
+            Kernel radius in grid cells east and north, as returned by
+            get_grid_x_y_kernel_ranges.
+        kernel : numpy.ndarray
+            Kernel as returned by get_kernel. If None, the kernel is created
+            when required.
+
+        Returns
+        -------
+        numpy.ndarray
+            The data correlated with the normalised kernel.
+
+        """
+        if not isinstance(ranges[0], int):
+            return self._correlate_row_chords(data, ranges)
+        if self.engine == "chord":
+            return self._correlate_chords(data, ranges)
+        if kernel is None:
+            kernel = self.get_kernel(ranges)
+        kernel = kernel.reshape((1,) * (data.ndim - 2) + kernel.shape)
+        return self._correlate(data, kernel)
+
+    def apply_kernel_to_valid_data(self, data, ranges, kernel=None):
+        """
+        Apply the normalised neighbourhood kernel to the valid data only,
+        by normalised convolution. The data and the valid-data indicator
+        are filtered together in a single call to apply_kernel.
+
+        Parameters
+        ----------
+        data : numpy.ndarray or numpy.ma.MaskedArray
+            Data with y and x as the last two dimensions. NaN and masked
+            points are treated as missing.
+        ranges : tuple
+            Kernel radius in grid cells east and north, as returned by
+            get_grid_x_y_kernel_ranges.
+        kernel : numpy.ndarray
+            Kernel as returned by get_kernel. If None, the kernel is created
+            when required.
+
+        Returns
+        -------
+        numpy.ndarray
+            The kernel-weighted mean of the valid data within the
+            neighbourhood of each point, which is NaN where there are no
+            valid points within the neighbourhood.
+
+        """
+        valid = ~np.ma.getmaskarray(data)
+        data = np.ma.getdata(data)
+        valid &= ~np.isnan(data)
+        stacked = np.empty((2,) + data.shape,
+                           dtype=np.promote_types(data.dtype, np.float32))
+        stacked[0] = np.where(valid, data, 0.)
+        stacked[1] = valid
+        weighted_sum, weight = self.apply_kernel(stacked, ranges,
+                                                 kernel=kernel)
+        result = np.full(data.shape, np.nan, dtype=weighted_sum.dtype)
+        np.divide(weighted_sum, weight, out=result, where=weight > 0.)
+        return result
+
     def process(self, cube):
         """
         Set the specified name and units metadata to the cube from the upstream
         plugin.
 
+        If the cube has lazy data, the kernel is applied to each chunk of
+        the data using dask.array.map_overlap, with a halo of the kernel
+        radius around each chunk, and the result remains lazy.
+
+        In masked_mode, the result is a masked array, masked where there
+        are no valid points within the neighbourhood.
+
+        If lead_times are given, the radius for each slice is found from
+        its forecast_period, and the slices that share a kernel are
+        filtered together.
+
+        If collapse_realizations is given, the result is the mean over
+        the realizations, taken before or after applying the kernel.
+
         Returns
         -------
         Cube
             The cube from the upstream plugin with name and units metadata
             applied.
 
+        """
+        try:
+            realiz_coord = cube.coord('realization')
+        except iris.exceptions.CoordinateNotFoundError:
+            return self._process_realization(cube)
+        if len(realiz_coord.points) == 1:
+            return self._process_realization(cube)
+        if self.collapse_realizations is None:
+            raise ValueError("Does not operate across realizations.")
+        if self.collapse_realizations == "before":
+            if self.masked_mode:
+                # Missing points are excluded from the mean, rather than
+                # making the mean missing.
+                data = get_data(cube)
+                masked_invalid = (da.ma.masked_invalid
+                                  if isinstance(data, da.Array) else
+                                  np.ma.masked_invalid)
+                cube = cube.copy(data=masked_invalid(data))
+            cube = cube.collapsed('realization', iris.analysis.MEAN)
+            return self._process_realization(cube)
+        cube = self._process_realization(cube)
+        return cube.collapsed('realization', iris.analysis.MEAN)
+
+    def _process_realization(self, cube):
+        """
+        Apply the kernel to a cube with no more than one realization, or
+        to each realization of the cube.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Cube to be neighbourhood processed.
+
+        Returns
+        -------
+        iris.cube.Cube
+            The cube with the neighbourhood processed data.
+
+        """
+        data = get_data(cube)
+        if not self.masked_mode:
+            data = check_for_nan(data)
+        geometry = get_grid_geometry(cube)
+        if self.lead_times is None:
+            ranges = self.get_grid_x_y_kernel_ranges(
+                cube, allow_row_ranges=True)
+            y_axis, = cube.coord_dims(geometry.y_name)
+            x_axis, = cube.coord_dims(geometry.x_name)
+            cube.data = self._filter_data(data, ranges, y_axis, x_axis)
+            return cube
+
+        # Group the slices along the forecast_period dimension by the
+        # kernel ranges, so that each kernel is applied once to a batch of
+        # slices.
+        time_axis, groups = self._group_by_radius(cube)
+        y_axis, = cube.coord_dims(geometry.y_name)
+        x_axis, = cube.coord_dims(geometry.x_name)
+        if time_axis is None:
+            ranges, = groups.keys()
+            cube.data = self._filter_data(data, ranges, y_axis, x_axis)
+            return cube
+        order = []
+        results = []
+        for ranges, indices in groups.items():
+            take = da.take if isinstance(data, da.Array) else np.take
+            results.append(
+                self._filter_data(take(data, indices, axis=time_axis),
+                                  ranges, y_axis, x_axis))
+            order.extend(indices)
+        inverse = np.argsort(order)
+        if isinstance(data, da.Array):
+            cube.data = da.concatenate(results, axis=time_axis)[
+                (slice(None),) * time_axis + (inverse,)]
+        else:
+            concatenate = (np.ma.concatenate if self.masked_mode else
+                           np.concatenate)
+            cube.data = np.take(
+                concatenate(results, axis=time_axis), inverse,
+                axis=time_axis)
+        return cube
+
+    def get_radius_in_km(self, forecast_periods):
+        """
+        Return the radius for each forecast period.
+
+        Parameters
+        ----------
+        forecast_periods : numpy.ndarray
+            Forecast periods in hours.
+
+        Returns
+        -------
+        numpy.ndarray
+            Radius in kilometres for each forecast period, interpolated
+            from the radii given at the lead_times.
+
+        """
+        return np.interp(forecast_periods, self.lead_times,
+                         self.radius_in_km)
+
+    def _group_by_radius(self, cube):
+        """
+        Group the slices of the cube by the kernel ranges for the radius at
+        their forecast_period.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Cube with a forecast_period coordinate, which is either scalar
+            or associated with one dimension.
+
+        Returns
+        -------
+        time_axis : int or None
+            Dimension associated with the forecast_period, or None if the
+            forecast_period is scalar.
+        groups : dict
+            Indices along the time_axis for each distinct kernel range.
+
+        """
+        try:
+            fp_coord = cube.coord('forecast_period').copy()
+        except iris.exceptions.CoordinateNotFoundError:
+            raise ValueError(
+                "A forecast_period coordinate is required when lead_times "
+                "are given")
+        fp_coord.convert_units('hours')
+        fp_dims = cube.coord_dims(fp_coord)
+        if len(fp_dims) > 1:
+            raise ValueError(
+                "The forecast_period coordinate must be associated with "
+                "at most one dimension")
+        time_axis = fp_dims[0] if fp_dims else None
+        groups = {}
+        for index, radius_in_km in enumerate(
+                self.get_radius_in_km(fp_coord.points)):
+            ranges = self.get_grid_x_y_kernel_ranges(
+                cube, radius_in_km=radius_in_km, allow_row_ranges=True)
+            groups.setdefault(ranges, []).append(index)
+        return time_axis, groups
+
+    def _filter_data(self, data, ranges, y_axis, x_axis):
+        """
+        Apply the kernel for the given ranges to the data.
+
+        Parameters
+        ----------
+        data : numpy.ndarray or dask.array.Array
+            Data to be filtered.
+        ranges : tuple
+            Kernel radius in grid cells east and north, as returned by
+            get_grid_x_y_kernel_ranges.
+        y_axis, x_axis : int
+            Dimensions of the data corresponding to y and x.
+
+        Returns
+        -------
+        numpy.ndarray or dask.array.Array
+            Filtered data, which is lazy if the input data is lazy.
+
+        """
+        kernel = None
+        row_ranges = not isinstance(ranges[0], int)
+        if self.engine == "dense" and not row_ranges:
+            kernel = self.get_kernel(ranges)
+
+        def filter_data(block):
+            """Apply the kernel with y and x as the last dimensions."""
+            block = np.moveaxis(block, (y_axis, x_axis), (-2, -1))
+            if self.masked_mode:
+                result = self.apply_kernel_to_valid_data(
+                    block, ranges, kernel=kernel)
+            else:
+                result = self.apply_kernel(block, ranges, kernel=kernel)
+            return np.moveaxis(result, (-2, -1), (y_axis, x_axis))
+
+        if isinstance(data, da.Array):
+            if self.masked_mode:
+                # Missing points are passed between chunks as NaN, as the
+                # halo of a masked dask array may not keep its mask.
+                data = da.ma.filled(data.astype(
+                    np.promote_types(data.dtype, np.float32)), np.nan)
+            if row_ranges:
+                # The kernel varies between rows, so each chunk must hold
+                # whole columns of the grid.
+                data = data.rechunk({y_axis: -1})
+                depth = {y_axis: 0, x_axis: max(ranges[0])}
+            else:
+                depth = {y_axis: ranges[1], x_axis: ranges[0]}
+            # A halo reaching the edges of the grid is equivalent to any
+            # larger halo, as points beyond the edges are treated as equal
+            # to the nearest edge point.
+            depth = {axis: min(size, data.shape[axis])
+                     for axis, size in depth.items()}
+            result = da.map_overlap(
+                filter_data, data, depth=depth, boundary='nearest',
+                dtype=data.dtype)
+            if self.masked_mode:
+                result = da.ma.masked_invalid(result)
+        elif self.scheduler is not None and not row_ranges:
+            # With row ranges, the kernel depends on the position of each
+            # row within the whole grid, so the grid is not tiled.
+            result = self.scheduler.process(
+                filter_data, data, halo=(ranges[1], ranges[0]),
+                y_axis=y_axis, x_axis=x_axis,
+                dtype=np.promote_types(data.dtype, np.float32))
+            if self.masked_mode:
+                result = np.ma.masked_invalid(result)
+        else:
+            result = filter_data(data)
+            if self.masked_mode:
+                result = np.ma.masked_invalid(result)
+        return result
+
+
+class ThresholdedNeighbourhoodProcessing(object):
+    """
+    Threshold a cube and apply neighbourhood processing in a single pass.
+
+    This is equivalent to applying BasicThreshold followed by
+    BasicNeighbourhoodProcessing for every combination of threshold and
+    radius, but the grid is processed tile by tile, so that the thresholded
+    truth values only exist within buffers the size of a tile plus a halo
+    of the largest kernel radius. The input data are scanned for NaNs once
+    and the input cube is not copied.
+
+    """
+
+    def __init__(self, thresholds, radii_in_km, fuzzy_factor,
+                 below_thresh_ok=False, unweighted_mode=False,
+                 tile_shape=(256, 256), engine="dense"):
+        """
+        Create a plugin that produces neighbourhood-processed probabilities
+        of exceeding, or falling below, each threshold.
+
+        Parameters
+        ----------
+
+        thresholds : list of float
+            The threshold points for 'significant' datapoints. The
+            thresholds are sorted into ascending order.
+
+        radii_in_km : list of float
+            The radii in kilometres of the neighbourhood kernels to apply.
+
+        fuzzy_factor : float
+            Percentage above or below threshold for fuzzy membership value.
+
+        below_thresh_ok : boolean
+            True to count points as significant if *below* the threshold,
+            False to count points as significant if *above* the threshold.
+
+        unweighted_mode : boolean
+            If True, use a circle with constant weighting.
+            If False, use a circle for neighbourhood kernel with
+            weighting decreasing with radius.
+
+        tile_shape : tuple of int
+            Number of grid points in y and x within each tile, excluding
+            the halo.
+
+        engine : string
+            Method of applying the kernel, as for
+            BasicNeighbourhoodProcessing.
+
+        """
+        self.thresholds = sorted(float(x) for x in thresholds)
+        if not self.thresholds:
+            raise ValueError("At least one threshold is required")
+        if not radii_in_km:
+            raise ValueError("At least one radius is required")
+        self.threshold_plugins = [
+            BasicThreshold(threshold, fuzzy_factor,
+                           below_thresh_ok=below_thresh_ok)
+            for threshold in self.thresholds]
+        self.nbhood_plugins = [
+            BasicNeighbourhoodProcessing(
+                radius_in_km, unweighted_mode=unweighted_mode, engine=engine)
+            for radius_in_km in radii_in_km]
+        self.fuzzy_factor = fuzzy_factor
+        self.below_thresh_ok = below_thresh_ok
+        self.unweighted_mode = bool(unweighted_mode)
+        self.engine = engine
+        if len(tile_shape) != 2 or min(tile_shape) < 1:
+            raise ValueError(
+                "Invalid tile_shape: two positive sizes required: {}".format(
+                    tile_shape))
+        self.tile_shape = tuple(int(x) for x in tile_shape)
+
+    def __str__(self):
+        result = ('<ThresholdedNeighbourhoodProcessing: thresholds: {}; ' +
+                  'radii_in_km: {}; fuzzy_factor: {}; ' +
+                  'below_thresh_ok: {}; unweighted_mode: {}; ' +
+                  'tile_shape: {}; engine: {}>')
+        return result.format(
+            self.thresholds,
+            [plugin.radius_in_km for plugin in self.nbhood_plugins],
+            self.fuzzy_factor, self.below_thresh_ok, self.unweighted_mode,
+            self.tile_shape, self.engine)
+
+    def _create_probability_cube(self, cube, data, radius_in_km):
+        """
+        Create a cube of probabilities with a leading threshold dimension.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Input cube with dimensions (y, x).
+        data : numpy.ndarray
+            Probabilities with dimensions (threshold, y, x).
+        radius_in_km : float
+            Radius of the neighbourhood kernel.
+
+        Returns
+        -------
+        iris.cube.Cube
+            Cube of probabilities.
+
+        """
+        threshold_coord = iris.coords.DimCoord(
+            np.array(self.thresholds, dtype=np.float32),
+            long_name='threshold', units=cube.units)
+        dim_coords_and_dims = [(threshold_coord, 0)]
+        for coord in cube.dim_coords:
+            dim_coords_and_dims.append(
+                (coord.copy(), cube.coord_dims(coord)[0] + 1))
+        aux_coords_and_dims = []
+        for coord in cube.aux_coords:
+            aux_coords_and_dims.append(
+                (coord.copy(),
+                 tuple(dim + 1 for dim in cube.coord_dims(coord))))
+        aux_coords_and_dims.append(
+            (iris.coords.AuxCoord(radius_in_km, long_name='radius',
+                                  units='km'), ()))
+        result = iris.cube.Cube(
+            data, long_name='probability_of_{}'.format(cube.name()),
+            units='1', attributes=cube.attributes,
+            dim_coords_and_dims=dim_coords_and_dims,
+            aux_coords_and_dims=aux_coords_and_dims)
+        return result
+
+    def process(self, cube):
+        """
+        Calculate the neighbourhood-processed probabilities.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Cube to threshold, with projection_y_coordinate and
+            projection_x_coordinate as its only dimensions. Lazy data is
+            realised one tile at a time.
+
+        Returns
+        -------
+        iris.cube.CubeList
+            One cube for each radius, in the order of radii_in_km, with
+            dimensions (threshold, y, x) and a scalar radius coordinate.
+
         """
         try:
             realiz_coord = cube.coord('realization')
@@ -131,31 +912,538 @@ class BasicNeighbourhoodProcessing(object):
         else:
             if len(realiz_coord.points) > 1:
                 raise ValueError("Does not operate across realizations.")
-        if np.isnan(cube.data).any():
-            raise ValueError("Error: NaN detected in input cube data")
-        data = cube.data
-        ranges = self.get_grid_x_y_kernel_ranges(cube)
-        fullranges = np.zeros([np.rank(data)])
-        axes = []
-        for coord_name in ['projection_x_coordinate',
-                           'projection_y_coordinate']:
-            axes.append(cube.coord_dims(coord_name)[0])
-        for axis_index, axis in enumerate(axes):
-            fullranges[axis] = ranges[axis_index]
-        kernel = np.ones([1 + x * 2 for x in fullranges])
-        n = np.ogrid[tuple([slice(-x, x+1) for x in ranges])]
-        if self.unweighted_mode:
-            mask = np.reshape(
-                np.sum([x ** 2 for x in n]) > np.cumprod(ranges)[-1],
-                np.shape(kernel)
-            )
+        ranges = [plugin.get_grid_x_y_kernel_ranges(cube)
+                  for plugin in self.nbhood_plugins]
+        if cube.coord_dims('projection_y_coordinate') != (0,) or (
+                cube.coord_dims('projection_x_coordinate') != (1,)) or (
+                cube.ndim != 2):
+            raise ValueError(
+                "Invalid cube: dimensions must be projection_y_coordinate "
+                "and projection_x_coordinate only")
+        kernels = [None] * len(ranges)
+        if self.engine == "dense":
+            kernels = [plugin.get_kernel(radius_ranges) for
+                       plugin, radius_ranges in zip(self.nbhood_plugins,
+                                                    ranges)]
+        halo_x = max(radius_ranges[0] for radius_ranges in ranges)
+        halo_y = max(radius_ranges[1] for radius_ranges in ranges)
+
+        data = get_data(cube)
+        ylen, xlen = data.shape
+        dtype = np.promote_types(data.dtype, np.float32)
+        results = [np.empty((len(self.thresholds), ylen, xlen), dtype=dtype)
+                   for _ in ranges]
+
+        tile_y, tile_x = self.tile_shape
+        for y_start in range(0, ylen, tile_y):
+            y_stop = min(y_start + tile_y, ylen)
+            buffer_y_start = max(y_start - halo_y, 0)
+            buffer_y_stop = min(y_stop + halo_y, ylen)
+            for x_start in range(0, xlen, tile_x):
+                x_stop = min(x_start + tile_x, xlen)
+                buffer_x_start = max(x_start - halo_x, 0)
+                buffer_x_stop = min(x_stop + halo_x, xlen)
+                tile = np.asarray(
+                    data[buffer_y_start:buffer_y_stop,
+                         buffer_x_start:buffer_x_stop])
+                check_for_nan(tile)
+                for nbhood_plugin, (radius_x, radius_y), kernel, result in (
+                        zip(self.nbhood_plugins, ranges, kernels, results)):
+                    # Restrict the buffer to the halo of this radius. At the
+                    # edges of the grid, correlating with mode='nearest'
+                    # repeats the edge values, as for the whole grid.
+                    sub_y_start = max(y_start - radius_y, 0)
+                    sub_x_start = max(x_start - radius_x, 0)
+                    sub_tile = tile[
+                        sub_y_start - buffer_y_start:
+                        min(y_stop + radius_y, ylen) - buffer_y_start,
+                        sub_x_start - buffer_x_start:
+                        min(x_stop + radius_x, xlen) - buffer_x_start]
+                    y_offset = y_start - sub_y_start
+                    x_offset = x_start - sub_x_start
+                    for index, plugin in enumerate(self.threshold_plugins):
+                        smoothed = nbhood_plugin.apply_kernel(
+                            plugin.calculate_truth_value(sub_tile),
+                            (radius_x, radius_y), kernel=kernel)
+                        result[index, y_start:y_stop, x_start:x_stop] = (
+                            smoothed[y_offset:y_offset + y_stop - y_start,
+                                     x_offset:x_offset + x_stop - x_start])
+
+        probability_cubes = iris.cube.CubeList([])
+        for plugin, result in zip(self.nbhood_plugins, results):
+            probability_cubes.append(
+                self._create_probability_cube(
+                    cube, result, plugin.radius_in_km))
+        return probability_cubes
+
+
+class NeighbourhoodPercentiles(object):
+    """
+    Calculate percentiles of the values within a circular neighbourhood of
+    each grid point.
+
+    The percentiles are found from a histogram of the values within the
+    neighbourhood, which is updated as the neighbourhood slides along the
+    x axis by removing and adding the values at the ends of the chord of
+    the circle within each row of the neighbourhood. The cost for each
+    grid point is proportional to the radius for the update and to the
+    number of histogram bins, and of values within a bin, for the
+    percentiles, rather than to the area of the neighbourhood.
+
+    The values are coded by their rank among the distinct values of the
+    data. If the data contain at most max_bins distinct values, each bin
+    holds one value. Otherwise, each bin holds a range of consecutive
+    distinct values, and a second, finer, histogram of the distinct values
+    is searched within the bin containing each percentile. The percentiles
+    are therefore always exact, and are values from within the
+    neighbourhood.
+
+    """
+
+    # Maximum number of elements of the fine histogram for a block of rows.
+    MAX_FINE_HISTOGRAM_SIZE = 2 ** 24
+
+    def __init__(self, radius_in_km, percentiles, max_bins=256):
+        """
+        Create a neighbourhood percentile plugin.
+
+        Parameters
+        ----------
+
+        radius_in_km : float
+            The radius in kilometres of the circular neighbourhood.
+
+        percentiles : list of float
+            Percentiles, between 0 and 100, to calculate. As for
+            scipy.ndimage.percentile_filter, the percentile p of the n
+            values in a neighbourhood is the value of rank int(n * p / 100)
+            in ascending order, or the maximum for p = 100.
+
+        max_bins : int
+            Maximum number of bins of the coarse histogram.
+
+        """
+        self.radius_in_km = float(radius_in_km)
+        self.percentiles = [float(x) for x in percentiles]
+        if not self.percentiles:
+            raise ValueError("At least one percentile is required")
+        for percentile in self.percentiles:
+            if not 0. <= percentile <= 100.:
+                raise ValueError(
+                    "Invalid percentile: must be >=0 and <=100: {}".format(
+                        percentile))
+        if max_bins < 2:
+            raise ValueError(
+                "Invalid max_bins: must be at least 2: {}".format(max_bins))
+        self.max_bins = int(max_bins)
+        self.nbhood_plugin = BasicNeighbourhoodProcessing(
+            radius_in_km, unweighted_mode=True)
+
+    def __str__(self):
+        result = ('<NeighbourhoodPercentiles: radius_in_km: {}; ' +
+                  'percentiles: {}; max_bins: {}>')
+        return result.format(
+            self.radius_in_km, self.percentiles, self.max_bins)
+
+    @staticmethod
+    def _rank_code_data(data):
+        """
+        Code each value by its rank among the distinct values of the data.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Values to be coded.
+
+        Returns
+        -------
+        codes : numpy.ndarray
+            Index of each value within the distinct values, with the same
+            shape as data.
+        values : numpy.ndarray
+            The distinct values, in ascending order.
+
+        """
+        values, codes = np.unique(data, return_inverse=True)
+        return codes.reshape(data.shape), values
+
+    def _get_ranks(self, footprint_size):
+        """Return the rank of each percentile within the footprint."""
+        ranks = []
+        for percentile in self.percentiles:
+            if percentile == 100.:
+                ranks.append(footprint_size - 1)
+            else:
+                ranks.append(int(float(footprint_size) * percentile / 100.))
+        return ranks
+
+    def _sliding_histogram(self, codes, nvalues, ranges):
+        """
+        Find the code of each percentile within the neighbourhood of each
+        point of a two-dimensional field.
+
+        Parameters
+        ----------
+        codes : numpy.ndarray
+            Rank code of each point, with dimensions (y, x).
+        nvalues : int
+            Number of distinct values.
+        ranges : tuple
+            Kernel radius in grid cells east and north.
+
+        Returns
+        -------
+        numpy.ndarray
+            Rank code of each percentile, with dimensions
+            (percentile, y, x).
+
+        """
+        grid_cells_x, grid_cells_y = ranges
+        footprint = self.nbhood_plugin.get_kernel(ranges) > 0
+        ranks = self._get_ranks(footprint.sum())
+        # Number of consecutive distinct values within each coarse bin.
+        bin_size = -(-nvalues // self.max_bins)
+        nbins = -(-nvalues // bin_size)
+        # Half-width of the chord within each row of the footprint.
+        row_offsets, = np.nonzero(footprint.any(axis=1))
+        half_widths = (footprint[row_offsets].sum(axis=1) - 1) // 2
+        ylen, xlen = codes.shape
+        padded = np.pad(codes, ((grid_cells_y, grid_cells_y),
+                                (grid_cells_x, grid_cells_x)), mode='edge')
+
+        result = np.empty((len(ranks), ylen, xlen), dtype=np.intp)
+        block_rows = ylen
+        if bin_size > 1:
+            block_rows = max(
+                1, self.MAX_FINE_HISTOGRAM_SIZE // (nbins * bin_size))
+        for block_start in range(0, ylen, block_rows):
+            block = slice(block_start, min(block_start + block_rows, ylen))
+            result[:, block] = self._sliding_histogram_block(
+                padded, ranges, row_offsets, half_widths, ranks,
+                np.arange(ylen)[block], xlen, nbins, bin_size)
+        return result
+
+    @staticmethod
+    def _sliding_histogram_block(padded, ranges, row_offsets, half_widths,
+                                 ranks, y_points, xlen, nbins, bin_size):
+        """
+        Find the code of each percentile for a block of rows, using a
+        coarse histogram of the bins and, if each bin holds more than one
+        distinct value, a fine histogram of the distinct values.
+
+        Parameters
+        ----------
+        padded : numpy.ndarray
+            Rank codes of the field, padded by the kernel radius.
+        ranges : tuple
+            Kernel radius in grid cells east and north.
+        row_offsets : numpy.ndarray
+            Offset of each row of the footprint.
+        half_widths : numpy.ndarray
+            Half-width of the chord within each row of the footprint.
+        ranks : list of int
+            Rank of each percentile within the footprint.
+        y_points : numpy.ndarray
+            Indices of the rows of the block.
+        xlen : int
+            Length of the x axis.
+        nbins : int
+            Number of bins of the coarse histogram.
+        bin_size : int
+            Number of distinct values within each bin.
+
+        Returns
+        -------
+        numpy.ndarray
+            Rank code of each percentile, with dimensions
+            (percentile, y, x).
+
+        """
+        grid_cells_x, _ = ranges
+        ylen = len(y_points)
+        rows = row_offsets[:, np.newaxis] + y_points
+        points = np.broadcast_to(np.arange(ylen), rows.shape).ravel()
+        coarse = np.zeros((ylen, nbins), dtype=np.int32)
+        fine = None
+        if bin_size > 1:
+            fine = np.zeros((ylen, nbins * bin_size), dtype=np.int32)
+
+        def update(window_points, window_codes, func):
+            """Update the histograms with the codes of some points."""
+            func.at(coarse, (window_points, window_codes // bin_size), 1)
+            if fine is not None:
+                func.at(fine, (window_points, window_codes), 1)
+
+        for row, half_width in zip(rows, half_widths):
+            window = padded[
+                row, grid_cells_x - half_width:
+                grid_cells_x + half_width + 1]
+            update(np.repeat(np.arange(ylen), window.shape[1]),
+                   window.ravel(), np.add)
+
+        result = np.empty((len(ranks), ylen, xlen), dtype=np.intp)
+        offsets = np.arange(bin_size)
+        for x_index in range(xlen):
+            if x_index > 0:
+                removed = padded[rows, (grid_cells_x + x_index - 1 -
+                                        half_widths)[:, np.newaxis]]
+                added = padded[rows, (grid_cells_x + x_index +
+                                      half_widths)[:, np.newaxis]]
+                update(points, removed.ravel(), np.subtract)
+                update(points, added.ravel(), np.add)
+            cumulative = np.cumsum(coarse, axis=1)
+            for index, rank in enumerate(ranks):
+                bins = (cumulative <= rank).sum(axis=1)
+                if fine is None:
+                    result[index, :, x_index] = bins
+                    continue
+                # Find the value within the bin from the number of points
+                # in lower bins.
+                below = np.where(
+                    bins > 0,
+                    cumulative[np.arange(ylen), np.maximum(bins - 1, 0)], 0)
+                segment = fine[np.arange(ylen)[:, np.newaxis],
+                               bins[:, np.newaxis] * bin_size + offsets]
+                within = (np.cumsum(segment, axis=1) <=
+                          (rank - below)[:, np.newaxis]).sum(axis=1)
+                result[index, :, x_index] = bins * bin_size + within
+        return result
+
+    def process(self, cube):
+        """
+        Calculate the neighbourhood percentiles.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Cube with projection_y_coordinate and projection_x_coordinate
+            dimensions. Each slice over the other dimensions is processed
+            separately. Points beyond the edges of the grid are treated as
+            equal to the nearest edge point.
+
+        Returns
+        -------
+        iris.cube.Cube
+            Cube with a leading percentile dimension followed by the
+            dimensions of the input cube.
+
+        """
+        ranges = self.nbhood_plugin.get_grid_x_y_kernel_ranges(cube)
+        data = check_for_nan(cube.data)
+        y_axis, = cube.coord_dims('projection_y_coordinate')
+        x_axis, = cube.coord_dims('projection_x_coordinate')
+        codes, values = self._rank_code_data(data)
+        codes = np.moveaxis(codes, (y_axis, x_axis), (-2, -1))
+        leading_shape = codes.shape[:-2]
+        result = np.empty((len(self.percentiles),) + codes.shape,
+                          dtype=values.dtype)
+        for index in np.ndindex(*leading_shape):
+            result[(slice(None),) + index] = values[
+                self._sliding_histogram(codes[index], len(values), ranges)]
+        result = np.moveaxis(result, (-2, -1), (y_axis + 1, x_axis + 1))
+
+        percentile_coord = iris.coords.DimCoord(
+            np.array(self.percentiles, dtype=np.float32),
+            long_name='percentile', units='%')
+        dim_coords_and_dims = [(percentile_coord, 0)]
+        for coord in cube.dim_coords:
+            dim_coords_and_dims.append(
+                (coord.copy(), cube.coord_dims(coord)[0] + 1))
+        aux_coords_and_dims = [
+            (coord.copy(), tuple(dim + 1 for dim in cube.coord_dims(coord)))
+            for coord in cube.aux_coords]
+        percentile_cube = iris.cube.Cube(
+            result, dim_coords_and_dims=dim_coords_and_dims,
+            aux_coords_and_dims=aux_coords_and_dims, **cube.metadata._asdict())
+        return percentile_cube
+
+
+class OccurrenceWithinNeighbourhood(object):
+    """
+    Calculate the maximum or minimum of the values within a circular
+    neighbourhood of each grid point.
+
+    Applied to thresholded fields, the neighbourhood maximum is one where
+    the event occurs anywhere within the radius, so the mean over the
+    realizations is the probability of the event within the radius.
+
+    The circle is the union of one chord for each row of the
+    neighbourhood. For each distinct chord length, the running maximum or
+    minimum along x is found using the van Herk/Gil-Werman algorithm,
+    which takes a fixed number of operations for each grid point whatever
+    the chord length. The running values are then combined over the rows
+    of the neighbourhood that have that chord length.
+
+    Unlike BasicNeighbourhoodProcessing, the data may have any number of
+    realizations, which are processed together.
+
+    """
+
+    # The maximum or minimum is not linear, so the realizations can only be
+    # collapsed after the neighbourhood is applied.
+    COLLAPSE_ORDERS = [None, "after"]
+
+    def __init__(self, radius_in_km, operation="max",
+                 collapse_realizations=None):
+        """
+        Create a plugin for the neighbourhood maximum or minimum.
+
+        Parameters
+        ----------
+
+        radius_in_km : float
+            The radius in kilometres of the circular neighbourhood.
+
+        operation : string
+            "max" for the neighbourhood maximum, or "min" for the
+            neighbourhood minimum.
+
+        collapse_realizations : string or None
+            If "after", return the mean over the realization coordinate of
+            the neighbourhood maximum or minimum, as for
+            BasicNeighbourhoodProcessing. "before" is not accepted, as the
+            maximum or minimum of the mean over the realizations differs
+            from the mean of the maximum or minimum.
+
+        """
+        self.radius_in_km = float(radius_in_km)
+        if operation not in ["max", "min"]:
+            raise ValueError(
+                "Invalid operation: must be 'max' or 'min': {}".format(
+                    operation))
+        self.operation = operation
+        if collapse_realizations not in self.COLLAPSE_ORDERS:
+            raise ValueError(
+                "Invalid collapse_realizations: {} not in {}".format(
+                    collapse_realizations, self.COLLAPSE_ORDERS))
+        self.collapse_realizations = collapse_realizations
+        self.nbhood_plugin = BasicNeighbourhoodProcessing(
+            radius_in_km, unweighted_mode=True)
+
+    def __str__(self):
+        result = ('<OccurrenceWithinNeighbourhood: radius_in_km: {}; ' +
+                  'operation: {}; collapse_realizations: {}>')
+        return result.format(
+            self.radius_in_km, self.operation, self.collapse_realizations)
+
+    def _running_extreme(self, data, half_width):
+        """
+        Calculate the maximum or minimum within a window of
+        2 * half_width + 1 points centred on each point along the last
+        dimension, using the van Herk/Gil-Werman algorithm. Points beyond
+        the ends are treated as equal to the nearest end point.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data to be filtered along the last dimension.
+        half_width : int
+            Number of points either side of the centre of the window.
+
+        Returns
+        -------
+        numpy.ndarray
+            The maximum or minimum within the window about each point.
+
+        """
+        if half_width == 0:
+            return data.copy()
+        reduce = np.maximum if self.operation == "max" else np.minimum
+        window = 2 * half_width + 1
+        length = data.shape[-1]
+        nblocks = -(-(length + 2 * half_width) // window)
+        padding = [(0, 0)] * (data.ndim - 1) + [
+            (half_width, nblocks * window - length - half_width)]
+        blocks = np.pad(data, padding, mode='edge').reshape(
+            data.shape[:-1] + (nblocks, window))
+        # Running values from the start and from the end of each block.
+        forward = reduce.accumulate(blocks, axis=-1).reshape(
+            data.shape[:-1] + (-1,))
+        backward = reduce.accumulate(
+            blocks[..., ::-1], axis=-1)[..., ::-1].reshape(
+                data.shape[:-1] + (-1,))
+        # The window starting at i spans the end of one block and the
+        # start of the next.
+        return reduce(backward[..., :length],
+                      forward[..., window - 1:window - 1 + length])
+
+    def _filter_data(self, data, ranges):
+        """
+        Calculate the neighbourhood maximum or minimum.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data with y and x as the last two dimensions.
+        ranges : tuple
+            Kernel radius in grid cells east and north.
+
+        Returns
+        -------
+        numpy.ndarray
+            The maximum or minimum within the neighbourhood of each point.
+
+        """
+        reduce = np.maximum if self.operation == "max" else np.minimum
+        grid_cells_x, grid_cells_y = ranges
+        footprint = self.nbhood_plugin.get_kernel(ranges) > 0
+        row_offsets, = np.nonzero(footprint.any(axis=1))
+        half_widths = (footprint[row_offsets].sum(axis=1) - 1) // 2
+        ylen = data.shape[-2]
+        padding = [(0, 0)] * (data.ndim - 2) + [
+            (grid_cells_y, grid_cells_y), (0, 0)]
+        padded = np.pad(data, padding, mode='edge')
+        result = None
+        for half_width in np.unique(half_widths):
+            running = self._running_extreme(padded, half_width)
+            for row_offset in row_offsets[half_widths == half_width]:
+                rows = running[..., row_offset:row_offset + ylen, :]
+                if result is None:
+                    result = rows.copy()
+                else:
+                    reduce(result, rows, out=result)
+        return result
+
+    def process(self, cube):
+        """
+        Calculate the neighbourhood maximum or minimum.
+
+        Parameters
+        ----------
+        cube : iris.cube.Cube
+            Cube with projection_y_coordinate and projection_x_coordinate
+            dimensions. If the cube has lazy data, the result is lazy.
+
+        Returns
+        -------
+        iris.cube.Cube
+            Cube of the neighbourhood maximum or minimum, or its mean over
+            the realizations if collapse_realizations is "after".
+
+        """
+        ranges = self.nbhood_plugin.get_grid_x_y_kernel_ranges(cube)
+        data = check_for_nan(get_data(cube))
+        y_axis, = cube.coord_dims('projection_y_coordinate')
+        x_axis, = cube.coord_dims('projection_x_coordinate')
+
+        def filter_data(block):
+            """Filter with y and x as the last dimensions."""
+            block = np.moveaxis(block, (y_axis, x_axis), (-2, -1))
+            result = self._filter_data(block, ranges)
+            return np.moveaxis(result, (-2, -1), (y_axis, x_axis))
+
+        if isinstance(data, da.Array):
+            # A halo reaching the far edge of the grid from every point is
+            # equivalent to any larger halo, as points beyond the edges are
+            # treated as equal to the nearest edge point.
+            depth = {y_axis: min(ranges[1], data.shape[y_axis] - 1),
+                     x_axis: min(ranges[0], data.shape[x_axis] - 1)}
+            result = da.map_overlap(filter_data, data, depth=depth,
+                                    boundary='nearest', dtype=data.dtype)
         else:
-            kernel[:] = (
-                (np.cumprod(ranges)[-1] - np.sum([x**2. for x in n])) /
-                np.cumprod(ranges)[-1]
-            )
-            mask = kernel < 0.
-        kernel[mask] = 0.
-        cube.data = scipy.ndimage.filters.correlate(
-            data, kernel, mode='nearest') / np.sum(kernel)
+            result = filter_data(data)
+        cube = cube.copy(data=result)
+        if (self.collapse_realizations == "after" and
+                cube.coords('realization', dim_coords=True)):
+            cube = cube.collapsed('realization', iris.analysis.MEAN)
         return cube
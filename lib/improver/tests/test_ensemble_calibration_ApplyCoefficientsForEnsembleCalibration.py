@@ -46,7 +46,7 @@ import numpy as np
 import warnings
 
 from improver.ensemble_calibration.ensemble_calibration import (
-    ApplyCoefficientsFromEnsembleCalibration as Plugin)
+    ApplyCoefficientsFromEnsembleCalibration as Plugin, CoefficientTable)
 from improver.ensemble_calibration.ensemble_calibration_utilities import (
     concatenate_cubes)
 from improver.tests.helper_functions_ensemble_calibration import(
@@ -58,6 +58,18 @@ def datetime_from_timestamp(timestamp):
     return datetime.datetime.utcfromtimestamp(timestamp*3600)
 
 
+class Test__init__(IrisTest):
+
+    """Test the __init__ method."""
+
+    def test_invalid_coefficients_format(self):
+        """Test that an unknown coefficients_format raises an error."""
+        msg = "Invalid coefficients_format"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(set_up_temperature_cube(), {}, ["gamma"],
+                   coefficients_format="unknown")
+
+
 class Test__find_coords_of_length_one(IrisTest):
 
     """Test the find length_one coords method."""
@@ -523,6 +535,32 @@ class Test__apply_params(IrisTest):
             self.coeff_names, predictor_of_mean_flag)
         self.assertArrayAlmostEqual(forecast_predictor[0].data, data)
 
+    def test_calibrated_predictor_coefficient_fields(self):
+        """
+        Test that the plugin returns values for the calibrated predictor
+        that match the expected values, when the coefficients are provided
+        as fields with different values at each grid point.
+        """
+        cube = self.current_temperature_forecast_cube
+
+        coeff_fields = np.ones((4, 3, 3))
+        coeff_fields[2] = np.arange(9).reshape(3, 3)
+        optimised_coeffs = {}
+        the_date = datetime_from_timestamp(cube.coord("time").points)
+        optimised_coeffs[the_date] = coeff_fields
+
+        predictor_cube = cube.collapsed("realization", iris.analysis.MEAN)
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+        data = predictor_cube.data[0] + coeff_fields[2]
+
+        plugin = Plugin(cube, optimised_coeffs, self.coeff_names)
+        forecast_predictor, _, coefficients = plugin._apply_params(
+            predictor_cube, variance_cube, optimised_coeffs,
+            self.coeff_names, "mean")
+        self.assertArrayAlmostEqual(forecast_predictor[0].data, data)
+        self.assertEqual(coefficients[2].shape, (1, 3, 3))
+        self.assertArrayAlmostEqual(coefficients[2].data[0], coeff_fields[2])
+
     def test_calibrated_variance(self):
         """
         Test that the plugin returns values for the calibrated variance,
@@ -707,6 +745,120 @@ class Test__apply_params(IrisTest):
             self.coeff_names, predictor_of_mean_flag)
         self.assertArrayAlmostEqual(coefficients[0].data, data)
 
+    def test_compact_coefficients(self):
+        """
+        Test that the plugin returns a single cube of coefficients with
+        dimensions of time and coefficient, if the compact
+        coefficients_format is requested.
+        """
+        cube = self.current_temperature_forecast_cube
+        cube1 = cube.copy()
+        cube2 = cube.copy()
+
+        cube2.coord("time").points = cube2.coord("time").points + 3
+        cube2.data += 3
+
+        cube = concatenate_cubes(CubeList([cube1, cube2]))
+
+        optimised_coeffs = {}
+
+        for time_slice in cube.slices_over("time"):
+            the_date = datetime_from_timestamp(time_slice.coord("time").points)
+            optimised_coeffs[the_date] = np.array(
+                [5, 1, 0, 0.57, 0.6, 0.6])
+
+        predictor_cube = cube.copy()
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+
+        predictor_of_mean_flag = "members"
+
+        plugin = Plugin(self.cube, optimised_coeffs,
+                        self.coeff_names, coefficients_format="compact")
+        _, _, coefficients = plugin._apply_params(
+            predictor_cube, variance_cube, optimised_coeffs,
+            self.coeff_names, predictor_of_mean_flag)
+        self.assertEqual(len(coefficients), 1)
+        self.assertEqual(coefficients[0].shape, (2, 6))
+        self.assertEqual(coefficients[0].coord_dims("time"), (0,))
+        self.assertArrayAlmostEqual(
+            coefficients[0].data, [[5, 1, 0, 0.57, 0.6, 0.6]] * 2)
+        self.assertEqual(
+            list(coefficients[0].coord("coefficient_name").points),
+            ["gamma", "delta", "a", "beta", "beta", "beta"])
+
+    def test_compact_coefficients_missing_date(self):
+        """
+        Test that the compact coefficients are NaN for a date without
+        coefficients.
+        """
+        cube = self.current_temperature_forecast_cube
+        optimised_coeffs = {}
+        the_date = datetime_from_timestamp(cube.coord("time").points+3)
+        optimised_coeffs[the_date] = self.default_optimised_coeffs
+
+        predictor_cube = cube.collapsed("realization", iris.analysis.MEAN)
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+
+        plugin = Plugin(cube, optimised_coeffs,
+                        self.coeff_names, coefficients_format="compact")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            _, _, coefficients = plugin._apply_params(
+                predictor_cube, variance_cube, optimised_coeffs,
+                self.coeff_names, "mean")
+        self.assertEqual(coefficients[0].shape, (1, 4))
+        self.assertTrue(np.all(np.isnan(coefficients[0].data)))
+
+    def test_no_coefficients(self):
+        """
+        Test that no coefficient cubes are returned if the
+        coefficients_format is None, and that the calibrated forecast is
+        unchanged.
+        """
+        cube = self.current_temperature_forecast_cube
+        optimised_coeffs = {}
+        the_date = datetime_from_timestamp(cube.coord("time").points)
+        optimised_coeffs[the_date] = self.default_optimised_coeffs
+
+        predictor_cube = cube.collapsed("realization", iris.analysis.MEAN)
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+
+        plugin = Plugin(cube, optimised_coeffs, self.coeff_names)
+        expected = plugin._apply_params(
+            predictor_cube.copy(), variance_cube.copy(), optimised_coeffs,
+            self.coeff_names, "mean")
+        plugin = Plugin(cube, optimised_coeffs,
+                        self.coeff_names, coefficients_format=None)
+        result = plugin._apply_params(
+            predictor_cube, variance_cube, optimised_coeffs,
+            self.coeff_names, "mean")
+        self.assertEqual(len(result[2]), 0)
+        self.assertArrayAlmostEqual(result[0][0].data, expected[0][0].data)
+        self.assertArrayAlmostEqual(result[1][0].data, expected[1][0].data)
+
+    def test_calibrated_predictor_member_groups(self):
+        """
+        Test that the calibrated mean uses one beta for each group of
+        members, when the betas are tied within groups of members.
+        """
+        cube = self.current_temperature_forecast_cube
+        optimised_coeffs = {}
+        the_date = datetime_from_timestamp(cube.coord("time").points)
+        optimised_coeffs[the_date] = np.array([5, 1, 0, 0.5])
+
+        predictor_cube = cube.copy()
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+        expected = 0.25 * cube.collapsed(
+            "realization", iris.analysis.SUM).data
+
+        plugin = Plugin(cube, optimised_coeffs, self.coeff_names,
+                        member_groups="exchangeable")
+        forecast_predictor, _, _ = plugin._apply_params(
+            predictor_cube, variance_cube, optimised_coeffs,
+            self.coeff_names, "members")
+        self.assertArrayAlmostEqual(
+            forecast_predictor[0].data, expected.reshape(3, 3))
+
     def test_too_many_coefficients(self):
         """
         Test that the plugin returns values for the coefficients,
@@ -774,6 +926,54 @@ class Test__apply_params(IrisTest):
 
         self.assertArrayAlmostEqual(result[0][0].data, data)
 
+    def test_missing_date_coefficients_unchanged(self):
+        """
+        Test that the dictionary of coefficients is not modified if the
+        date to be calibrated can not be found.
+        """
+        cube = self.current_temperature_forecast_cube
+        optimised_coeffs = {}
+        the_date = datetime_from_timestamp(cube.coord("time").points+3)
+        optimised_coeffs[the_date] = self.default_optimised_coeffs
+
+        predictor_cube = cube.collapsed("realization", iris.analysis.MEAN)
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+
+        plugin = Plugin(cube, optimised_coeffs, self.coeff_names)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            plugin._apply_params(
+                predictor_cube, variance_cube, optimised_coeffs,
+                self.coeff_names, "mean")
+        self.assertEqual(list(optimised_coeffs.keys()), [the_date])
+
+    def test_coefficient_table(self):
+        """
+        Test that the calibrated forecasts using a CoefficientTable match
+        those using a dictionary of coefficients keyed by date.
+        """
+        cube = self.current_temperature_forecast_cube
+        optimised_coeffs = {}
+        the_date = datetime_from_timestamp(cube.coord("time").points)
+        optimised_coeffs[the_date] = self.default_optimised_coeffs
+        table = CoefficientTable(
+            time_units=cube.coord("time").units,
+            forecast_period_units=cube.coord("forecast_period").units)
+        table.add(cube.coord("time").points[0], self.default_optimised_coeffs,
+                  forecast_period=cube.coord("forecast_period").points[0])
+
+        predictor_cube = cube.collapsed("realization", iris.analysis.MEAN)
+        variance_cube = cube.collapsed("realization", iris.analysis.VARIANCE)
+
+        plugin = Plugin(cube, optimised_coeffs, self.coeff_names)
+        expected = plugin._apply_params(
+            predictor_cube.copy(), variance_cube.copy(), optimised_coeffs,
+            self.coeff_names, "mean")
+        result = plugin._apply_params(
+            predictor_cube, variance_cube, table, self.coeff_names, "mean")
+        self.assertArrayAlmostEqual(result[0][0].data, expected[0][0].data)
+        self.assertArrayAlmostEqual(result[1][0].data, expected[1][0].data)
+
     def test_missing_date_catch_warning(self):
         """
         Test that the plugin returns values for the calibrated forecasts,
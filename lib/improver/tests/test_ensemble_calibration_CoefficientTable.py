@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unit tests for the `ensemble_calibration.CoefficientTable` class.
+
+"""
+import datetime
+import unittest
+
+from iris.tests import IrisTest
+import numpy as np
+
+from improver.ensemble_calibration.ensemble_calibration import (
+    CoefficientTable)
+from improver.tests.helper_functions_ensemble_calibration import(
+    set_up_temperature_cube, _add_forecast_reference_time_and_forecast_period)
+
+
+class Test_add(IrisTest):
+
+    """Test the add method."""
+
+    def test_sorted(self):
+        """Test that the times are held in ascending order, with the
+        coefficients in the same order."""
+        table = CoefficientTable(time_units="hours since 1970-01-01 00:00")
+        table.add(9., [3.], forecast_period=3.)
+        table.add(3., [1.], forecast_period=3.)
+        table.add(6., [2.], forecast_period=3.)
+        self.assertArrayEqual(table.times, [3., 6., 9.])
+        self.assertEqual(table.coefficients, [[1.], [2.], [3.]])
+        self.assertEqual(len(table), 3)
+
+    def test_replace(self):
+        """Test that coefficients for the same time and forecast period
+        replace those held."""
+        table = CoefficientTable()
+        table.add(3., [1.], forecast_period=3.)
+        table.add(3., [2.], forecast_period=3.)
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table[3.], [2.])
+
+
+class Test_lookup(IrisTest):
+
+    """Test the lookup method."""
+
+    def setUp(self):
+        """Set up a table with two forecast periods at one time."""
+        self.table = CoefficientTable()
+        self.table.add(3., [1.], forecast_period=3.)
+        self.table.add(3., [2.], forecast_period=6.)
+        self.table.add(9., [3.])
+
+    def test_forecast_period(self):
+        """Test that the coefficients for the forecast period are found."""
+        self.assertEqual(self.table.lookup(3., forecast_period=6.), [2.])
+
+    def test_any_forecast_period(self):
+        """Test that coefficients without a forecast period are found for
+        any forecast period."""
+        self.assertEqual(self.table.lookup(9., forecast_period=6.), [3.])
+
+    def test_missing(self):
+        """Test that None is returned for a missing time or forecast
+        period, and that indexing raises a KeyError."""
+        self.assertIsNone(self.table.lookup(4.))
+        self.assertIsNone(self.table.lookup(3., forecast_period=9.))
+        self.assertNotIn(4., self.table)
+        with self.assertRaises(KeyError):
+            self.table[4.]
+
+
+class Test_lookup_cube(IrisTest):
+
+    """Test the lookup_cube method."""
+
+    def setUp(self):
+        """Set up a temperature cube."""
+        self.cube = _add_forecast_reference_time_and_forecast_period(
+            set_up_temperature_cube())
+
+    def test_converted_units(self):
+        """Test that the time and forecast period of the cube are converted
+        to the units of the table."""
+        time_coord = self.cube.coord("time")
+        fp_coord = self.cube.coord("forecast_period")
+        table = CoefficientTable(
+            time_units="seconds since 1970-01-01 00:00",
+            forecast_period_units="seconds")
+        table.add(
+            time_coord.units.convert(
+                time_coord.points[0], table.time_units), [1.],
+            forecast_period=fp_coord.units.convert(
+                fp_coord.points[0], table.forecast_period_units))
+        self.assertEqual(table.lookup_cube(self.cube), [1.])
+
+
+class Test_from_dict(IrisTest):
+
+    """Test the from_dict method."""
+
+    def test_basic(self):
+        """Test that a dictionary keyed by datetime is converted into a
+        table of numeric times."""
+        optimised_coeffs = {
+            datetime.datetime(2017, 11, 10, 6): [2.],
+            datetime.datetime(2017, 11, 10, 3): [1.]}
+        table = CoefficientTable.from_dict(
+            optimised_coeffs, "hours since 2017-11-10 00:00")
+        self.assertArrayEqual(table.times, [3., 6.])
+        self.assertArrayEqual(table.forecast_periods, [np.nan, np.nan])
+        self.assertEqual(table[6.], [2.])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -329,6 +329,38 @@ class Test_crps_minimiser_wrapper(IrisTest):
             result, [6.24021609e+00, 1.35694934e+00, 1.84642787e-03,
                      5.55444682e-01, 5.04367388e-01, 6.68575194e-01])
 
+    def test_normal_members_predictor_member_groups(self):
+        """
+        Test that one beta is estimated for each group of members when the
+        ensemble members are the predictor with tied betas, and that
+        exchangeable members with a single beta are equivalent to the
+        sum of the members as the predictor.
+        """
+        warnings.simplefilter("ignore")
+        initial_guess = np.array([5, 1, 0, 1], dtype=np.float32)
+        cube = set_up_temperature_cube()
+
+        forecast_predictor = cube.copy()
+        forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        truth = cube.collapsed("realization", iris.analysis.MAX)
+
+        plugin = Plugin()
+        result = plugin.crps_minimiser_wrapper(
+            initial_guess, forecast_predictor, truth, forecast_variance,
+            "members", "gaussian", member_groups="exchangeable")
+        self.assertEqual(result.shape, (4,))
+        expected = plugin.crps_minimiser_wrapper(
+            initial_guess, cube.collapsed("realization", iris.analysis.SUM),
+            truth, forecast_variance, "members", "gaussian")
+        self.assertArrayAlmostEqual(result, expected)
+
+        result = plugin.crps_minimiser_wrapper(
+            np.array([5, 1, 0, 1, 1], dtype=np.float32), forecast_predictor,
+            truth, forecast_variance, "members", "gaussian",
+            member_groups=[0, 1, 1])
+        self.assertEqual(result.shape, (5,))
+
     def test_normal_mean_predictor_keyerror(self):
         """
         Test that the minimisation has resulted in a KeyError, if the
@@ -716,5 +748,176 @@ class Test_crps_minimiser_wrapper(IrisTest):
                             "change" in str(warning_list[1]))
 
 
+class Test__batched_nelder_mead(IrisTest):
+
+    """
+    Test the vectorised Nelder-Mead minimisation of many problems.
+    """
+    def test_quadratic(self):
+        """
+        Test that independent quadratic problems are each minimised to
+        their own minimum.
+        """
+        minima = np.array([[1., 2.], [-3., 0.5], [0., 0.]])
+
+        def objective(coeffs):
+            """Sum of squared differences from the minimum."""
+            return np.sum((coeffs - minima)**2, axis=1)
+
+        plugin = Plugin()
+        result = plugin._batched_nelder_mead(
+            objective, np.zeros((3, 2)) + 0.1)
+        self.assertIsInstance(result, OptimizeResult)
+        self.assertArrayAlmostEqual(result.x, minima, decimal=3)
+        self.assertArrayAlmostEqual(result.fun, np.zeros(3), decimal=6)
+        self.assertTrue(np.all(result.success))
+        self.assertTrue(0 < result.nit < plugin.MAX_ITERATIONS)
+
+
+class Test_crps_minimiser_wrapper_for_regions(IrisTest):
+
+    """
+    Test minimising the CRPS separately for each region.
+    """
+    def setUp(self):
+        """Set up cubes for testing."""
+        cube = set_up_temperature_cube()
+        self.forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        self.forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        self.truth = cube.collapsed("realization", iris.analysis.MAX)
+        self.initial_guess = [5, 1, 0, 1]
+
+    def test_single_region(self):
+        """
+        Test that the coefficients for a single region covering the whole
+        domain match the coefficients from crps_minimiser_wrapper.
+        """
+        warnings.simplefilter("ignore")
+        expected = [-0.08169791, -0.09784413, 0.00822535, 1.00956199]
+        plugin = Plugin()
+        result = plugin.crps_minimiser_wrapper_for_regions(
+            self.initial_guess, self.forecast_predictor, self.truth,
+            self.forecast_variance, "mean", "gaussian",
+            np.zeros((3, 3), dtype=int))
+        self.assertEqual(result.shape, (1, 4))
+        self.assertArrayAlmostEqual(result[0], expected)
+
+    def test_multiple_regions(self):
+        """
+        Test that a set of coefficients is returned for each region, and
+        that regions without any points are set to NaN.
+        """
+        warnings.simplefilter("ignore")
+        region_labels = np.array([[0, 0, 0], [1, 1, 1], [-1, -1, -1]])
+        region_labels[2, 2] = 3
+        plugin = Plugin()
+        result = plugin.crps_minimiser_wrapper_for_regions(
+            self.initial_guess, self.forecast_predictor, self.truth,
+            self.forecast_variance, "mean", "truncated gaussian",
+            region_labels)
+        self.assertEqual(result.shape, (4, 4))
+        self.assertTrue(np.all(np.isfinite(result[[0, 1, 3]])))
+        self.assertTrue(np.all(np.isnan(result[2])))
+
+    def test_region_labels_wrong_shape(self):
+        """
+        Test that a ValueError is raised if the region_labels do not match
+        the grid.
+        """
+        plugin = Plugin()
+        msg = "The shape of the region_labels"
+        with self.assertRaisesRegexp(ValueError, msg):
+            plugin.crps_minimiser_wrapper_for_regions(
+                self.initial_guess, self.forecast_predictor, self.truth,
+                self.forecast_variance, "mean", "gaussian",
+                np.zeros((2, 2), dtype=int))
+
+    def test_keyerror(self):
+        """
+        Test that a KeyError is raised if the distribution is not
+        supported.
+        """
+        plugin = Plugin()
+        msg = "Distribution requested"
+        with self.assertRaisesRegexp(KeyError, msg):
+            plugin.crps_minimiser_wrapper_for_regions(
+                self.initial_guess, self.forecast_predictor, self.truth,
+                self.forecast_variance, "mean", "foo",
+                np.zeros((3, 3), dtype=int))
+
+
+class Test_crps_minimiser_wrapper_statistics(IrisTest):
+
+    """
+    Test the statistics recorded describing the cost of the minimisation.
+    """
+    def setUp(self):
+        """Set up cubes for testing."""
+        cube = set_up_temperature_cube()
+        self.forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        self.forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        self.truth = cube.collapsed("realization", iris.analysis.MAX)
+        self.initial_guess = np.array([5, 1, 0, 1], dtype=np.float32)
+
+    def test_statistics(self):
+        """
+        Test that the statistics are recorded and that the final CRPS
+        matches the CRPS calculated using the optimised coefficients.
+        """
+        warnings.simplefilter("ignore")
+        plugin = Plugin()
+        result = plugin.crps_minimiser_wrapper(
+            self.initial_guess, self.forecast_predictor, self.truth,
+            self.forecast_variance, "mean", "gaussian")
+        statistics = plugin.statistics
+        self.assertTrue(
+            statistics["objective_calls"] > statistics["iterations"] > 0)
+        self.assertTrue(statistics["iterations"] <= plugin.MAX_ITERATIONS)
+        self.assertTrue(
+            statistics["minimisation_time"] >= statistics["objective_time"])
+        self.assertTrue(
+            statistics["max_objective_call_time"] >=
+            statistics["mean_objective_call_time"])
+        expected_crps = plugin.normal_crps_minimiser(
+            result, self.forecast_predictor.data.flatten().astype(np.float32),
+            self.truth.data.flatten().astype(np.float32),
+            self.forecast_variance.data.flatten().astype(np.float32),
+            np.sqrt(np.pi).astype(np.float32), "mean")
+        self.assertAlmostEqual(statistics["final_crps"], expected_crps)
+
+    def test_callback(self):
+        """
+        Test that the statistics_callback is called with the statistics
+        once for each minimisation.
+        """
+        warnings.simplefilter("ignore")
+        recorded = []
+        plugin = Plugin(statistics_callback=recorded.append)
+        for distribution in ["gaussian", "truncated gaussian"]:
+            plugin.crps_minimiser_wrapper(
+                self.initial_guess, self.forecast_predictor, self.truth,
+                self.forecast_variance, "mean", distribution)
+        self.assertEqual(len(recorded), 2)
+        self.assertIs(recorded[-1], plugin.statistics)
+
+    def test_regions(self):
+        """
+        Test that the statistics are recorded when minimising separately
+        for each region.
+        """
+        warnings.simplefilter("ignore")
+        plugin = Plugin()
+        plugin.crps_minimiser_wrapper_for_regions(
+            self.initial_guess, self.forecast_predictor, self.truth,
+            self.forecast_variance, "mean", "gaussian",
+            np.array([[0, 0, 0], [1, 1, 1], [1, 1, 1]]))
+        self.assertTrue(plugin.statistics["objective_calls"] > 0)
+        self.assertTrue(np.isfinite(plugin.statistics["final_crps"]))
+
+
 if __name__ == '__main__':
     unittest.main()
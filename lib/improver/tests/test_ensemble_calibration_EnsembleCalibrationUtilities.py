@@ -47,7 +47,9 @@ from improver.ensemble_calibration.ensemble_calibration_utilities import (
     convert_cube_data_to_2d, concatenate_cubes,
     _associate_any_coordinate_with_master_coordinate,
     _slice_over_coordinate, _strip_var_names, rename_coordinate, _renamer,
-    check_predictor_of_mean_flag)
+    check_predictor_of_mean_flag, select_training_point_indices,
+    create_region_labels_from_masks, create_region_labels_from_blocks,
+    sum_members_by_group)
 from improver.tests.helper_functions_ensemble_calibration import(
     set_up_temperature_cube)
 
@@ -781,5 +783,177 @@ class Test_check_predictor_of_mean_flag(IrisTest):
             check_predictor_of_mean_flag(predictor_of_mean_flag)
 
 
+class Test_sum_members_by_group(IrisTest):
+
+    """
+    Test the summing of the ensemble members within groups that share a
+    beta coefficient.
+    """
+
+    def setUp(self):
+        """Set up a predictor with a column for each of four members."""
+        self.data = np.arange(8, dtype=np.float32).reshape(2, 4)
+
+    def test_no_groups(self):
+        """Test that the data are unchanged without member_groups."""
+        result = sum_members_by_group(self.data, None)
+        self.assertArrayEqual(result, self.data)
+
+    def test_exchangeable(self):
+        """Test that exchangeable members are summed into one column."""
+        result = sum_members_by_group(self.data, "exchangeable")
+        self.assertArrayEqual(result, [[6.], [22.]])
+        self.assertEqual(result.dtype, np.float32)
+
+    def test_groups(self):
+        """Test that the members are summed within each group, with the
+        groups ordered by their labels."""
+        result = sum_members_by_group(self.data, ["perturbed", "control",
+                                                  "perturbed", "perturbed"])
+        self.assertArrayEqual(result, [[1., 5.], [5., 17.]])
+
+    def test_invalid_groups(self):
+        """Test that an error is raised if there is not a group label for
+        each member, or for an unknown string."""
+        msg = "The member_groups must contain a group label for each"
+        with self.assertRaisesRegexp(ValueError, msg):
+            sum_members_by_group(self.data, [0, 1, 1])
+        msg = "The requested member_groups"
+        with self.assertRaisesRegexp(ValueError, msg):
+            sum_members_by_group(self.data, "unknown")
+
+
+class Test_select_training_point_indices(IrisTest):
+
+    """
+    Test the selection of a subsample of training points.
+    """
+
+    def setUp(self):
+        """Set up a field for testing."""
+        self.field = np.arange(100, dtype=np.float32).reshape(10, 10)[::-1]
+
+    def test_stride(self):
+        """
+        Test that the stride method selects a regular set of points in
+        both the x and y direction.
+        """
+        expected = [0, 3, 6, 9, 30, 33, 36, 39,
+                    60, 63, 66, 69, 90, 93, 96, 99]
+        result = select_training_point_indices(self.field, "stride", 11)
+        self.assertArrayEqual(result, expected)
+
+    def test_random_reproducible(self):
+        """
+        Test that the random method returns the requested number of unique,
+        sorted points, and that the same points are selected if the same
+        random seed is used.
+        """
+        result = select_training_point_indices(
+            self.field, "random", 20, random_seed=10)
+        repeat = select_training_point_indices(
+            self.field, "random", 20, random_seed=10)
+        self.assertEqual(len(np.unique(result)), 20)
+        self.assertArrayEqual(result, np.sort(result))
+        self.assertArrayEqual(result, repeat)
+
+    def test_stratified(self):
+        """
+        Test that the stratified method selects points that span the full
+        range of values within the field.
+        """
+        result = select_training_point_indices(self.field, "stratified", 5)
+        values = self.field.flatten()[result]
+        self.assertEqual(len(result), 5)
+        self.assertEqual(values.min(), 0)
+        self.assertEqual(values.max(), 99)
+
+    def test_stratified_with_nans(self):
+        """
+        Test that the stratified method selects only finite points, spanning
+        the range of the finite values, when the field contains NaNs.
+        """
+        field = self.field.copy()
+        field[:2, :] = np.nan
+        result = select_training_point_indices(field, "stratified", 5)
+        values = field.flatten()[result]
+        self.assertEqual(len(result), 5)
+        self.assertTrue(np.all(np.isfinite(values)))
+        self.assertEqual(values.min(), 0)
+        self.assertEqual(values.max(), 79)
+
+    def test_stratified_too_few_finite_points(self):
+        """
+        Test that points with NaN values are added by the stratified method
+        when there are too few finite points to reach the subsample size.
+        """
+        field = np.full((10, 10), np.nan, dtype=np.float32)
+        field[0, :3] = [1., 2., 3.]
+        result = select_training_point_indices(field, "stratified", 5)
+        self.assertArrayEqual(result, [0, 1, 2, 3, 4])
+
+    def test_subsample_size_larger_than_field(self):
+        """
+        Test that all points are selected if the subsample size exceeds
+        the number of points within the field.
+        """
+        result = select_training_point_indices(self.field, "random", 1000)
+        self.assertArrayEqual(result, np.arange(100))
+
+    def test_foo(self):
+        """
+        Test that the utility fails when the subsample_method is not an
+        accepted value.
+        """
+        msg = "The requested subsample_method"
+        with self.assertRaisesRegexp(ValueError, msg):
+            select_training_point_indices(self.field, "foo", 10)
+
+
+class Test_create_region_labels_from_masks(IrisTest):
+
+    """
+    Test the creation of region labels from region masks.
+    """
+
+    def test_basic(self):
+        """
+        Test that each region is labelled with its index, and points
+        outside all regions are labelled with -1.
+        """
+        mask0 = np.array([[1, 1, 0], [0, 0, 0]])
+        mask1 = np.array([[0, 0, 0], [0, 1, 1]])
+        expected = np.array([[0, 0, -1], [-1, 1, 1]])
+        result = create_region_labels_from_masks([mask0, mask1])
+        self.assertArrayEqual(result, expected)
+
+
+class Test_create_region_labels_from_blocks(IrisTest):
+
+    """
+    Test the creation of region labels from blocks of grid points.
+    """
+
+    def test_basic(self):
+        """
+        Test that the blocks are labelled consecutively, and that partial
+        blocks are created at the edge of the domain.
+        """
+        expected = np.array([[0, 0, 1], [0, 0, 1], [2, 2, 3]])
+        result = create_region_labels_from_blocks(3, 3, 2)
+        self.assertArrayEqual(result, expected)
+
+    def test_block_size_one(self):
+        """Test that a block_size of 1 gives a region for each point."""
+        result = create_region_labels_from_blocks(2, 3, 1)
+        self.assertArrayEqual(result, np.arange(6).reshape(2, 3))
+
+    def test_invalid_block_size(self):
+        """Test that a ValueError is raised for a block_size of zero."""
+        msg = "The block_size must be at least 1"
+        with self.assertRaisesRegexp(ValueError, msg):
+            create_region_labels_from_blocks(2, 3, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
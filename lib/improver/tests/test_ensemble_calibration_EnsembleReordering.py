@@ -35,6 +35,8 @@ class.
 """
 import unittest
 
+import dask.array as da
+import iris
 from iris.cube import Cube
 from iris.tests import IrisTest
 import numpy as np
@@ -169,6 +171,53 @@ class Test_rank_ecc(IrisTest):
         result.transpose([1, 0, 2, 3])
         self.assertArrayAlmostEqual(result.data, result_data)
 
+    def test_unordered_lazy_data(self):
+        """
+        Test that lazy data, chunked over the grid and the members, remains
+        lazy and is reordered in the same way as realised data.
+        """
+        raw_data = np.array([[[[5, 5, 5],
+                               [7, 5, 5],
+                               [5, 5, 5]]],
+                             [[[4, 4, 4],
+                               [4, 4, 4],
+                               [4, 4, 4]]],
+                             [[[6, 6, 6],
+                               [6, 6, 6],
+                               [6, 6, 6]]]])
+
+        calibrated_data = np.array([[[[4, 5, 4],
+                                      [4, 5, 4],
+                                      [4, 5, 4]]],
+                                    [[[5, 6, 5],
+                                      [5, 6, 5],
+                                      [5, 6, 5]]],
+                                    [[[6, 7, 6],
+                                      [6, 7, 6],
+                                      [6, 7, 6]]]])
+
+        result_data = np.array([[[[5, 6, 5],
+                                  [6, 6, 5],
+                                  [5, 6, 5]]],
+                                [[[4, 5, 4],
+                                  [4, 5, 4],
+                                  [4, 5, 4]]],
+                                [[[6, 7, 6],
+                                  [5, 7, 6],
+                                  [6, 7, 6]]]])
+
+        raw_cube = self.cube.copy()
+        raw_cube.data = da.from_array(raw_data, chunks=(1, 1, 2, 2))
+        calibrated_cube = self.cube.copy()
+        calibrated_cube.data = da.from_array(
+            calibrated_data, chunks=(2, 1, 3, 1))
+
+        plugin = Plugin()
+        result = plugin.rank_ecc(calibrated_cube, raw_cube)
+        self.assertTrue(result.has_lazy_data())
+        result.transpose([1, 0, 2, 3])
+        self.assertArrayAlmostEqual(result.data, result_data)
+
     def test_3d_cube(self):
         """Test that the plugin returns the correct cube data for a
         3d input cube."""
@@ -262,6 +311,72 @@ class Test_rank_ecc(IrisTest):
             raise ValueError("Exceptions raised by both accepted forms of the "
                              "calibrated data. {} {}".format(err1, err2))
 
+    def test_random_seed(self):
+        """
+        Test that with a random_seed, the result is one of the possible
+        results for tied values, is the same for the same seed, and that
+        both possible results occur for different seeds.
+        """
+        raw_data = np.array(
+            [[[1, 1]],
+             [[3, 2]],
+             [[2, 2]]])
+
+        calibrated_data = np.array(
+            [[[1, 1]],
+             [[2, 2]],
+             [[3, 3]]])
+
+        cube = self.cube.copy()
+        cube = cube[:, :, :2, 0]
+
+        raw_cube = cube.copy()
+        raw_cube.data = raw_data
+
+        calibrated_cube = cube.copy()
+        calibrated_cube.data = calibrated_data
+
+        results = []
+        for random_seed in range(20):
+            result = Plugin(random_seed=random_seed).rank_ecc(
+                calibrated_cube.copy(), raw_cube.copy())
+            repeat = Plugin(random_seed=random_seed).rank_ecc(
+                calibrated_cube.copy(), raw_cube.copy())
+            self.assertArrayEqual(result.data, repeat.data)
+            result.transpose([1, 0, 2])
+            self.assertArrayEqual(result.data[:, 0, 0], [1, 3, 2])
+            results.append(tuple(result.data[1:, 0, 1]))
+        self.assertEqual(set(results), set([(2, 3), (3, 2)]))
+
+    def test_random_seed_lazy(self):
+        """
+        Test that with a random_seed, lazy data are reordered in the same
+        way as realised data where there are no ties, and reproducibly
+        where there are ties.
+        """
+        raw_data = np.random.RandomState(0).randint(
+            0, 6, size=self.cube.shape)
+        calibrated_data = np.sort(np.random.RandomState(1).random_sample(
+            self.cube.shape), axis=0)
+        raw_cube = self.cube.copy(
+            data=da.from_array(raw_data, chunks=(1, 1, 2, 2)))
+        calibrated_cube = self.cube.copy(data=calibrated_data)
+
+        plugin = Plugin(random_seed=0)
+        result = plugin.rank_ecc(calibrated_cube.copy(), raw_cube.copy())
+        self.assertTrue(result.has_lazy_data())
+        repeat = plugin.rank_ecc(calibrated_cube.copy(), raw_cube.copy())
+        self.assertArrayEqual(result.data, repeat.data)
+        expected = Plugin(random_seed=0).rank_ecc(
+            calibrated_cube.copy(), self.cube.copy(data=raw_data))
+        result.transpose([1, 0, 2, 3])
+        expected.transpose([1, 0, 2, 3])
+        sorted_raw_data = np.sort(raw_data, axis=0)
+        untied = np.all(sorted_raw_data[1:] != sorted_raw_data[:-1], axis=0)
+        self.assertTrue(np.any(untied))
+        self.assertArrayAlmostEqual(result.data[:, untied],
+                                    expected.data[:, untied])
+
     def test_2d_cube(self):
         """
         Test that the plugin returns the correct cube data for a
@@ -292,6 +407,111 @@ class Test_rank_ecc(IrisTest):
         self.assertArrayAlmostEqual(result.data, result_data)
 
 
+class Test_rank_ecc_array(IrisTest):
+
+    """Test the rank_ecc_array method in the EnsembleReordering plugin."""
+
+    def setUp(self):
+        """
+        Create raw and calibrated cubes over three times, with ties in the
+        raw data.
+        """
+        cube = set_up_temperature_cube()
+        cubes = iris.cube.CubeList([])
+        for time_index in range(3):
+            time_cube = cube.copy()
+            time_cube.coord("time").points = (
+                time_cube.coord("time").points + time_index)
+            cubes.append(time_cube)
+        cube = cubes.concatenate_cube()
+        self.raw_cube = cube.copy(
+            data=np.random.RandomState(0).randint(0, 3, size=cube.shape))
+        self.calibrated_cube = cube.copy(data=np.sort(
+            np.random.RandomState(1).random_sample(cube.shape), axis=0))
+
+    def test_matches_rank_ecc(self):
+        """
+        Test that with a random_seed the result matches rank_ecc for one
+        and several workers, and keeps the dimensions of the calibrated
+        cube.
+        """
+        expected = Plugin(random_seed=0).rank_ecc(
+            self.calibrated_cube.copy(), self.raw_cube.copy())
+        expected.transpose([1, 0, 2, 3])
+        for workers in [1, 3]:
+            result = Plugin(random_seed=0, workers=workers).rank_ecc_array(
+                self.calibrated_cube, self.raw_cube)
+            self.assertEqual(result.coord_dims("time"), (1,))
+            self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_ranking(self):
+        """
+        Test that without a random_seed the ranking matches the raw data
+        where there are no ties.
+        """
+        result = Plugin(workers=2).rank_ecc_array(
+            self.calibrated_cube, self.raw_cube)
+        raw_data = self.raw_cube.data
+        sorted_raw_data = np.sort(raw_data, axis=0)
+        untied = np.all(sorted_raw_data[1:] != sorted_raw_data[:-1], axis=0)
+        self.assertTrue(np.any(untied))
+        self.assertArrayEqual(
+            np.argsort(result.data, axis=0)[:, untied],
+            np.argsort(raw_data, axis=0)[:, untied])
+        self.assertArrayAlmostEqual(np.sort(result.data, axis=0),
+                                    self.calibrated_cube.data)
+
+    def test_lazy_data(self):
+        """Test that lazy data are reordered into a realised cube."""
+        expected = Plugin(random_seed=0).rank_ecc_array(
+            self.calibrated_cube, self.raw_cube)
+        raw_cube = self.raw_cube.copy(
+            data=da.from_array(self.raw_cube.data, chunks=(1, 1, 2, 2)))
+        result = Plugin(random_seed=0).rank_ecc_array(
+            self.calibrated_cube, raw_cube)
+        self.assertFalse(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_invalid_shape(self):
+        """Test that cubes of different shapes raise an error."""
+        msg = "must have the same shape"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin().rank_ecc_array(self.calibrated_cube,
+                                    self.raw_cube[:, :2])
+
+    def test_invalid_workers(self):
+        """Test that fewer than one worker raises an error."""
+        msg = "Invalid workers: must be at least 1"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(workers=0)
+
+
+class Test__rank_data_with_ties(IrisTest):
+
+    """Test the _rank_data_with_ties method in the EnsembleReordering
+    plugin."""
+
+    def test_no_ties(self):
+        """Test that without ties no random numbers are drawn, and the
+        result matches _rank_data."""
+        raw_data = np.random.RandomState(0).random_sample((5, 3, 4))
+        calibrated_data = np.sort(
+            np.random.RandomState(1).random_sample((5, 3, 4)), axis=0)
+        result = Plugin._rank_data_with_ties(raw_data, calibrated_data, None)
+        expected = Plugin._rank_data(raw_data, calibrated_data)
+        self.assertArrayAlmostEqual(result, expected)
+
+    def test_ties(self):
+        """Test that the ranking matches the raw data, with the tied
+        members taking the tied calibrated values in either order."""
+        raw_data = np.array([[2., 1.], [1., 1.], [3., 1.]])
+        calibrated_data = np.array([[10., 10.], [20., 20.], [30., 30.]])
+        result = Plugin._rank_data_with_ties(
+            raw_data, calibrated_data, np.random.default_rng(0))
+        self.assertArrayAlmostEqual(result[:, 0], [20., 10., 30.])
+        self.assertArrayAlmostEqual(np.sort(result[:, 1]), [10., 20., 30.])
+
+
 class Test_process(IrisTest):
 
     """Test the EnsembleReordering plugin."""
@@ -43,7 +43,7 @@ import numpy as np
 import warnings
 
 from improver.ensemble_calibration.ensemble_calibration import (
-    EstimateCoefficientsForEnsembleCalibration as Plugin)
+    CoefficientTable, EstimateCoefficientsForEnsembleCalibration as Plugin)
 from improver.tests.helper_functions_ensemble_calibration import(
     set_up_temperature_cube, set_up_wind_speed_cube,
     _add_forecast_reference_time_and_forecast_period,
@@ -136,6 +136,35 @@ class Test__init__(IrisTest):
                 self.assertTrue("The statsmodels can not be imported"
                                 in str(warning_list[0]))
 
+    def test_invalid_subsample_method(self):
+        """
+        Test that the plugin raises a ValueError if the requested
+        subsample_method is not an accepted value.
+        """
+        msg = "The requested subsample_method"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin("gaussian", "degreesC", subsample_method="foo",
+                   subsample_size=10)
+
+    def test_subsample_size_missing(self):
+        """
+        Test that the plugin raises a ValueError if a subsample_method is
+        requested without a subsample_size.
+        """
+        msg = "A positive subsample_size is required"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin("gaussian", "degreesC", subsample_method="stride")
+
+    def test_subsample_with_region_labels(self):
+        """
+        Test that the plugin raises a ValueError if subsampling is requested
+        together with estimating coefficients for each region.
+        """
+        msg = "Subsampling the training points is not supported"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin("gaussian", "degreesC", subsample_method="stride",
+                   subsample_size=10, region_labels=np.zeros((3, 3)))
+
 
 class Test_compute_initial_guess(IrisTest):
 
@@ -303,6 +332,24 @@ class Test_compute_initial_guess(IrisTest):
             no_of_members=no_of_members)
         self.assertArrayAlmostEqual(result, data)
 
+    def test_members_predictor_member_groups(self):
+        """
+        Test that the initial guess has one beta for each group of members,
+        when the betas are tied within groups of members.
+        """
+        cube = self.cube
+        truth = cube.collapsed("realization", iris.analysis.MAX)
+
+        plugin = Plugin("gaussian", "degreesC")
+        result = plugin.compute_initial_guess(
+            truth, cube, "members", False, no_of_members=3,
+            member_groups=[0, 1, 1])
+        self.assertArrayAlmostEqual(result, [1, 1, 0, 1, 1])
+        result = plugin.compute_initial_guess(
+            truth, cube, "members", True, no_of_members=3,
+            member_groups="exchangeable")
+        self.assertEqual(len(result), 4)
+
     def test_mean_predictor_estimate_coefficients_nans(self):
         """
         Test that the plugin returns the expected values for the initial guess
@@ -359,8 +406,9 @@ class Test_estimate_coefficients_for_ngr(IrisTest):
             _create_truth(self.current_wind_speed_forecast_cube))
 
     def test_basic(self):
-        """Ensure that the optimised_coeffs are returned as a dictionary,
-           and the coefficient names are returned as a list."""
+        """Ensure that the optimised_coeffs are returned as a
+           CoefficientTable, and the coefficient names are returned as a
+           list."""
         current_forecast = self.current_temperature_forecast_cube
 
         historic_forecasts = self.historic_temperature_forecast_cube
@@ -374,12 +422,106 @@ class Test_estimate_coefficients_for_ngr(IrisTest):
         result = plugin.estimate_coefficients_for_ngr(
             current_forecast, historic_forecasts, truth)
         optimised_coeffs, coeff_names = result
-        self.assertIsInstance(optimised_coeffs, dict)
+        self.assertIsInstance(optimised_coeffs, CoefficientTable)
         self.assertIsInstance(coeff_names, list)
         for key in optimised_coeffs.keys():
             self.assertEqual(
                 len(optimised_coeffs[key]), len(coeff_names))
 
+    def test_subsample(self):
+        """
+        Ensure that the optimised_coeffs are returned when a subsample of
+        the training points is used, and that the mean CRPS for the
+        subsample and for all training points is recorded for each date.
+        """
+        current_forecast = self.current_temperature_forecast_cube
+
+        historic_forecasts = self.historic_temperature_forecast_cube
+
+        truth = self.temperature_truth_cube
+
+        distribution = "gaussian"
+        desired_units = "degreesC"
+
+        plugin = Plugin(distribution, desired_units,
+                        subsample_method="stratified", subsample_size=4)
+        optimised_coeffs, coeff_names = plugin.estimate_coefficients_for_ngr(
+            current_forecast, historic_forecasts, truth)
+        self.assertEqual(
+            sorted(optimised_coeffs.keys()),
+            sorted(plugin.subsample_crps.keys()))
+        for key in optimised_coeffs.keys():
+            self.assertEqual(len(optimised_coeffs[key]), len(coeff_names))
+            self.assertTrue(np.isfinite(plugin.subsample_crps[key]["full"]))
+            self.assertTrue(
+                np.isfinite(plugin.subsample_crps[key]["subsample"]))
+
+    def test_minimisation_statistics(self):
+        """
+        Ensure that statistics describing the cost of the minimisation are
+        recorded for each date.
+        """
+        current_forecast = self.current_temperature_forecast_cube
+
+        historic_forecasts = self.historic_temperature_forecast_cube
+
+        truth = self.temperature_truth_cube
+
+        plugin = Plugin("gaussian", "degreesC")
+        optimised_coeffs, _ = plugin.estimate_coefficients_for_ngr(
+            current_forecast, historic_forecasts, truth)
+        self.assertEqual(
+            sorted(optimised_coeffs.keys()),
+            sorted(plugin.minimisation_statistics.keys()))
+        for statistics in plugin.minimisation_statistics.values():
+            self.assertTrue(statistics["objective_calls"] > 0)
+
+    def test_region_labels(self):
+        """
+        Ensure that fields of coefficients are returned with a separate
+        set of coefficients for each region, when region labels are
+        provided.
+        """
+        current_forecast = self.current_temperature_forecast_cube
+
+        historic_forecasts = self.historic_temperature_forecast_cube
+
+        truth = self.temperature_truth_cube
+
+        region_labels = np.array([[0, 0, 0], [0, 0, 0], [1, 1, 1]])
+
+        plugin = Plugin("gaussian", "degreesC", region_labels=region_labels)
+        optimised_coeffs, coeff_names = plugin.estimate_coefficients_for_ngr(
+            current_forecast, historic_forecasts, truth)
+        for key in optimised_coeffs.keys():
+            self.assertEqual(
+                optimised_coeffs[key].shape, (len(coeff_names), 3, 3))
+            self.assertArrayEqual(
+                optimised_coeffs[key][:, 0, :], optimised_coeffs[key][:, 1, :])
+
+    def test_region_labels_nan_initial_guess(self):
+        """
+        Ensure that fields of coefficients are returned for each date when
+        region labels are provided and the initial guess contains NaNs.
+        """
+        current_forecast = self.current_temperature_forecast_cube
+
+        historic_forecasts = self.historic_temperature_forecast_cube
+
+        truth = self.temperature_truth_cube
+        truth.data[:] = np.nan
+
+        region_labels = np.array([[0, 0, 0], [0, 0, 0], [1, 1, -1]])
+
+        plugin = Plugin("gaussian", "degreesC", region_labels=region_labels)
+        optimised_coeffs, coeff_names = plugin.estimate_coefficients_for_ngr(
+            current_forecast, historic_forecasts, truth)
+        self.assertTrue(len(optimised_coeffs.keys()) > 0)
+        for key in optimised_coeffs.keys():
+            self.assertEqual(
+                optimised_coeffs[key].shape, (len(coeff_names), 3, 3))
+            self.assertTrue(np.all(np.isnan(optimised_coeffs[key][:, 2, 2])))
+
     def test_coefficient_values_for_gaussian_distribution(self):
         """
         Ensure that the values generated within optimised_coeffs match the
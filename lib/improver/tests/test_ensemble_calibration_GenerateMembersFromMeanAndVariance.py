@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unit tests for the
+`ensemble_calibration.GenerateMembersFromMeanAndVariance`
+class.
+
+"""
+import unittest
+
+import dask.array as da
+import iris
+from iris.cube import Cube, CubeList
+from iris.tests import IrisTest
+import numpy as np
+
+from improver.ensemble_calibration.ensemble_calibration import (
+    EnsembleReordering, GeneratePercentilesFromMeanAndVariance,
+    GenerateMembersFromMeanAndVariance as Plugin)
+from improver.tests.helper_functions_ensemble_calibration import(
+    set_up_temperature_cube, _add_forecast_reference_time_and_forecast_period,
+    _create_historic_forecasts)
+
+
+class Test_process(IrisTest):
+
+    """Test the process method of the plugin."""
+
+    def setUp(self):
+        """Set up a raw forecast, with the mean and variance of the
+        calibrated forecast."""
+        self.raw_forecast = (
+            _add_forecast_reference_time_and_forecast_period(
+                set_up_temperature_cube()))
+        self.raw_forecast.data = (
+            self.raw_forecast.data +
+            np.random.RandomState(0).random_sample(self.raw_forecast.shape))
+        self.current_forecast_predictor = self.raw_forecast.collapsed(
+            "realization", iris.analysis.MEAN)
+        self.current_forecast_variance = self.raw_forecast.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        self.predictor_and_variance = CubeList(
+            [self.current_forecast_predictor, self.current_forecast_variance])
+
+    def test_basic(self):
+        """Test that the plugin returns a cube of members with the
+        coordinates of the raw forecast."""
+        result = Plugin().process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        self.assertIsInstance(result, Cube)
+        self.assertEqual(result.coord_dims("realization"), (1,))
+        self.assertEqual(result.shape, (1, 3, 3, 3))
+
+    def test_matches_percentiles_and_reordering(self):
+        """Test that the result matches the percentiles generated from the
+        mean and variance, reordered to match the raw forecast."""
+        percentiles = GeneratePercentilesFromMeanAndVariance().process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        expected = EnsembleReordering().process(
+            percentiles, self.raw_forecast.copy())
+        result = Plugin().process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_matches_percentiles_and_reordering_with_ties(self):
+        """Test that the result matches the percentiles generated from the
+        mean and variance, reordered to match the raw forecast, when tied
+        raw values over several times are split using a random_seed."""
+        raw_forecast = _create_historic_forecasts(self.raw_forecast)
+        raw_forecast.data = (
+            raw_forecast.data +
+            np.random.RandomState(1).random_sample(raw_forecast.shape))
+        predictor_and_variance = CubeList(
+            [raw_forecast.collapsed("realization", iris.analysis.MEAN),
+             raw_forecast.collapsed("realization", iris.analysis.VARIANCE)])
+        raw_forecast.data[:] = 1.
+        percentiles = GeneratePercentilesFromMeanAndVariance().process(
+            predictor_and_variance, raw_forecast.copy())
+        expected = EnsembleReordering(random_seed=0).process(
+            percentiles, raw_forecast.copy())
+        result = Plugin(random_seed=0).process(
+            predictor_and_variance, raw_forecast.copy())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+        # The ties within lazy data are split using the location of each
+        # block, so the lazy results are compared with each other.
+        lazy_forecast = raw_forecast.copy()
+        lazy_forecast.data = da.from_array(
+            lazy_forecast.data, chunks=(2, 3, 2, 2))
+        expected = EnsembleReordering(random_seed=0).process(
+            percentiles, lazy_forecast.copy())
+        result = Plugin(random_seed=0).process(
+            predictor_and_variance, lazy_forecast.copy())
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_zero_variance(self):
+        """Test that every member takes the mean where the variance is
+        zero."""
+        self.current_forecast_variance.data[:] = 0.
+        result = Plugin().process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        for index in range(3):
+            self.assertArrayAlmostEqual(
+                result.data[:, index], self.current_forecast_predictor.data)
+
+    def test_lazy_data(self):
+        """Test that lazy raw data give a lazy result matching the result
+        for realised data."""
+        expected = Plugin(random_seed=0).process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        raw_forecast = self.raw_forecast.copy()
+        raw_forecast.data = da.from_array(
+            raw_forecast.data, chunks=(1, 1, 2, 2))
+        result = Plugin(random_seed=0).process(
+            self.predictor_and_variance, raw_forecast)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_random_seed(self):
+        """Test that tied raw values are split reproducibly with a
+        random_seed."""
+        self.raw_forecast.data[:] = 1.
+        result = Plugin(random_seed=0).process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        repeat = Plugin(random_seed=0).process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        self.assertArrayEqual(result.data, repeat.data)
+        percentiles = GeneratePercentilesFromMeanAndVariance().process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        self.assertArrayAlmostEqual(np.sort(result.data, axis=1)[0],
+                                    percentiles.data[:, 0])
+
+    def test_truncated_gaussian(self):
+        """Test that the truncated gaussian members match the truncated
+        gaussian percentiles, reordered to match the raw forecast."""
+        self.current_forecast_predictor.data = (
+            self.current_forecast_predictor.data - 270.)
+        percentiles = GeneratePercentilesFromMeanAndVariance(
+            distribution="truncated gaussian").process(
+                self.predictor_and_variance, self.raw_forecast.copy())
+        expected = EnsembleReordering().process(
+            percentiles, self.raw_forecast.copy())
+        result = Plugin(distribution="truncated gaussian").process(
+            self.predictor_and_variance, self.raw_forecast.copy())
+        self.assertTrue(np.all(result.data >= 0.))
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_invalid_sampling(self):
+        """Test that an unknown sampling option raises an error."""
+        msg = "The unknown sampling option is not yet implemented"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(sampling="unknown").process(
+                self.predictor_and_variance, self.raw_forecast.copy())
+
+
+if __name__ == '__main__':
+    unittest.main()
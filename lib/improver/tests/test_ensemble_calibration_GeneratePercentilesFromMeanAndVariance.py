@@ -36,11 +36,13 @@ class.
 """
 import unittest
 
+import dask.array as da
 import iris
 from iris.coords import DimCoord
 from iris.cube import Cube, CubeList
 from iris.tests import IrisTest
 import numpy as np
+from scipy.stats import truncnorm
 
 from improver.ensemble_calibration.ensemble_calibration import (
     GeneratePercentilesFromMeanAndVariance as Plugin)
@@ -159,6 +161,147 @@ class Test__mean_and_variance_to_percentiles(IrisTest):
         self.assertIsInstance(result, Cube)
         self.assertArrayAlmostEqual(result.data, data)
 
+    def test_lazy_data(self):
+        """
+        Test that the plugin returns a cube with lazy data, matching the
+        expected data values, when the mean and variance are lazy.
+        """
+        data = np.array([[[[225.56812863, 236.81812863, 248.06812863],
+                           [259.31812863, 270.56812863, 281.81812863],
+                           [293.06812863, 304.31812863, 315.56812863]]],
+                         [[[229.48333333, 240.73333333, 251.98333333],
+                           [263.23333333, 274.48333333, 285.73333333],
+                           [296.98333333, 308.23333333, 319.48333333]]],
+                         [[[233.39853804, 244.64853804, 255.89853804],
+                           [267.14853804, 278.39853804, 289.64853804],
+                           [300.89853804, 312.14853804, 323.39853804]]]])
+
+        cube = self.current_temperature_forecast_cube
+        current_forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        current_forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        current_forecast_predictor.data = da.from_array(
+            current_forecast_predictor.data, chunks=(1, 2, 2))
+        current_forecast_variance.data = da.from_array(
+            current_forecast_variance.data, chunks=(1, 3, 1))
+        percentiles = [0.1, 0.5, 0.9]
+        plugin = Plugin()
+        result = plugin._mean_and_variance_to_percentiles(
+            current_forecast_predictor, current_forecast_variance,
+            percentiles)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, data)
+
+    def test_block_shape(self):
+        """
+        Test that calculating the percentiles in blocks gives the same
+        values, as float32.
+        """
+        cube = self.current_temperature_forecast_cube
+        current_forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        current_forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        percentiles = [0.1, 0.5, 0.9]
+        expected = Plugin()._mean_and_variance_to_percentiles(
+            current_forecast_predictor, current_forecast_variance,
+            percentiles)
+        result = Plugin(block_shape=(1, 2))._mean_and_variance_to_percentiles(
+            current_forecast_predictor, current_forecast_variance,
+            percentiles)
+        self.assertEqual(result.dtype, np.float32)
+        self.assertArrayAlmostEqual(result.data, expected.data, decimal=4)
+
+    def test_invalid_block_shape(self):
+        """Test that a block shape without two positive sizes raises an
+        error."""
+        msg = "Invalid block_shape: two positive sizes required"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(block_shape=(1, 0))
+
+    def test_truncated_gaussian(self):
+        """
+        Test that the truncated gaussian percentiles match those of the
+        normal distribution truncated below at zero.
+        """
+        cube = self.current_temperature_forecast_cube
+        current_forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        current_forecast_predictor.data = (
+            current_forecast_predictor.data - 270.)
+        current_forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        percentiles = [0.1, 0.5, 0.9]
+        mean = current_forecast_predictor.data
+        sigma = np.sqrt(current_forecast_variance.data)
+        expected = np.array([
+            truncnorm.ppf(percentile, -mean/sigma, np.inf,
+                          loc=mean, scale=sigma)
+            for percentile in percentiles])
+        plugin = Plugin(distribution="truncated_gaussian")
+        result = plugin._mean_and_variance_to_percentiles(
+            current_forecast_predictor, current_forecast_variance,
+            percentiles)
+        self.assertTrue(np.all(result.data >= 0.))
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_truncated_gaussian_far_lower_tail(self):
+        """
+        Test that the truncated gaussian percentiles are finite and match
+        those of the normal distribution truncated below at zero, where
+        the location is 40 standard deviations below zero, so that the
+        probability of exceeding zero underflows.
+        """
+        cube = self.current_temperature_forecast_cube
+        current_forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        current_forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        current_forecast_predictor.data[:] = -4.
+        current_forecast_variance.data[:] = 0.01
+        percentiles = [0.1, 0.5, 0.9]
+        expected = np.array([
+            truncnorm.ppf(percentile, 40., np.inf, loc=-4., scale=0.1)
+            for percentile in percentiles])
+        plugin = Plugin(distribution="truncated gaussian")
+        result = plugin._mean_and_variance_to_percentiles(
+            current_forecast_predictor, current_forecast_variance,
+            percentiles)
+        self.assertTrue(np.all(np.isfinite(result.data)))
+        for index in range(3):
+            self.assertArrayAlmostEqual(
+                result.data[index] / expected[index],
+                np.ones(result.data[index].shape))
+
+    def test_truncated_gaussian_zero_variance(self):
+        """
+        Test that the truncated gaussian percentiles are the mean, limited
+        below at zero, where the variance is zero.
+        """
+        cube = self.current_temperature_forecast_cube
+        current_forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        current_forecast_predictor.data = (
+            current_forecast_predictor.data - 270.)
+        current_forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        current_forecast_variance.data[:] = 0.
+        plugin = Plugin(distribution="truncated gaussian")
+        result = plugin._mean_and_variance_to_percentiles(
+            current_forecast_predictor, current_forecast_variance,
+            [0.1, 0.5, 0.9])
+        for index in range(3):
+            self.assertArrayAlmostEqual(
+                result.data[index],
+                np.maximum(current_forecast_predictor.data, 0.))
+
+    def test_invalid_distribution(self):
+        """Test that an unknown distribution raises an error."""
+        msg = "The unknown distribution is not yet implemented"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(distribution="unknown")
+
     def test_simple_data(self):
         """
         Test that the plugin returns the expected values for the generated
@@ -369,6 +512,24 @@ class Test_create_percentiles(IrisTest):
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), no_of_percentiles)
 
+    def test_random_seed(self):
+        """
+        Test that random sampling with a random_seed gives the same sorted
+        percentiles within the expected range for each call.
+        """
+        no_of_percentiles = 5
+        result = Plugin(random_seed=0)._create_percentiles(
+            no_of_percentiles, sampling="random")
+        repeat = Plugin(random_seed=0)._create_percentiles(
+            no_of_percentiles, sampling="random")
+        self.assertEqual(result, repeat)
+        self.assertEqual(result, sorted(result))
+        self.assertTrue(min(result) >= 1/6.)
+        self.assertTrue(max(result) <= 5/6.)
+        other = Plugin(random_seed=1)._create_percentiles(
+            no_of_percentiles, sampling="random")
+        self.assertNotEqual(result, other)
+
     def test_unknown_sampling_option(self):
         """
         Test that the plugin returns the expected error message,
@@ -384,6 +545,43 @@ class Test_create_percentiles(IrisTest):
                 no_of_percentiles, sampling="unknown")
 
 
+class Test__get_percentiles_and_standard_quantiles(IrisTest):
+
+    """Test the _get_percentiles_and_standard_quantiles method."""
+
+    def test_quantile(self):
+        """
+        Test that the standard normal quantiles are returned for the
+        percentiles, and are cached.
+        """
+        percentiles, standard_quantiles = (
+            Plugin()._get_percentiles_and_standard_quantiles(3))
+        self.assertArrayAlmostEqual(percentiles, [0.25, 0.5, 0.75])
+        self.assertArrayAlmostEqual(standard_quantiles,
+                                    [-0.67448975, 0., 0.67448975])
+        _, repeat = Plugin()._get_percentiles_and_standard_quantiles(3)
+        self.assertIs(repeat, standard_quantiles)
+        self.assertFalse(standard_quantiles.flags.writeable)
+
+    def test_random(self):
+        """
+        Test that random percentiles are cached with a random_seed, and
+        drawn for each call without one.
+        """
+        percentiles, standard_quantiles = Plugin(
+            random_seed=0)._get_percentiles_and_standard_quantiles(
+                4, sampling="random")
+        _, repeat = Plugin(
+            random_seed=0)._get_percentiles_and_standard_quantiles(
+                4, sampling="random")
+        self.assertIs(repeat, standard_quantiles)
+        _, first = Plugin()._get_percentiles_and_standard_quantiles(
+            4, sampling="random")
+        _, second = Plugin()._get_percentiles_and_standard_quantiles(
+            4, sampling="random")
+        self.assertIsNot(first, second)
+
+
 class Test_process(IrisTest):
 
     """Test the process plugin."""
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unit tests for the
+`ensemble_calibration.GenerateProbabilitiesFromMeanAndVariance`
+class.
+
+"""
+import unittest
+
+import dask.array as da
+import iris
+from iris.cube import Cube, CubeList
+from iris.tests import IrisTest
+import numpy as np
+from scipy.stats import norm, truncnorm
+
+from improver.ensemble_calibration.ensemble_calibration import (
+    GenerateProbabilitiesFromMeanAndVariance as Plugin)
+from improver.tests.helper_functions_ensemble_calibration import(
+    set_up_temperature_cube, _add_forecast_reference_time_and_forecast_period)
+
+
+class Test__init__(IrisTest):
+
+    """Test the __init__ method of the plugin."""
+
+    def test_sorted_thresholds(self):
+        """Test that the thresholds are sorted."""
+        plugin = Plugin([280., 270.])
+        self.assertEqual(plugin.thresholds, [270., 280.])
+
+    def test_no_thresholds(self):
+        """Test that an empty list of thresholds raises an error."""
+        msg = "At least one threshold is required"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin([])
+
+    def test_invalid_distribution(self):
+        """Test that an unknown distribution raises an error."""
+        msg = "The unknown distribution is not yet implemented"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin([270.], distribution="unknown")
+
+
+class Test_process(IrisTest):
+
+    """Test the process method of the plugin."""
+
+    def setUp(self):
+        """Set up the mean and variance of the calibrated forecast."""
+        cube = _add_forecast_reference_time_and_forecast_period(
+            set_up_temperature_cube())
+        self.current_forecast_predictor = cube.collapsed(
+            "realization", iris.analysis.MEAN)
+        self.current_forecast_variance = cube.collapsed(
+            "realization", iris.analysis.VARIANCE)
+        self.predictor_and_variance = CubeList(
+            [self.current_forecast_predictor, self.current_forecast_variance])
+        self.thresholds = [260., 270., 280.]
+
+    def test_basic(self):
+        """Test that the plugin returns a cube of probabilities with a
+        leading threshold dimension."""
+        result = Plugin(self.thresholds).process(self.predictor_and_variance)
+        self.assertIsInstance(result, Cube)
+        self.assertEqual(result.shape, (3, 1, 3, 3))
+        self.assertEqual(result.coord_dims("threshold"), (0,))
+        self.assertEqual(result.coord_dims("time"), (1,))
+        self.assertEqual(result.name(), "probability_of_air_temperature")
+        self.assertEqual(result.units, "1")
+        self.assertEqual(result.coord("threshold").units, "K")
+        self.assertEqual(result.dtype, np.float32)
+
+    def test_data(self):
+        """Test that the probabilities match those of the normal
+        distribution."""
+        mean = self.current_forecast_predictor.data
+        sigma = np.sqrt(self.current_forecast_variance.data)
+        expected = np.array([
+            norm.sf(threshold, loc=mean, scale=sigma)
+            for threshold in self.thresholds]).reshape((3, 1, 3, 3))
+        result = Plugin(self.thresholds).process(self.predictor_and_variance)
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_below_threshold(self):
+        """Test that the probabilities of falling below the thresholds are
+        the complement of those of exceeding them."""
+        above = Plugin(self.thresholds).process(self.predictor_and_variance)
+        result = Plugin(self.thresholds, below_thresh_ok=True).process(
+            self.predictor_and_variance)
+        self.assertArrayAlmostEqual(result.data, 1. - above.data)
+
+    def test_zero_variance(self):
+        """Test that the probabilities are zero or one where the variance
+        is zero."""
+        self.current_forecast_variance.data[:] = 0.
+        result = Plugin(self.thresholds).process(self.predictor_and_variance)
+        expected = np.array([
+            self.current_forecast_predictor.data > threshold
+            for threshold in self.thresholds]).reshape((3, 1, 3, 3))
+        self.assertArrayEqual(result.data, expected)
+
+    def test_truncated_gaussian(self):
+        """Test that the probabilities match those of the normal
+        distribution truncated below at zero."""
+        self.current_forecast_predictor.data = (
+            self.current_forecast_predictor.data - 270.)
+        thresholds = [-1., 0.5, 10.]
+        mean = self.current_forecast_predictor.data
+        sigma = np.sqrt(self.current_forecast_variance.data)
+        expected = np.array([
+            truncnorm.sf(threshold, -mean/sigma, np.inf, loc=mean,
+                         scale=sigma)
+            for threshold in thresholds]).reshape((3, 1, 3, 3))
+        result = Plugin(thresholds, distribution="truncated gaussian").process(
+            self.predictor_and_variance)
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_lazy_data(self):
+        """Test that lazy data give a lazy result matching the result for
+        realised data."""
+        expected = Plugin(self.thresholds).process(
+            self.predictor_and_variance)
+        self.current_forecast_predictor.data = da.from_array(
+            self.current_forecast_predictor.data, chunks=(1, 2, 2))
+        result = Plugin(self.thresholds).process(
+            self.predictor_and_variance)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Unit tests for the grids.geometry module."""
+
+
+import unittest
+import warnings
+
+import iris
+from iris.tests import IrisTest
+import numpy as np
+
+from improver.grids.geometry import GridGeometry, get_grid_geometry
+from improver.tests.test_nbhood_basicneighbourhoodprocessing import (
+    set_up_cube, set_up_cube_lat_long)
+
+
+class Test_GridGeometry(IrisTest):
+
+    """Test the calculation of the grid spacing."""
+
+    def test_projection(self):
+        """Test the spacing of a projection grid, in metres whatever the
+        units of the coordinates."""
+        cube = set_up_cube()
+        cube.coord("projection_x_coordinate").convert_units("km")
+        geometry = GridGeometry(cube.coord("projection_x_coordinate"),
+                                cube.coord("projection_y_coordinate"))
+        self.assertAlmostEqual(geometry.x_spacing, 2003.6563, places=3)
+        self.assertAlmostEqual(geometry.y_spacing, 2002.8450, places=3)
+        self.assertTrue(geometry.x_uniform)
+        self.assertTrue(geometry.y_uniform)
+        self.assertFalse(geometry.is_latlon)
+        self.assertIsNone(geometry.row_x_spacing)
+
+    def test_lat_long(self):
+        """Test that the spacing east decreases with the cosine of the
+        latitude."""
+        cube = set_up_cube_lat_long()
+        cube.coord("latitude").points = np.arange(16) * 4.
+        geometry = GridGeometry(cube.coord("longitude"),
+                                cube.coord("latitude"))
+        radius = iris.analysis.cartography.DEFAULT_SPHERICAL_EARTH_RADIUS
+        self.assertTrue(geometry.is_latlon)
+        self.assertAlmostEqual(geometry.y_spacing, radius * np.radians(4.))
+        self.assertAlmostEqual(geometry.x_spacing, radius * np.radians(1.))
+        self.assertArrayAlmostEqual(
+            geometry.row_x_spacing,
+            radius * np.radians(1.) * np.cos(np.radians(np.arange(16) * 4.)))
+
+    def test_non_uniform(self):
+        """Test that a non-uniform grid is identified with a warning."""
+        cube = set_up_cube()
+        x_coord = cube.coord("projection_x_coordinate")
+        x_coord.points = x_coord.points + np.arange(16) ** 2
+        with warnings.catch_warnings(record=True) as warning_list:
+            warnings.simplefilter("always")
+            geometry = GridGeometry(x_coord,
+                                    cube.coord("projection_y_coordinate"))
+        self.assertFalse(geometry.x_uniform)
+        self.assertTrue(geometry.y_uniform)
+        self.assertTrue(any("Grid spacing is not uniform" in str(item)
+                            for item in warning_list))
+
+
+class Test_get_grid_geometry(IrisTest):
+
+    """Test the caching of grid geometries."""
+
+    def test_cached(self):
+        """Test that cubes on the same grid share a geometry, and that
+        cubes on other grids do not."""
+        geometry = get_grid_geometry(set_up_cube())
+        self.assertIs(get_grid_geometry(set_up_cube(num_time_points=3)),
+                      geometry)
+        self.assertIsNot(get_grid_geometry(set_up_cube(num_grid_points=8)),
+                         geometry)
+
+    def test_invalid_grid(self):
+        """Test that a cube without x and y coordinates raises an
+        error."""
+        cube = set_up_cube()
+        cube.remove_coord("projection_x_coordinate")
+        msg = "Invalid grid: projection_x/y or latitude/longitude coords"
+        with self.assertRaisesRegexp(ValueError, msg):
+            get_grid_geometry(cube)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,8 @@
 import unittest
 
 from cf_units import Unit
+import dask.array as da
+import iris
 from iris.coords import AuxCoord, DimCoord
 from iris.coord_systems import OSGB
 from iris.cube import Cube
@@ -43,6 +45,7 @@ import numpy as np
 
 from improver.grids.osgb import OSGBGRID
 from improver.nbhood import BasicNeighbourhoodProcessing as NBHood
+from improver.utilities.tiling import TileScheduler
 
 
 SINGLE_POINT_RANGE_3_CENTROID = np.array([
@@ -246,11 +249,46 @@ class Test_operation_neighbourhooding(IrisTest):
         with self.assertRaisesRegexp(ValueError, msg):
             NBHood(self.RADIUS_IN_KM).process(cube)
 
+    def test_multi_point_multitimes_lazy(self):
+        """Test that lazy data split into chunks smaller than the kernel
+        remains lazy and gives the same result as realised data."""
+        cube = set_up_cube(
+            zero_point_indices=[(0, 10, 10), (1, 7, 7), (1, 0, 15)],
+            num_time_points=2
+        )
+        expected = NBHood(self.RADIUS_IN_KM).process(cube.copy()).data
+        cube.data = da.from_array(cube.data, chunks=(1, 2, 5))
+        result = NBHood(self.RADIUS_IN_KM).process(cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_single_point_flat_lazy(self):
+        """Test lazy data for a single non-zero grid cell, flat weighting."""
+        cube = set_up_cube()
+        expected = np.ones_like(cube.data)
+        for index, slice_ in enumerate(SINGLE_POINT_RANGE_2_CENTROID_FLAT):
+            expected[0][5 + index][5:10] = slice_
+        cube.data = da.from_array(cube.data, chunks=(1, 8, 8))
+        radius_in_km = 4.2  # Equivalent to a range of 2.
+        result = NBHood(radius_in_km, unweighted_mode=True).process(cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected)
+
     def test_single_point_lat_long(self):
-        """Test behaviour for a single grid cell on lat long grid."""
+        """Test behaviour for a single grid cell on lat long grid, with a
+        radius giving the same number of grid cells as on the projection
+        grid."""
         cube = set_up_cube_lat_long()
-        msg = "Invalid grid: projection_x/y coords required"
-        expected = np.zeros_like(cube.data)
+        radius_in_km = 250.  # Equivalent to a range of 2 at each latitude.
+        expected = NBHood(4.2).process(set_up_cube()).data
+        result = NBHood(radius_in_km).process(cube)
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_single_point_lat_long_too_small(self):
+        """Test that a radius smaller than the lat long grid spacing raises
+        an error."""
+        cube = set_up_cube_lat_long()
+        msg = "gives zero cell extent"
         with self.assertRaisesRegexp(ValueError, msg):
             NBHood(self.RADIUS_IN_KM).process(cube)
 
@@ -492,5 +530,416 @@ class Test_operation_neighbourhooding(IrisTest):
             plugin = NBHood(self.RADIUS_IN_KM).process(cube)
 
 
+class Test_chord_engine(IrisTest):
+
+    """Test the chord decomposition engine against the dense kernel."""
+
+    def setUp(self):
+        """Set up a cube of random data over two times."""
+        self.cube = set_up_cube(num_grid_points=40, num_time_points=2)
+        self.cube.data = np.random.RandomState(0).random_sample(
+            self.cube.shape)
+
+    def test_invalid_engine(self):
+        """Test that an unknown engine raises an error."""
+        msg = "Invalid engine"
+        with self.assertRaisesRegexp(ValueError, msg):
+            NBHood(6.3, engine="fft")
+
+    def test_equivalence(self):
+        """Test that the chord engine matches the dense kernel for both
+        weightings over a range of radii, including radii that reach beyond
+        the edges of the grid."""
+        for unweighted_mode in [False, True]:
+            for radius_in_km in [2.1, 6.3, 10.5, 20.1, 100.1]:
+                expected = NBHood(
+                    radius_in_km, unweighted_mode=unweighted_mode).process(
+                        self.cube.copy())
+                result = NBHood(
+                    radius_in_km, unweighted_mode=unweighted_mode,
+                    engine="chord").process(self.cube.copy())
+                self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_single_point(self):
+        """Test the chord engine for a single non-zero grid cell."""
+        cube = set_up_cube()
+        expected = np.ones_like(cube.data)
+        for index, slice_ in enumerate(SINGLE_POINT_RANGE_3_CENTROID):
+            expected[0][5 + index][5:10] = slice_
+        result = NBHood(6.3, engine="chord").process(cube)
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_transposed_lazy(self):
+        """Test the chord engine with lazy data with x before y."""
+        expected = NBHood(6.3).process(self.cube.copy())
+        cube = self.cube.copy()
+        cube.transpose([0, 2, 1])
+        cube.data = da.from_array(cube.data, chunks=(1, 10, 10))
+        result = NBHood(6.3, engine="chord").process(cube)
+        self.assertTrue(result.has_lazy_data())
+        result.transpose([0, 2, 1])
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+
+class Test_masked_mode(IrisTest):
+
+    """Test neighbourhood processing of data with missing points."""
+
+    RADIUS_IN_KM = 6.3  # Gives 3 grid cells worth.
+
+    def setUp(self):
+        """Set up a cube with a block of NaN points."""
+        self.cube = set_up_cube(num_grid_points=20, num_time_points=2)
+        self.cube.data = np.random.RandomState(0).random_sample(
+            self.cube.shape)
+        self.cube.data[0, 2:12, 3:12] = np.nan
+
+    def expected_result(self, unweighted_mode):
+        """Calculate the expected result point by point."""
+        kernel = NBHood(
+            self.RADIUS_IN_KM, unweighted_mode=unweighted_mode).get_kernel(
+                (3, 3))
+        padded = np.pad(self.cube.data, ((0, 0), (3, 3), (3, 3)),
+                        mode='edge')
+        expected = np.full(self.cube.shape, np.nan)
+        for index in np.ndindex(self.cube.shape):
+            time_index, y_index, x_index = index
+            neighbourhood = padded[time_index, y_index:y_index + 7,
+                                   x_index:x_index + 7]
+            weights = kernel * ~np.isnan(neighbourhood)
+            if weights.sum() > 0:
+                expected[index] = (
+                    np.nansum(neighbourhood * weights) / weights.sum())
+        return expected
+
+    def test_nan_raises_without_masked_mode(self):
+        """Test that NaN points are still an error by default."""
+        msg = "NaN detected in input cube data"
+        with self.assertRaisesRegexp(ValueError, msg):
+            NBHood(self.RADIUS_IN_KM).process(self.cube)
+
+    def test_normalised_convolution(self):
+        """Test that the result is the kernel-weighted mean of the valid
+        points for both weightings and engines."""
+        for unweighted_mode in [False, True]:
+            expected = self.expected_result(unweighted_mode)
+            for engine in NBHood.ENGINES:
+                result = NBHood(
+                    self.RADIUS_IN_KM, unweighted_mode=unweighted_mode,
+                    engine=engine, masked_mode=True).process(
+                        self.cube.copy())
+                self.assertIsInstance(result.data, np.ma.MaskedArray)
+                self.assertArrayEqual(result.data.mask, np.isnan(expected))
+                self.assertArrayAlmostEqual(
+                    result.data.filled(np.nan), expected)
+
+    def test_no_valid_neighbours(self):
+        """Test that points without valid neighbours are masked and that
+        points outside the missing block are unaffected at the other
+        time."""
+        result = NBHood(self.RADIUS_IN_KM, unweighted_mode=True,
+                        masked_mode=True).process(self.cube.copy())
+        self.assertTrue(result.data.mask[0, 7, 7])
+        self.assertFalse(result.data.mask[1].any())
+        expected = NBHood(self.RADIUS_IN_KM, unweighted_mode=True).process(
+            self.cube[1].copy())
+        self.assertArrayAlmostEqual(result.data[1], expected.data)
+
+    def test_masked_input(self):
+        """Test that masked points are treated in the same way as NaN."""
+        expected = NBHood(self.RADIUS_IN_KM, masked_mode=True).process(
+            self.cube.copy())
+        cube = self.cube.copy()
+        cube.data = np.ma.masked_invalid(cube.data)
+        cube.data.data[np.isnan(self.cube.data)] = 1000.
+        result = NBHood(self.RADIUS_IN_KM, masked_mode=True).process(cube)
+        self.assertArrayEqual(result.data.mask, expected.data.mask)
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_lazy(self):
+        """Test that lazy data gives the same result as realised data."""
+        expected = NBHood(self.RADIUS_IN_KM, masked_mode=True).process(
+            self.cube.copy())
+        cube = self.cube.copy()
+        cube.data = da.from_array(cube.data, chunks=(1, 5, 5))
+        result = NBHood(self.RADIUS_IN_KM, masked_mode=True).process(cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayEqual(result.data.mask, expected.data.mask)
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+
+class Test_collapse_realizations(IrisTest):
+
+    """Test the mean over realizations of neighbourhood processed data."""
+
+    RADIUS_IN_KM = 6.3  # Gives 3 grid cells worth.
+
+    def setUp(self):
+        """Set up a cube of random data with three realizations."""
+        cubes = iris.cube.CubeList()
+        for index in range(3):
+            cube = set_up_cube(num_grid_points=20, num_time_points=2)
+            cube.add_aux_coord(DimCoord([index], "realization", units="1"))
+            cubes.append(cube)
+        self.cube = cubes.merge_cube()
+        self.cube.data = np.random.RandomState(0).random_sample(
+            self.cube.shape)
+
+    def expected_result(self, cube, **kwargs):
+        """Neighbourhood process each realization and take the mean."""
+        return np.ma.mean(
+            [NBHood(self.RADIUS_IN_KM, **kwargs).process(
+                realization.copy()).data for realization in
+             cube.slices_over("realization")], axis=0)
+
+    def test_invalid_collapse_realizations(self):
+        """Test that an unknown order raises an error."""
+        msg = "Invalid collapse_realizations"
+        with self.assertRaisesRegexp(ValueError, msg):
+            NBHood(self.RADIUS_IN_KM, collapse_realizations="during")
+
+    def test_before_and_after(self):
+        """Test that taking the mean before or after applying the kernel
+        gives the mean of the neighbourhood processed realizations."""
+        expected = self.expected_result(self.cube)
+        for order in ["before", "after"]:
+            result = NBHood(
+                self.RADIUS_IN_KM, collapse_realizations=order).process(
+                    self.cube.copy())
+            self.assertEqual(result.shape, (2, 20, 20))
+            self.assertEqual(result.coord("realization").shape, (1,))
+            self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_lazy(self):
+        """Test that lazy data give a lazy result."""
+        expected = self.expected_result(self.cube)
+        cube = self.cube.copy()
+        cube.data = da.from_array(cube.data, chunks=(1, 1, 10, 10))
+        result = NBHood(self.RADIUS_IN_KM,
+                        collapse_realizations="before").process(cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_masked_mode(self):
+        """Test that missing points are excluded from the mean before
+        applying the kernel, and from the neighbourhoods of each
+        realization after."""
+        self.cube.data[0, 0, 2:12, 3:12] = np.nan
+        data = np.ma.masked_invalid(self.cube.data)
+        mean_cube = self.cube[0].copy(data=data.mean(axis=0))
+        expected = NBHood(self.RADIUS_IN_KM, masked_mode=True).process(
+            mean_cube)
+        result = NBHood(self.RADIUS_IN_KM, masked_mode=True,
+                        collapse_realizations="before").process(
+                            self.cube.copy())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+        expected = self.expected_result(self.cube, masked_mode=True)
+        result = NBHood(self.RADIUS_IN_KM, masked_mode=True,
+                        collapse_realizations="after").process(
+                            self.cube.copy())
+        self.assertArrayAlmostEqual(result.data, expected)
+
+
+class Test_lat_long(IrisTest):
+
+    """Test neighbourhood processing on a latitude and longitude grid, on
+    which the number of grid cells east within the radius increases with
+    latitude."""
+
+    RADIUS_IN_KM = 400.
+
+    def setUp(self):
+        """Set up a cube of random data from the equator to high
+        latitudes."""
+        self.cube = set_up_cube_lat_long(num_grid_points=30,
+                                         num_time_points=2)
+        self.cube.coord("latitude").points = np.arange(30) * 2.
+        self.cube.coord("longitude").points = np.arange(30) * 0.2
+        self.cube.data = np.random.RandomState(0).random_sample(
+            self.cube.shape)
+
+    def expected_result(self, unweighted_mode):
+        """Calculate the expected result point by point, with the number
+        of grid cells east for the row of each point in the
+        neighbourhood."""
+        row_cells_x, grid_cells_y = NBHood(
+            self.RADIUS_IN_KM).get_grid_x_y_kernel_ranges(
+                self.cube, allow_row_ranges=True)
+        data = self.cube.data
+        ylen, xlen = data.shape[1:]
+        expected = np.zeros_like(data)
+        for y_index, x_index in np.ndindex(ylen, xlen):
+            total = 0.
+            weights = 0.
+            for dy in range(-grid_cells_y, grid_cells_y + 1):
+                row = min(max(y_index + dy, 0), ylen - 1)
+                cells_x = row_cells_x[row]
+                remainder = 1. - (float(dy) / grid_cells_y) ** 2
+                half_width = int(np.floor(cells_x * np.sqrt(remainder)))
+                for dx in range(-half_width, half_width + 1):
+                    column = min(max(x_index + dx, 0), xlen - 1)
+                    weight = 1.
+                    if not unweighted_mode:
+                        weight = remainder - (float(dx) / cells_x) ** 2
+                    total += weight * data[:, row, column]
+                    weights += weight
+            expected[:, y_index, x_index] = total / weights
+        return expected
+
+    def test_row_ranges(self):
+        """Test that the number of grid cells east increases with
+        latitude, and that the row ranges are only returned on request."""
+        plugin = NBHood(self.RADIUS_IN_KM)
+        row_cells_x, grid_cells_y = plugin.get_grid_x_y_kernel_ranges(
+            self.cube, allow_row_ranges=True)
+        self.assertEqual(grid_cells_y, 1)
+        self.assertEqual(len(row_cells_x), 30)
+        self.assertEqual(row_cells_x[0], 17)
+        self.assertEqual(row_cells_x[-1], 33)
+        self.assertTrue(np.all(np.diff(row_cells_x) >= 0))
+        msg = "Invalid grid: projection_x/y coords required"
+        with self.assertRaisesRegexp(ValueError, msg):
+            plugin.get_grid_x_y_kernel_ranges(self.cube)
+
+    def test_latitude_varying_kernel(self):
+        """Test that the result matches the kernel calculated point by
+        point, for both weightings and engines."""
+        for unweighted_mode in [False, True]:
+            expected = self.expected_result(unweighted_mode)
+            for engine in NBHood.ENGINES:
+                result = NBHood(
+                    self.RADIUS_IN_KM, unweighted_mode=unweighted_mode,
+                    engine=engine).process(self.cube.copy())
+                self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_lazy(self):
+        """Test that lazy data give a lazy result matching the result for
+        realised data."""
+        expected = self.expected_result(False)
+        cube = self.cube.copy()
+        cube.data = da.from_array(cube.data, chunks=(1, 10, 10))
+        result = NBHood(self.RADIUS_IN_KM).process(cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected)
+
+
+class Test_scheduler(IrisTest):
+
+    """Test neighbourhood processing tile by tile on multiple threads."""
+
+    def setUp(self):
+        """Set up a cube of random data over two times."""
+        self.cube = set_up_cube(num_grid_points=40, num_time_points=2)
+        self.cube.data = np.random.RandomState(0).random_sample(
+            self.cube.shape)
+        self.scheduler = TileScheduler((7, 9), workers=3)
+
+    def test_get_halo(self):
+        """Test that the halo is the largest kernel radius."""
+        self.assertEqual(NBHood(6.3).get_halo(self.cube), (3, 3))
+        plugin = NBHood([2.1, 10.5], lead_times=[0., 6.])
+        self.assertEqual(plugin.get_halo(self.cube), (5, 5))
+
+    def test_equivalence(self):
+        """Test that the result matches the whole grid result for both
+        engines and for radii larger than the tiles."""
+        for engine in NBHood.ENGINES:
+            for radius_in_km in [6.3, 20.1]:
+                expected = NBHood(radius_in_km, engine=engine).process(
+                    self.cube.copy())
+                result = NBHood(radius_in_km, engine=engine,
+                                scheduler=self.scheduler).process(
+                                    self.cube.copy())
+                self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_masked_mode(self):
+        """Test that missing points are handled as for the whole grid."""
+        self.cube.data[0, 2:12, 3:12] = np.nan
+        expected = NBHood(6.3, masked_mode=True).process(self.cube.copy())
+        result = NBHood(6.3, masked_mode=True,
+                        scheduler=self.scheduler).process(self.cube.copy())
+        self.assertArrayEqual(result.data.mask, expected.data.mask)
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+
+class Test_lead_times(IrisTest):
+
+    """Test neighbourhood processing with radii varying with lead time."""
+
+    RADII_IN_KM = [2.1, 6.3, 10.5]
+    LEAD_TIMES = [0., 6., 12.]
+
+    def setUp(self):
+        """Set up a cube of random data with forecast periods of 1, 2, 3, 6
+        and 15 hours."""
+        self.cube = set_up_cube(num_grid_points=20, num_time_points=5)
+        self.cube.data = np.random.RandomState(0).random_sample(
+            self.cube.shape)
+        self.cube.add_aux_coord(
+            AuxCoord([1., 2., 3., 6., 15.], "forecast_period",
+                     units="hours"), 0)
+        self.plugin = NBHood(self.RADII_IN_KM, lead_times=self.LEAD_TIMES)
+
+    def test_invalid_lengths(self):
+        """Test that the radii and lead times must have the same length."""
+        msg = "Invalid radius_in_km: 2 radii given for 3 lead_times"
+        with self.assertRaisesRegexp(ValueError, msg):
+            NBHood([2.1, 6.3], lead_times=self.LEAD_TIMES)
+
+    def test_invalid_order(self):
+        """Test that the lead times must be in ascending order."""
+        msg = "Invalid lead_times: must be in ascending order"
+        with self.assertRaisesRegexp(ValueError, msg):
+            NBHood(self.RADII_IN_KM, lead_times=[0., 12., 6.])
+
+    def test_get_radius_in_km(self):
+        """Test that the radii are interpolated between the lead times and
+        held constant beyond them."""
+        result = self.plugin.get_radius_in_km(np.array([0., 3., 6., 15.]))
+        self.assertArrayAlmostEqual(result, [2.1, 4.2, 6.3, 10.5])
+
+    def test_group_by_radius(self):
+        """Test that slices with the same kernel ranges are grouped."""
+        time_axis, groups = self.plugin._group_by_radius(self.cube)
+        self.assertEqual(time_axis, 0)
+        self.assertEqual(groups, {(1, 1): [0, 1], (2, 2): [2],
+                                  (3, 3): [3], (5, 5): [4]})
+
+    def test_matches_each_slice(self):
+        """Test that each slice is processed with the radius for its
+        forecast period."""
+        radii_in_km = [2.8, 3.5, 4.2, 6.3, 10.5]
+        expected = self.cube.data.copy()
+        for index, radius_in_km in enumerate(radii_in_km):
+            expected[index] = NBHood(radius_in_km).process(
+                self.cube[index].copy()).data
+        result = self.plugin.process(self.cube.copy())
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_lazy(self):
+        """Test that lazy data gives the same result as realised data."""
+        expected = self.plugin.process(self.cube.copy())
+        cube = self.cube.copy()
+        cube.data = da.from_array(cube.data, chunks=(2, 10, 10))
+        result = self.plugin.process(cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_scalar_forecast_period(self):
+        """Test a cube with a scalar forecast period."""
+        cube = self.cube[3]
+        expected = NBHood(6.3).process(cube.copy())
+        result = self.plugin.process(cube)
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_no_forecast_period(self):
+        """Test that a forecast_period coordinate is required."""
+        cube = self.cube.copy()
+        cube.remove_coord("forecast_period")
+        msg = "A forecast_period coordinate is required"
+        with self.assertRaisesRegexp(ValueError, msg):
+            self.plugin.process(cube)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Unit tests for the nbhood.NeighbourhoodPercentiles plugin."""
+
+
+import unittest
+
+from iris.cube import Cube
+from iris.tests import IrisTest
+import numpy as np
+import scipy.ndimage
+
+from improver.nbhood import NeighbourhoodPercentiles as Plugin
+from improver.tests.test_nbhood_basicneighbourhoodprocessing import (
+    set_up_cube)
+
+
+def set_up_rainfall_cube(decimals=1):
+    """Set up a cube of random rainfall amounts over two times."""
+    cube = set_up_cube(num_grid_points=30, num_time_points=2)
+    cube.data = np.random.RandomState(0).gamma(0.5, 2.0, size=cube.shape)
+    if decimals is not None:
+        cube.data = np.round(cube.data, decimals)
+    return cube
+
+
+class Test__init__(IrisTest):
+
+    """Test the initialisation of the plugin."""
+
+    def test_invalid_percentile(self):
+        """Test that percentiles outside 0 to 100 raise an error."""
+        msg = "Invalid percentile: must be >=0 and <=100: 101.0"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(6.3, [50., 101.])
+
+    def test_invalid_max_bins(self):
+        """Test that fewer than two bins raises an error."""
+        msg = "Invalid max_bins: must be at least 2"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(6.3, [50.], max_bins=1)
+
+
+class Test_process(IrisTest):
+
+    """Test the process method of the plugin."""
+
+    PERCENTILES = [0., 10., 50., 90., 100.]
+
+    def test_basic(self):
+        """Test that a cube with a leading percentile dimension is
+        returned."""
+        cube = set_up_rainfall_cube()
+        result = Plugin(6.3, self.PERCENTILES).process(cube)
+        self.assertIsInstance(result, Cube)
+        self.assertEqual(result.shape, (5, 2, 30, 30))
+        self.assertArrayAlmostEqual(result.coord("percentile").points,
+                                    self.PERCENTILES)
+        self.assertEqual(result.name(), cube.name())
+
+    def test_matches_percentile_filter(self):
+        """Test that the result matches scipy.ndimage.percentile_filter
+        with a circular footprint when the values fit within the bins."""
+        cube = set_up_rainfall_cube()
+        for radius_in_km in [2.1, 6.3, 20.1]:
+            plugin = Plugin(radius_in_km, self.PERCENTILES, max_bins=1000)
+            result = plugin.process(cube)
+            ranges = plugin.nbhood_plugin.get_grid_x_y_kernel_ranges(cube)
+            footprint = plugin.nbhood_plugin.get_kernel(ranges) > 0
+            for index, percentile in enumerate(self.PERCENTILES):
+                for time_index in range(2):
+                    expected = scipy.ndimage.percentile_filter(
+                        cube.data[time_index], percentile,
+                        footprint=footprint, mode='nearest')
+                    self.assertArrayAlmostEqual(
+                        result.data[index, time_index], expected)
+
+    def test_continuous_data_exact(self):
+        """Test that the result matches scipy.ndimage.percentile_filter
+        for continuous data with more distinct values than bins, including
+        a block of zeros, so that every percentile is a value from within
+        the neighbourhood."""
+        cube = set_up_rainfall_cube(decimals=None)
+        cube.data[:, :20, :20] = 0.
+        percentiles = [0., 10., 50., 90., 100.]
+        for max_bins in [2, 16, 64]:
+            plugin = Plugin(6.3, percentiles, max_bins=max_bins)
+            if max_bins == 16:
+                # Process the fine histogram in blocks of a few rows.
+                plugin.MAX_FINE_HISTOGRAM_SIZE = 5000
+            result = plugin.process(cube)
+            ranges = plugin.nbhood_plugin.get_grid_x_y_kernel_ranges(cube)
+            footprint = plugin.nbhood_plugin.get_kernel(ranges) > 0
+            for index, percentile in enumerate(percentiles):
+                for time_index in range(2):
+                    expected = scipy.ndimage.percentile_filter(
+                        cube.data[time_index], percentile,
+                        footprint=footprint, mode='nearest')
+                    self.assertArrayEqual(
+                        result.data[index, time_index], expected)
+        self.assertTrue(np.all(result.data[:, :, :15, :15] == 0.))
+
+    def test_single_point(self):
+        """Test that a single zero point within a field of ones only
+        affects the minimum."""
+        cube = set_up_cube()
+        result = Plugin(6.3, [0., 50.]).process(cube)
+        expected = np.ones_like(cube.data)
+        footprint = Plugin(6.3, [0.]).nbhood_plugin.get_kernel((3, 3)) > 0
+        expected[0, 4:11, 4:11][footprint] = 0.
+        self.assertArrayAlmostEqual(result.data[0], expected)
+        self.assertArrayAlmostEqual(result.data[1], np.ones_like(cube.data))
+
+    def test_nan(self):
+        """Test that NaN values raise an error."""
+        cube = set_up_rainfall_cube()
+        cube.data[0, 4, 4] = np.nan
+        msg = "NaN detected in input cube data"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(6.3, [50.]).process(cube)
+
+
+if __name__ == '__main__':
+    unittest.main()
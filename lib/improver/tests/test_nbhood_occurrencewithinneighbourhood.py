@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Unit tests for the nbhood.OccurrenceWithinNeighbourhood plugin."""
+
+
+import unittest
+
+import iris
+from iris.coords import DimCoord
+from iris.cube import Cube
+from iris.tests import IrisTest
+import numpy as np
+import scipy.ndimage
+
+from improver.nbhood import OccurrenceWithinNeighbourhood as Plugin
+from improver.tests.test_nbhood_basicneighbourhoodprocessing import (
+    set_up_cube)
+
+
+def set_up_realization_cube(num_realizations=3):
+    """Set up a cube of random values with a leading realization
+    dimension."""
+    cubes = []
+    for index in range(num_realizations):
+        cube = set_up_cube(num_grid_points=30, num_time_points=2)
+        cube.add_aux_coord(DimCoord([index], "realization", units="1"))
+        cubes.append(cube)
+    cube = iris.cube.CubeList(cubes).merge_cube()
+    cube.data = np.random.RandomState(0).random_sample(cube.shape)
+    return cube
+
+
+class Test__init__(IrisTest):
+
+    """Test the initialisation of the plugin."""
+
+    def test_invalid_operation(self):
+        """Test that an unknown operation raises an error."""
+        msg = "Invalid operation: must be 'max' or 'min'"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(6.3, operation="mean")
+
+    def test_invalid_collapse_realizations(self):
+        """Test that collapsing the realizations before the maximum or
+        minimum raises an error."""
+        msg = "Invalid collapse_realizations"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(6.3, collapse_realizations="before")
+
+
+class Test__running_extreme(IrisTest):
+
+    """Test the van Herk/Gil-Werman running maximum and minimum."""
+
+    def test_matches_scipy(self):
+        """Test that the running values match scipy.ndimage for a range of
+        window sizes, including windows longer than the data."""
+        data = np.random.RandomState(0).random_sample((3, 17))
+        for operation, scipy_filter in [
+                ("max", scipy.ndimage.maximum_filter1d),
+                ("min", scipy.ndimage.minimum_filter1d)]:
+            plugin = Plugin(6.3, operation=operation)
+            for half_width in [0, 1, 2, 5, 12]:
+                result = plugin._running_extreme(data, half_width)
+                expected = scipy_filter(
+                    data, 2 * half_width + 1, axis=-1, mode='nearest')
+                self.assertArrayAlmostEqual(result, expected)
+
+
+class Test_process(IrisTest):
+
+    """Test the process method of the plugin."""
+
+    def test_single_point(self):
+        """Test that a single zero point spreads over a circle for the
+        minimum and disappears for the maximum."""
+        cube = set_up_cube()
+        plugin = Plugin(6.3, operation="min")
+        result = plugin.process(cube)
+        expected = np.ones_like(cube.data)
+        footprint = plugin.nbhood_plugin.get_kernel((3, 3)) > 0
+        expected[0, 4:11, 4:11][footprint] = 0.
+        self.assertArrayAlmostEqual(result.data, expected)
+        result = Plugin(6.3, operation="max").process(cube)
+        self.assertArrayAlmostEqual(result.data, np.ones_like(cube.data))
+
+    def test_matches_scipy(self):
+        """Test that the result matches scipy.ndimage with a circular
+        footprint for each realization and time."""
+        cube = set_up_realization_cube()
+        for operation, scipy_filter in [
+                ("max", scipy.ndimage.maximum_filter),
+                ("min", scipy.ndimage.minimum_filter)]:
+            for radius_in_km in [2.1, 6.3, 20.1]:
+                plugin = Plugin(radius_in_km, operation=operation)
+                result = plugin.process(cube)
+                ranges = plugin.nbhood_plugin.get_grid_x_y_kernel_ranges(
+                    cube)
+                footprint = plugin.nbhood_plugin.get_kernel(ranges) > 0
+                expected = scipy_filter(
+                    cube.data, footprint=footprint[np.newaxis, np.newaxis],
+                    mode='nearest')
+                self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_collapse_realizations(self):
+        """Test that the mean over realizations of the neighbourhood
+        maximum of an event is returned as a probability."""
+        cube = set_up_realization_cube()
+        cube.data = (cube.data > 0.99).astype(np.float32)
+        plugin = Plugin(6.3, collapse_realizations="after")
+        result = plugin.process(cube)
+        expected = Plugin(6.3).process(cube).data.mean(axis=0)
+        self.assertIsInstance(result, Cube)
+        self.assertEqual(result.shape, (2, 30, 30))
+        self.assertArrayAlmostEqual(result.data, expected)
+        self.assertTrue(np.all((result.data >= 0.) & (result.data <= 1.)))
+
+    def test_collapse_realizations_no_realization_coord(self):
+        """Test that a cube without a realization coordinate is returned
+        uncollapsed when collapse_realizations is "after"."""
+        cube = set_up_realization_cube()[0, 0]
+        cube.remove_coord("realization")
+        result = Plugin(6.3, collapse_realizations="after").process(cube)
+        expected = Plugin(6.3).process(cube)
+        self.assertEqual(result.shape, (30, 30))
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_lazy_data(self):
+        """Test that lazy data give a lazy result matching the result for
+        realised data."""
+        cube = set_up_realization_cube()
+        expected = Plugin(6.3).process(cube).data
+        lazy_cube = cube.copy(data=cube.lazy_data().rechunk((1, 1, 10, 10)))
+        result = Plugin(6.3).process(lazy_cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_lazy_data_large_radius(self):
+        """Test that lazy data give the result for realised data when the
+        kernel is larger than the grid."""
+        cube = set_up_realization_cube()
+        expected = Plugin(100.).process(cube).data
+        lazy_cube = cube.copy(data=cube.lazy_data().rechunk((1, 1, 10, 10)))
+        result = Plugin(100.).process(lazy_cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertEqual(result.shape, (3, 2, 30, 30))
+        self.assertArrayAlmostEqual(result.data, expected)
+
+    def test_nan(self):
+        """Test that NaN values raise an error."""
+        cube = set_up_cube()
+        cube.data[0, 4, 4] = np.nan
+        msg = "NaN detected in input cube data"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(6.3).process(cube)
+
+
+if __name__ == '__main__':
+    unittest.main()
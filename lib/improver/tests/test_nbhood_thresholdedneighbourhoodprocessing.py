@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Unit tests for the nbhood.ThresholdedNeighbourhoodProcessing plugin."""
+
+
+import unittest
+
+import dask.array as da
+from iris.cube import Cube, CubeList
+from iris.tests import IrisTest
+import numpy as np
+
+from improver.nbhood import BasicNeighbourhoodProcessing as NBHood
+from improver.nbhood import ThresholdedNeighbourhoodProcessing as Plugin
+from improver.tests.test_nbhood_basicneighbourhoodprocessing import (
+    set_up_cube)
+from improver.threshold import BasicThreshold as Threshold
+
+
+def set_up_rainfall_cube(num_grid_points=32):
+    """Set up a two-dimensional cube of random rainfall amounts."""
+    cube = set_up_cube(num_grid_points=num_grid_points)[0]
+    cube.data = np.random.RandomState(0).gamma(
+        0.5, 2.0, size=cube.shape).astype(np.float32)
+    return cube
+
+
+class Test__init__(IrisTest):
+
+    """Test the initialisation of the plugin."""
+
+    def test_thresholds_sorted(self):
+        """Test that the thresholds are sorted into ascending order."""
+        plugin = Plugin([2.0, 0.5, 1.0], [6.3], 0.8)
+        self.assertEqual(plugin.thresholds, [0.5, 1.0, 2.0])
+
+    def test_invalid_threshold(self):
+        """Test that each threshold is validated by BasicThreshold."""
+        msg = "Invalid threshold: zero not allowed"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin([0.0, 1.0], [6.3], 0.8)
+
+    def test_invalid_tile_shape(self):
+        """Test that an invalid tile shape raises an error."""
+        msg = "Invalid tile_shape"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin([1.0], [6.3], 0.8, tile_shape=(0, 10))
+
+
+class Test_process(IrisTest):
+
+    """Test the process method of the plugin."""
+
+    RADII_IN_KM = [6.3, 12.5]
+    THRESHOLDS = [0.5, 2.0]
+
+    def test_basic(self):
+        """Test that one (threshold, y, x) cube is returned per radius."""
+        cube = set_up_rainfall_cube()
+        result = Plugin(self.THRESHOLDS, self.RADII_IN_KM, 0.8).process(cube)
+        self.assertIsInstance(result, CubeList)
+        self.assertEqual(len(result), 2)
+        for radius_in_km, result_cube in zip(self.RADII_IN_KM, result):
+            self.assertIsInstance(result_cube, Cube)
+            self.assertEqual(result_cube.shape, (2, 32, 32))
+            self.assertArrayAlmostEqual(
+                result_cube.coord("threshold").points, self.THRESHOLDS)
+            self.assertEqual(result_cube.coord("radius").points,
+                             radius_in_km)
+            self.assertEqual(result_cube.name(),
+                             "probability_of_precipitation_amount")
+
+    def test_matches_threshold_then_nbhood(self):
+        """Test that the result matches BasicThreshold followed by
+        BasicNeighbourhoodProcessing, with tiles smaller than the kernel."""
+        cube = set_up_rainfall_cube()
+        for unweighted_mode in [False, True]:
+            plugin = Plugin(
+                self.THRESHOLDS, self.RADII_IN_KM, 0.8,
+                unweighted_mode=unweighted_mode, tile_shape=(5, 7))
+            result = plugin.process(cube)
+            for radius_in_km, result_cube in zip(self.RADII_IN_KM, result):
+                for index, threshold in enumerate(self.THRESHOLDS):
+                    expected = NBHood(
+                        radius_in_km, unweighted_mode=unweighted_mode
+                    ).process(Threshold(threshold, 0.8).process(
+                        cube.copy())).data
+                    self.assertArrayAlmostEqual(
+                        result_cube.data[index], expected)
+
+    def test_chord_engine(self):
+        """Test that the chord engine gives the same result as the dense
+        kernel."""
+        cube = set_up_rainfall_cube()
+        for unweighted_mode in [False, True]:
+            expected = Plugin(
+                self.THRESHOLDS, self.RADII_IN_KM, 0.8,
+                unweighted_mode=unweighted_mode).process(cube)
+            result = Plugin(
+                self.THRESHOLDS, self.RADII_IN_KM, 0.8,
+                unweighted_mode=unweighted_mode, tile_shape=(5, 7),
+                engine="chord").process(cube)
+            for result_cube, expected_cube in zip(result, expected):
+                self.assertArrayAlmostEqual(result_cube.data,
+                                            expected_cube.data)
+
+    def test_below_threshold(self):
+        """Test the probabilities of being below the thresholds."""
+        cube = set_up_rainfall_cube()
+        above = Plugin(self.THRESHOLDS, [6.3], 0.8).process(cube)[0]
+        below = Plugin(self.THRESHOLDS, [6.3], 0.8,
+                       below_thresh_ok=True).process(cube)[0]
+        self.assertArrayAlmostEqual(below.data, 1. - above.data)
+
+    def test_lazy_data(self):
+        """Test that lazy data gives the same result as realised data."""
+        cube = set_up_rainfall_cube()
+        expected = Plugin(self.THRESHOLDS, [6.3], 0.8).process(cube)[0]
+        cube.data = da.from_array(cube.data, chunks=(8, 8))
+        result = Plugin(self.THRESHOLDS, [6.3], 0.8,
+                        tile_shape=(10, 10)).process(cube)[0]
+        self.assertArrayAlmostEqual(result.data, expected.data)
+
+    def test_nan(self):
+        """Test that a NaN in the input data raises an error."""
+        cube = set_up_rainfall_cube()
+        cube.data[6, 7] = np.nan
+        msg = "NaN detected in input cube data"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(self.THRESHOLDS, [6.3], 0.8).process(cube)
+
+    def test_too_many_dimensions(self):
+        """Test that a cube with a time dimension raises an error."""
+        cube = set_up_cube(num_time_points=2)
+        msg = "Invalid cube: dimensions must be projection_y_coordinate"
+        with self.assertRaisesRegexp(ValueError, msg):
+            Plugin(self.THRESHOLDS, [6.3], 0.8).process(cube)
+
+
+if __name__ == '__main__':
+    unittest.main()
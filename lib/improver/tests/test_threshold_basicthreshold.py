@@ -34,12 +34,14 @@
 import unittest
 
 from cf_units import Unit
+import dask.array as da
 from iris.coords import AuxCoord, DimCoord
 from iris.cube import Cube
 from iris.tests import IrisTest
 import numpy as np
 
 from improver.threshold import BasicThreshold as Threshold
+from improver.utilities.tiling import TileScheduler
 
 
 class TestThreshold(IrisTest):
@@ -151,6 +153,38 @@ class TestThreshold(IrisTest):
         with self.assertRaisesRegexp(ValueError, msg):
             plugin.process(self.cube)
 
+    def test_threshold_lazy(self):
+        """Test that lazy data remains lazy and gives the same result."""
+        fuzzy_factor = 0.5
+        plugin = Threshold(0.6, fuzzy_factor)
+        expected_result_array = np.zeros_like(self.cube.data)
+        expected_result_array[0][2][2] = 1.0/3.0
+        self.cube.data = da.from_array(self.cube.data, chunks=(1, 2, 2))
+        result = plugin.process(self.cube)
+        self.assertTrue(result.has_lazy_data())
+        self.assertArrayAlmostEqual(result.data, expected_result_array)
+
+    def test_threshold_scheduler(self):
+        """Test that thresholding tile by tile gives the same result."""
+        fuzzy_factor = 0.5
+        plugin = Threshold(0.6, fuzzy_factor,
+                           scheduler=TileScheduler((2, 3), workers=2))
+        expected_result_array = np.zeros_like(self.cube.data)
+        expected_result_array[0][2][2] = 1.0/3.0
+        result = plugin.process(self.cube)
+        self.assertArrayAlmostEqual(result.data, expected_result_array)
+
+    def test_threshold_lazy_point_nan(self):
+        """Test that a NaN in lazy data is detected when computed."""
+        fuzzy_factor = 0.5
+        self.cube.data[0][2][2] = np.nan
+        self.cube.data = da.from_array(self.cube.data, chunks=(1, 2, 2))
+        msg = "NaN detected in input cube data"
+        plugin = Threshold(2.0, fuzzy_factor, below_thresh_ok=True)
+        result = plugin.process(self.cube)
+        with self.assertRaisesRegexp(ValueError, msg):
+            result.data
+
     def test_threshold_zero(self):
         """Test when a threshold of zero is used (invalid)."""
         fuzzy_factor = 0.6
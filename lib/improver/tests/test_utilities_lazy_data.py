@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Unit tests for the utilities.lazy_data module."""
+
+
+import unittest
+
+import dask.array as da
+from iris.cube import Cube
+from iris.tests import IrisTest
+import numpy as np
+
+from improver.utilities.lazy_data import check_for_nan, get_data
+
+
+class Test_check_for_nan(IrisTest):
+
+    """Test the check_for_nan function."""
+
+    def setUp(self):
+        """Set up data containing a NaN."""
+        self.data = np.ones((4, 4))
+        self.data[3, 2] = np.nan
+
+    def test_valid_data(self):
+        """Test that valid data is returned unchanged."""
+        data = np.ones((4, 4))
+        self.assertArrayEqual(check_for_nan(data), data)
+
+    def test_nan(self):
+        """Test that a NaN raises an error immediately."""
+        msg = "NaN detected in input cube data"
+        with self.assertRaisesRegexp(ValueError, msg):
+            check_for_nan(self.data)
+
+    def test_lazy_nan(self):
+        """Test that a NaN in lazy data raises an error when computed."""
+        data = da.from_array(self.data, chunks=(2, 2))
+        result = check_for_nan(data, msg="Custom message")
+        self.assertIsInstance(result, da.Array)
+        with self.assertRaisesRegexp(ValueError, "Custom message"):
+            result.compute()
+
+
+class Test_get_data(IrisTest):
+
+    """Test the get_data function."""
+
+    def test_realised(self):
+        """Test that realised data is returned as a numpy array."""
+        cube = Cube(np.ones((2, 2)))
+        self.assertIsInstance(get_data(cube), np.ndarray)
+
+    def test_lazy(self):
+        """Test that lazy data is returned without being realised."""
+        cube = Cube(da.ones((2, 2), chunks=(1, 1)))
+        self.assertIsInstance(get_data(cube), da.Array)
+        self.assertTrue(cube.has_lazy_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Unit tests for the utilities.tiling module."""
+
+
+import unittest
+
+import dask.array as da
+from iris.tests import IrisTest
+import numpy as np
+import scipy.ndimage
+
+from improver.utilities.tiling import TileScheduler
+
+
+def uniform_filter(data):
+    """Mean over a 5 by 7 box in y and x, repeating the edge points."""
+    return scipy.ndimage.uniform_filter(
+        data, size=(1, 5, 7), mode='nearest')
+
+
+class Test__init__(IrisTest):
+
+    """Test the initialisation of the scheduler."""
+
+    def test_default_workers(self):
+        """Test that there is at least one worker by default."""
+        self.assertTrue(TileScheduler().workers >= 1)
+
+    def test_invalid_tile_shape(self):
+        """Test that a tile shape without two positive sizes raises an
+        error."""
+        msg = "Invalid tile_shape: two positive sizes required"
+        with self.assertRaisesRegexp(ValueError, msg):
+            TileScheduler((0, 10))
+
+    def test_invalid_workers(self):
+        """Test that fewer than one worker raises an error."""
+        msg = "Invalid workers: must be at least 1"
+        with self.assertRaisesRegexp(ValueError, msg):
+            TileScheduler(workers=0)
+
+
+class Test_get_tiles(IrisTest):
+
+    """Test the division of the grid into tiles."""
+
+    def test_basic(self):
+        """Test that the tiles cover the grid, with smaller tiles at the
+        far edges."""
+        result = TileScheduler((4, 3)).get_tiles(6, 5)
+        self.assertEqual(result, [(0, 4, 0, 3), (0, 4, 3, 5),
+                                  (4, 6, 0, 3), (4, 6, 3, 5)])
+
+
+class Test_process(IrisTest):
+
+    """Test the processing of data tile by tile."""
+
+    def setUp(self):
+        """Set up random data over two times."""
+        self.data = np.random.RandomState(0).random_sample((2, 23, 31))
+
+    def test_halo(self):
+        """Test that with a halo the result matches the whole grid result
+        for one and several workers."""
+        expected = uniform_filter(self.data)
+        for workers in [1, 4]:
+            scheduler = TileScheduler((6, 8), workers=workers)
+            result = scheduler.process(uniform_filter, self.data,
+                                       halo=(2, 3))
+            self.assertArrayAlmostEqual(result, expected)
+
+    def test_no_halo(self):
+        """Test that without a halo the result differs from the whole grid
+        result at the edges of the tiles."""
+        expected = uniform_filter(self.data)
+        result = TileScheduler((6, 8), workers=2).process(
+            uniform_filter, self.data)
+        self.assertArrayAlmostEqual(result[:, :4, :5], expected[:, :4, :5])
+        self.assertFalse(np.allclose(result, expected))
+
+    def test_axes_and_out(self):
+        """Test processing with x before y into a preallocated array."""
+        expected = uniform_filter(self.data)
+        out = np.zeros((2, 31, 23), dtype=np.float32)
+        result = TileScheduler((6, 8), workers=2).process(
+            lambda data: uniform_filter(data.transpose(0, 2, 1)).transpose(
+                0, 2, 1),
+            self.data.transpose(0, 2, 1), halo=(2, 3), y_axis=2, x_axis=1,
+            out=out)
+        self.assertIs(result, out)
+        self.assertArrayAlmostEqual(result.transpose(0, 2, 1), expected,
+                                    decimal=5)
+
+    def test_lazy_data(self):
+        """Test that lazy data are realised tile by tile."""
+        expected = uniform_filter(self.data)
+        result = TileScheduler((6, 8), workers=2).process(
+            uniform_filter, da.from_array(self.data, chunks=(1, 10, 10)),
+            halo=(2, 3))
+        self.assertIsInstance(result, np.ndarray)
+        self.assertArrayAlmostEqual(result, expected)
+
+    def test_invalid_out(self):
+        """Test that an output array of the wrong shape raises an
+        error."""
+        msg = "Invalid out: shape"
+        with self.assertRaisesRegexp(ValueError, msg):
+            TileScheduler().process(uniform_filter, self.data,
+                                    out=np.zeros((2, 3)))
+
+    def test_exception(self):
+        """Test that an exception in a worker thread is raised."""
+        def function(data):
+            """Raise an error."""
+            raise ValueError("Tile failed")
+        msg = "Tile failed"
+        with self.assertRaisesRegexp(ValueError, msg):
+            TileScheduler((6, 8), workers=2).process(function, self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,6 +33,8 @@
 
 import numpy as np
 
+from improver.utilities.lazy_data import check_for_nan, get_data
+
 
 class BasicThreshold(object):
 
@@ -46,7 +48,7 @@ class BasicThreshold(object):
     """
 
     def __init__(self, threshold, fuzzy_factor,
-                 below_thresh_ok=False):
+                 below_thresh_ok=False, scheduler=None):
         """Set up for processing an in-or-out of threshold binary field.
 
         Parameters
@@ -62,6 +64,10 @@ class BasicThreshold(object):
             True to count points as significant if *below* the threshold,
             False to count points as significant if *above* the threshold.
 
+        scheduler : improver.utilities.tiling.TileScheduler
+            If given, realised data are thresholded tile by tile using the
+            threads of the scheduler.
+
         """
         if threshold == 0.0:
             raise ValueError(
@@ -73,6 +79,7 @@ class BasicThreshold(object):
                     fuzzy_factor))
         self.fuzzy_factor = fuzzy_factor
         self.below_thresh_ok = below_thresh_ok
+        self.scheduler = scheduler
 
     def __str__(self):
         """Represent the configured plugin instance as a string."""
@@ -89,17 +96,60 @@ class BasicThreshold(object):
 
         cube : iris.cube.Cube
             Cube to threshold. The code is dimension-agnostic.
+            If the cube has lazy data, the result is also lazy and the
+            check for NaN values is made when the data is computed.
+
+        """
+        data = check_for_nan(get_data(cube))
+        if self.scheduler is None or cube.has_lazy_data():
+            cube.data = self.calculate_truth_value(data)
+        else:
+            cube.data = self.scheduler.process(
+                self.calculate_truth_value, data, halo=self.get_halo(cube),
+                dtype=np.promote_types(data.dtype, np.float32))
+        return cube
+
+    def get_halo(self, cube):
+        """Return the number of grid points in y and x around each point
+        that are needed to threshold it, which is none.
+
+        Parameters
+        ----------
+
+        cube : iris.cube.Cube
+            Cube to threshold.
+
+        Returns
+        -------
+
+        tuple of int
+            The halo in y and x.
+
+        """
+        return (0, 0)
+
+    def calculate_truth_value(self, data):
+        """Apply the fuzzy membership function to an array.
+
+        Parameters
+        ----------
+
+        data : numpy.ndarray or dask.array.Array
+            Values to threshold.
+
+        Returns
+        -------
+
+        numpy.ndarray or dask.array.Array
+            Fuzzy truth values between 0 and 1.
 
         """
         lower_threshold = self.threshold * self.fuzzy_factor
-        if np.isnan(cube.data).any():
-            raise ValueError("Error: NaN detected in input cube data")
         truth_value = (
-            (cube.data - lower_threshold) /
+            (data - lower_threshold) /
             ((self.threshold * (2. - self.fuzzy_factor)) - lower_threshold)
         )
         truth_value = np.clip(truth_value, 0., 1.)
         if self.below_thresh_ok:
             truth_value = 1. - truth_value
-        cube.data = truth_value
-        return cube
+        return truth_value
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Utilities for working with cubes whose data may be lazy."""
+
+import dask.array as da
+import numpy as np
+
+
+def _raise_if_nan(block, msg):
+    """Raise a ValueError if the block contains NaN values."""
+    if np.isnan(block).any():
+        raise ValueError(msg)
+    return block
+
+
+def check_for_nan(data, msg="Error: NaN detected in input cube data"):
+    """
+    Check that the data contains no NaN values.
+
+    If the data is a numpy array, the check is made immediately. If the
+    data is a dask array, the check is added to the task graph, so that the
+    error is raised when the data is computed, without forcing the data
+    to be realised here.
+
+    Parameters
+    ----------
+    data : Numpy array or dask array
+        Data to be checked.
+    msg : String
+        Message for the ValueError raised if NaN values are found.
+
+    Returns
+    -------
+    Numpy array or dask array
+        The input data. For dask arrays, the returned array must be used
+        in place of the input for the check to be made.
+
+    """
+    if isinstance(data, da.Array):
+        return data.map_blocks(_raise_if_nan, msg, dtype=data.dtype)
+    _raise_if_nan(data, msg)
+    return data
+
+
+def get_data(cube):
+    """
+    Return the lazy data of the cube if it has lazy data, otherwise the
+    realised data.
+
+    Parameters
+    ----------
+    cube : Iris cube
+        Cube from which to get the data.
+
+    Returns
+    -------
+    Numpy array or dask array
+        Data of the cube.
+
+    """
+    if cube.has_lazy_data():
+        return cube.lazy_data()
+    return cube.data
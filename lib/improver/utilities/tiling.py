@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# (C) British Crown Copyright 2017 Met Office.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Utilities for processing gridded data tile by tile on multiple threads."""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+
+class TileScheduler(object):
+    """
+    Apply a function to the y-x tiles of an array using a pool of threads,
+    writing the results into a preallocated output array.
+
+    Each tile is passed to the function with a halo of surrounding points,
+    which is cropped from the result. At the edges of the grid the halo is
+    truncated, so the function must treat points beyond the edges of the
+    data it is given as it would for the whole grid, for example by
+    repeating the nearest edge point. The function must return an array
+    with the same shape as its input.
+
+    NumPy and SciPy release the GIL for most of their array operations,
+    so the tiles are processed in parallel on multiple cores.
+
+    """
+
+    def __init__(self, tile_shape=(256, 256), workers=None):
+        """
+        Create a tile scheduler.
+
+        Parameters
+        ----------
+
+        tile_shape : tuple of int
+            Number of grid points in y and x within each tile.
+
+        workers : int
+            Number of threads. If None, the number of processors.
+
+        """
+        if len(tile_shape) != 2 or min(tile_shape) < 1:
+            raise ValueError(
+                "Invalid tile_shape: two positive sizes required: {}".format(
+                    tile_shape))
+        self.tile_shape = tuple(int(x) for x in tile_shape)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(
+                "Invalid workers: must be at least 1: {}".format(workers))
+        self.workers = int(workers)
+
+    def __str__(self):
+        result = '<TileScheduler: tile_shape: {}; workers: {}>'
+        return result.format(self.tile_shape, self.workers)
+
+    def get_tiles(self, ylen, xlen):
+        """
+        Return the extents of the tiles covering a grid.
+
+        Parameters
+        ----------
+        ylen, xlen : int
+            Number of grid points in y and x.
+
+        Returns
+        -------
+        list of tuple
+            (y_start, y_stop, x_start, x_stop) for each tile.
+
+        """
+        tile_y, tile_x = self.tile_shape
+        return [(y_start, min(y_start + tile_y, ylen),
+                 x_start, min(x_start + tile_x, xlen))
+                for y_start in range(0, ylen, tile_y)
+                for x_start in range(0, xlen, tile_x)]
+
+    def process(self, function, data, halo=(0, 0), y_axis=-2, x_axis=-1,
+                out=None, dtype=None):
+        """
+        Apply the function to each tile of the data.
+
+        Parameters
+        ----------
+        function : callable
+            Function taking an array covering a tile and its halo, and
+            returning an array of the same shape.
+        data : numpy.ndarray or dask.array.Array
+            Data to be processed. Lazy data is realised one tile at a time.
+        halo : tuple of int
+            Number of grid points in y and x required around each tile.
+        y_axis, x_axis : int
+            Dimensions of the data corresponding to y and x.
+        out : numpy.ndarray
+            Array for the result, with the shape of the data. If None, a
+            new array is created.
+        dtype : numpy.dtype
+            Data type of a new array for the result. If None, the data type
+            of the data.
+
+        Returns
+        -------
+        numpy.ndarray
+            The result of the function for each tile.
+
+        """
+        if out is None:
+            out = np.empty(data.shape,
+                           dtype=data.dtype if dtype is None else dtype)
+        elif out.shape != data.shape:
+            raise ValueError(
+                "Invalid out: shape {} does not match data shape {}".format(
+                    out.shape, data.shape))
+        y_axis %= data.ndim
+        x_axis %= data.ndim
+        ylen, xlen = data.shape[y_axis], data.shape[x_axis]
+        halo_y, halo_x = halo
+
+        def index(y_slice, x_slice):
+            """Index the data with the given y and x slices."""
+            result = [slice(None)] * data.ndim
+            result[y_axis] = y_slice
+            result[x_axis] = x_slice
+            return tuple(result)
+
+        def process_tile(tile):
+            """Apply the function to one tile and its halo."""
+            y_start, y_stop, x_start, x_stop = tile
+            buffer_y_start = max(y_start - halo_y, 0)
+            buffer_x_start = max(x_start - halo_x, 0)
+            buffer = np.asanyarray(data[index(
+                slice(buffer_y_start, min(y_stop + halo_y, ylen)),
+                slice(buffer_x_start, min(x_stop + halo_x, xlen)))])
+            result = function(buffer)
+            out[index(slice(y_start, y_stop), slice(x_start, x_stop))] = (
+                result[index(
+                    slice(y_start - buffer_y_start,
+                          y_stop - buffer_y_start),
+                    slice(x_start - buffer_x_start,
+                          x_stop - buffer_x_start))])
+
+        tiles = self.get_tiles(ylen, xlen)
+        if self.workers == 1 or len(tiles) == 1:
+            for tile in tiles:
+                process_tile(tile)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # Consume the results, so that any exception is raised.
+                list(executor.map(process_tile, tiles))
+        return out